@@ -0,0 +1,174 @@
+"""
+Async Pipeline Benchmark
+Upload throughput of the thread-per-request path vs. the asyncio path at high concurrency
+
+Both paths run against the same latency fakes (see bench/pipeline.py). The
+sync path is FirebaseUploader.create_deal on a pool with one thread per
+in-flight request, the way a threaded WSGI server serves it; the async path
+is AsyncFirebaseUploader.create_deal with as many coroutines in flight on one
+event loop. Run from backend/flask:
+
+    python bench/async_pipeline.py
+    python bench/async_pipeline.py --concurrency 50 200 500 --gemini-latency 1.0
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Admission control would cap both paths at GEMINI_MAX_CONCURRENT; the
+# benchmark measures the serving model, not the quota
+os.environ.setdefault("GEMINI_ADMISSION", "0")
+os.environ.setdefault("IMAGE_DEDUP_ENABLED", "0")
+os.environ.setdefault("UPLOAD_EXECUTOR_WORKERS", "32")
+
+from bench.pipeline import make_image, latency_summary  # noqa: E402
+from src.fakes import (  # noqa: E402
+    Faults,
+    FakeBucket,
+    FakeFirestore,
+    FakeAsyncFirestore,
+    FakeGenerativeModel,
+)
+from src.vision_parser import VisionMenuParser  # noqa: E402
+from src.firebase_uploader import FirebaseUploader  # noqa: E402
+from src.async_uploader import AsyncFirebaseUploader  # noqa: E402
+
+
+def rss_bytes():
+    """Current resident set size (Linux), or 0 where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class RssSampler:
+    """Peak RSS above the starting point, sampled from a background thread"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.base = rss_bytes()
+        self.peak = self.base
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.base) / (1024 * 1024)
+
+
+def make_uploaders(args):
+    model = FakeGenerativeModel(faults=Faults(args.gemini_latency))
+    parser = VisionMenuParser(model=model)
+    parser.cache = None
+    db = FakeFirestore(Faults(args.firestore_latency))
+    uploader = FirebaseUploader(
+        db=db, bucket=FakeBucket(faults=Faults(args.storage_latency)), parser=parser
+    )
+    uploader.preprocessor = None  # CPU work is identical on both paths
+    return uploader, AsyncFirebaseUploader(uploader, db=FakeAsyncFirestore(db))
+
+
+def run_sync(uploader, images, concurrency):
+    def upload(i):
+        start = time.perf_counter()
+        uploader.create_deal(images[i], filename=f"bench_{i}.png")
+        return time.perf_counter() - start
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(upload, range(len(images))))
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed, rss)
+
+
+def run_async(uploader, images, concurrency):
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+
+        async def upload(i):
+            async with gate:
+                start = time.perf_counter()
+                await uploader.create_deal(images[i], filename=f"bench_{i}.png")
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(upload(i) for i in range(len(images))))
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        samples = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed, rss)
+
+
+def summarize(samples, elapsed, rss):
+    result = latency_summary(samples)
+    result["uploads_per_s"] = len(samples) / elapsed
+    result["rss_growth_mb"] = rss.growth_mb
+    result["peak_threads"] = rss.peak_threads
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs. async upload throughput")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[50, 200, 500],
+        help="Uploads in flight at once (default: 50 200 500)",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=2, help="Uploads per in-flight slot (default: 2)"
+    )
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--storage-latency", type=float, default=0.05)
+    parser.add_argument("--firestore-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    image = make_image(0, size=(64, 48))
+    uploader, async_uploader = make_uploaders(args)
+
+    print(f"{'concurrency':>11} {'path':>5} {'uploads/s':>10} {'p50_ms':>9} "
+          f"{'p95_ms':>9} {'rss_mb':>8} {'threads':>8}")
+    for concurrency in args.concurrency:
+        images = [image] * (concurrency * args.rounds)
+        for name, run, target in (
+            ("sync", run_sync, uploader),
+            ("async", run_async, async_uploader),
+        ):
+            r = run(target, images, concurrency)
+            print(
+                f"{concurrency:>11} {name:>5} {r['uploads_per_s']:>10.1f} "
+                f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                f"{r['rss_growth_mb']:>8.1f} {r['peak_threads']:>8}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
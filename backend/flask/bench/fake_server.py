@@ -0,0 +1,181 @@
+"""
+Fake-Backed API Server
+The Flask app on a local port with Firestore, Storage and Gemini replaced by src.fakes
+
+Workers are forked after the listening socket is bound, so they share one
+port the way gunicorn's workers do; each builds its own app state and fakes.
+Once every worker has warmed up, one JSON line with the port, worker PIDs and
+seeded document IDs is printed (bench/load.py waits for it). Run from
+backend/flask:
+
+    python bench/fake_server.py --port 5050 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Cache hits and duplicate short-cuts would hide the work being measured
+os.environ.setdefault("PARSE_CACHE_ENABLED", "0")
+os.environ.setdefault("IMAGE_DEDUP_ENABLED", "0")
+os.environ.setdefault("VENUE_RESOLVE_ENABLED", "0")
+os.environ.setdefault("VENUES_JSON_PATH", os.path.join(ROOT, "bench", ".no_venues.json"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+VENUES_JSON = os.path.join(ROOT, "..", "..", "venues.json")
+# Seeded venues are scattered around this point (Long Beach, like venues.json)
+CENTER = (33.78, -118.17)
+
+
+def seed_records(count, seed=0):
+    """count venues.json-shaped records spread within ~10 km of CENTER"""
+    from src.bulk_transfer import read_records
+
+    base = read_records(VENUES_JSON)
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        record = json.loads(json.dumps(base[i % len(base)]))
+        record["venue_id"] = f"venue{i}"
+        record["venue_name"] = f"{record['venue_name']} {i}"
+        record["latitude"] = CENTER[0] + rng.uniform(-0.1, 0.1)
+        record["longitude"] = CENTER[1] + rng.uniform(-0.1, 0.1)
+        records.append(record)
+    return records
+
+
+def build_app(args):
+    """The Flask app wired to fakes with the given service latencies"""
+    from src.fakes import Faults, FakeBucket, FakeFirestore, FakeGenerativeModel
+    from src.vision_parser import VisionMenuParser
+    from src.firebase_uploader import FirebaseUploader
+    from src.bulk_transfer import import_records
+    import endpoints.routes as routes
+    from src.app import app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    db = FakeFirestore()
+    import_records(db, seed_records(args.venues))
+    db.faults = Faults(args.firestore_latency, failure_rate=args.failure_rate)
+
+    model = FakeGenerativeModel(
+        faults=Faults(args.gemini_latency, jitter=args.gemini_latency / 2, failure_rate=args.failure_rate)
+    )
+    routes._uploader = FirebaseUploader(
+        db=db,
+        bucket=FakeBucket(faults=Faults(args.storage_latency), keep_data=False),
+        parser=VisionMenuParser(model=model),
+    )
+    routes.warm_up()
+    return app
+
+
+def serve_worker(sock, args, ready_fd):
+    from werkzeug.serving import make_server
+
+    app = build_app(args)
+    server = make_server(
+        args.host, args.port, app, threaded=args.threads > 0, fd=sock.fileno()
+    )
+    if args.threads > 0:
+        # ThreadingMixIn spawns a thread per connection; cap them like gunicorn --threads
+        import threading
+
+        slots = threading.BoundedSemaphore(args.threads)
+        process_request_thread = server.process_request_thread
+
+        def limited(request, client_address):
+            with slots:
+                process_request_thread(request, client_address)
+
+        server.process_request_thread = limited
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API against service fakes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=1, help="Processes (default: 1)")
+    parser.add_argument(
+        "--threads", type=int, default=16,
+        help="Concurrent requests per worker, 0 = one at a time (default: 16)",
+    )
+    parser.add_argument("--venues", type=int, default=2000, help="Seeded venue documents")
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--storage-latency", type=float, default=0.05)
+    parser.add_argument("--firestore-latency", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    args.port = sock.getsockname()[1]
+    sock.set_inheritable(True)
+
+    read_fd, write_fd = os.pipe()
+    pids = []
+    for _ in range(max(1, args.workers)):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                serve_worker(sock, args, write_fd)
+            finally:
+                os._exit(1)
+        pids.append(pid)
+    os.close(write_fd)
+
+    started = time.perf_counter()
+    ready = 0
+    while ready < len(pids):
+        chunk = os.read(read_fd, len(pids) - ready)
+        if not chunk:
+            print(json.dumps({"error": "a worker exited during startup"}), flush=True)
+            return 1
+        ready += len(chunk)
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(
+        json.dumps(
+            {
+                "url": f"http://{args.host}:{args.port}",
+                "pids": pids,
+                "startup_s": round(time.perf_counter() - started, 2),
+                "venue_ids": [f"venue{i}" for i in range(args.venues)],
+                "center": CENTER,
+            }
+        ),
+        flush=True,
+    )
+    for _ in pids:
+        os.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+HTTP Load Test
+Closed-loop or fixed-arrival-rate load against the API, with latency SLOs
+
+Boots bench/fake_server.py (the real Flask app over service fakes) unless
+--url points at a running server, drives a weighted mix of endpoints, and
+reports throughput, p50/p95/p99 latency, error and shed rates and the RSS of
+every server process. Exits 1 when a threshold in bench/slo.json (or --slo)
+is exceeded. Run from backend/flask:
+
+    python bench/load.py --concurrency 32 --duration 20              # closed loop
+    python bench/load.py --rate 50 --duration 30 --workers 4          # open loop
+    python bench/load.py --mix health=1 --slo health.p99_ms=20
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from bench.pipeline import make_image, percentile  # noqa: E402
+
+SLO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "slo.json")
+
+DEFAULT_MIX = "health=2,search=8,menu=6,menus=1,active=2,upload=1"
+
+# Statuses that mean "refused on purpose" (admission control / full queue), not broken
+SHED_STATUSES = {429, 503}
+
+
+class Target:
+    """Builds requests for each endpoint name in the mix"""
+
+    def __init__(self, url, venue_ids, center, image_pool=64, seed=0):
+        self.url = url.rstrip("/")
+        self.venue_ids = venue_ids or ["venue0"]
+        self.center = center
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Distinct images so the server cannot answer from a cache
+        self.images = [make_image(seed * 1000 + i, size=(320, 240)) for i in range(image_pool)]
+
+    def _point(self):
+        with self._lock:
+            return (
+                self.center[0] + self._rng.uniform(-0.08, 0.08),
+                self.center[1] + self._rng.uniform(-0.08, 0.08),
+            )
+
+    def request(self, session, endpoint):
+        """Send one request; returns the HTTP status"""
+        lat, lon = self._point()
+        if endpoint == "health":
+            response = session.get(f"{self.url}/health")
+        elif endpoint == "search":
+            response = session.get(
+                f"{self.url}/search-restaurants-by-name",
+                params={
+                    "lat": lat,
+                    "lon": lon,
+                    "radius": 3000,
+                    "limit": 20,
+                    "fields": "venue_name,latitude,longitude,deals",
+                },
+            )
+        elif endpoint == "menu":
+            venue_id = self.venue_ids[int(abs(lat * 1e6)) % len(self.venue_ids)]
+            response = session.get(
+                f"{self.url}/get-menu/{venue_id}", params={"fields": "venue_name,deals"}
+            )
+        elif endpoint == "menus":
+            response = session.get(
+                f"{self.url}/get-all-menus", params={"limit": 100, "fields": "venue_name"}
+            )
+        elif endpoint == "active":
+            response = session.get(
+                f"{self.url}/active-deals", params={"lat": lat, "lon": lon, "radius": 3000}
+            )
+        elif endpoint == "upload":
+            image = self.images[int(abs(lon * 1e6)) % len(self.images)]
+            response = session.post(
+                f"{self.url}/upload-deal",
+                files={"image": ("load.png", image, "image/png")},
+            )
+        else:
+            raise ValueError(f"Unknown endpoint {endpoint!r}")
+        response.content  # read the whole body
+        return response.status_code
+
+
+def parse_mix(value):
+    """'health=2,upload=1' -> (names, cumulative weights)"""
+    names, weights = [], []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+class Recorder:
+    """Thread-safe (endpoint, latency, status) samples after the warm-up window"""
+
+    def __init__(self, record_after):
+        self.record_after = record_after
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, started, latency, status):
+        if started < self.record_after:
+            return
+        with self._lock:
+            self.samples.append((endpoint, latency, status))
+
+
+class RssMonitor:
+    """Peak RSS per process (server workers and this client), sampled in the background"""
+
+    def __init__(self, pids, interval=0.2):
+        self.pids = list(pids)
+        self.interval = interval
+        self.peak = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def rss_of(pid):
+        try:
+            with open(f"/proc/{pid}/statm", encoding="ascii") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return 0
+
+    def sample(self):
+        for pid in self.pids:
+            self.peak[pid] = max(self.peak.get(pid, 0), self.rss_of(pid))
+        self.peak["client"] = max(self.peak.get("client", 0), self.rss_of("self"))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def run_closed_loop(target, names, weights, concurrency, duration, recorder):
+    """concurrency clients, each sending its next request as soon as one returns"""
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(index)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = target.request(session, endpoint)
+            except requests.RequestException:
+                status = None
+            recorder.add(endpoint, started, time.perf_counter() - started, status)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(target, names, weights, rate, duration, max_outstanding, recorder):
+    """
+    Poisson arrivals at rate requests/s, whatever the server's speed
+
+    Latency counts from each request's scheduled time, so queueing behind a
+    slow server shows up in the percentiles (no coordinated omission).
+    """
+    rng = random.Random(0)
+    sessions = threading.local()
+
+    def send(endpoint, scheduled):
+        session = getattr(sessions, "session", None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        try:
+            status = target.request(session, endpoint)
+        except requests.RequestException:
+            status = None
+        recorder.add(endpoint, scheduled, time.perf_counter() - scheduled, status)
+
+    with ThreadPoolExecutor(max_workers=max_outstanding) as pool:
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled < start + duration:
+            scheduled += rng.expovariate(rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, rng.choices(names, weights)[0], scheduled)
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint and overall stats"""
+    by_endpoint = {}
+    for endpoint, latency, status in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, status))
+    by_endpoint["all"] = [(latency, status) for _, latency, status in samples]
+
+    report = {}
+    for endpoint, rows in by_endpoint.items():
+        latencies = [latency for latency, _ in rows]
+        shed = sum(1 for _, status in rows if status in SHED_STATUSES)
+        errors = sum(
+            1
+            for _, status in rows
+            if status is None or (status >= 400 and status not in SHED_STATUSES)
+        )
+        report[endpoint] = {
+            "requests": len(rows),
+            "rps": len(rows) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000,
+            "error_rate": errors / len(rows),
+            "shed_rate": shed / len(rows),
+        }
+    return report
+
+
+def load_slo(path, overrides):
+    """
+    Thresholds: {"<endpoint>": {"<metric>": max}, "server_rss_mb": max}
+
+    overrides are "endpoint.metric=value" strings (e.g. upload.p99_ms=3000).
+    """
+    slo = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            slo = json.load(f)
+    for override in overrides or ():
+        key, _, value = override.partition("=")
+        endpoint, _, metric = key.partition(".")
+        if metric:
+            slo.setdefault(endpoint, {})[metric] = float(value)
+        else:
+            slo[endpoint] = float(value)
+    return slo
+
+
+def check_slo(report, rss_peaks_mb, slo):
+    """
+    Returns:
+        list: (name, limit, value) for every threshold exceeded
+    """
+    breaches = []
+    for endpoint, limits in slo.items():
+        if endpoint == "server_rss_mb":
+            for pid, value in rss_peaks_mb.items():
+                if pid != "client" and value > limits:
+                    breaches.append((f"server_rss_mb[{pid}]", limits, value))
+            continue
+        if not isinstance(limits, dict) or endpoint not in report:
+            continue
+        for metric, limit in limits.items():
+            value = report[endpoint].get(metric)
+            if value is not None and value > limit:
+                breaches.append((f"{endpoint}.{metric}", limit, value))
+    return breaches
+
+
+def start_server(args):
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "bench", "fake_server.py"),
+        "--workers", str(args.workers),
+        "--threads", str(args.threads),
+        "--venues", str(args.venues),
+        "--gemini-latency", str(args.gemini_latency),
+        "--failure-rate", str(args.failure_rate),
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    info = json.loads(line) if line else {"error": "server exited"}
+    if "error" in info:
+        process.kill()
+        raise RuntimeError(f"Fake server failed to start: {info['error']}")
+    return process, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test with latency SLOs")
+    parser.add_argument("--url", help="Target a running server instead of booting the fake one")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint=weight list (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed-loop clients, or max outstanding with --rate")
+    parser.add_argument("--rate", type=float, help="Open loop: arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load (default: 15)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Leading seconds left out of the stats")
+    parser.add_argument("--slo", action="append", help="Override a threshold, e.g. upload.p99_ms=3000")
+    parser.add_argument("--slo-file", default=SLO_PATH, help="Thresholds JSON (default: bench/slo.json)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    server = parser.add_argument_group("fake server (ignored with --url)")
+    server.add_argument("--workers", type=int, default=2)
+    server.add_argument("--threads", type=int, default=16)
+    server.add_argument("--venues", type=int, default=2000)
+    server.add_argument("--gemini-latency", type=float, default=0.5)
+    server.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    names, weights = parse_mix(args.mix)
+    process = None
+    if args.url:
+        info = {"url": args.url, "pids": [], "venue_ids": [], "center": (33.78, -118.17)}
+    else:
+        process, info = start_server(args)
+
+    try:
+        target = Target(info["url"], info["venue_ids"], info["center"])
+        recorder = Recorder(record_after=time.perf_counter() + args.warmup)
+        with RssMonitor(info["pids"]) as rss:
+            if args.rate:
+                run_open_loop(
+                    target, names, weights, args.rate,
+                    args.warmup + args.duration, args.concurrency, recorder,
+                )
+            else:
+                run_closed_loop(
+                    target, names, weights, args.concurrency,
+                    args.warmup + args.duration, recorder,
+                )
+            elapsed = time.perf_counter() - recorder.record_after
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if not recorder.samples:
+        print("No requests completed")
+        return 1
+    report = summarize(recorder.samples, elapsed)
+    rss_mb = {str(pid): value / (1024 * 1024) for pid, value in rss.peak.items()}
+    breaches = check_slo(report, rss_mb, load_slo(args.slo_file, args.slo))
+
+    if args.json:
+        print(json.dumps({"endpoints": report, "rss_mb": rss_mb, "breaches": breaches}, indent=2))
+    else:
+        mode = f"open loop {args.rate}/s" if args.rate else f"closed loop x{args.concurrency}"
+        print(f"{mode}, {elapsed:.1f}s measured, workers={args.workers} threads={args.threads}\n")
+        print(f"{'endpoint':<10}{'requests':>9}{'rps':>9}{'p50_ms':>9}{'p95_ms':>9}"
+              f"{'p99_ms':>9}{'errors':>8}{'shed':>8}")
+        for endpoint, r in sorted(report.items(), key=lambda item: item[0] == "all"):
+            print(
+                f"{endpoint:<10}{r['requests']:>9}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}"
+                f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['error_rate']:>8.1%}{r['shed_rate']:>8.1%}"
+            )
+        print("\npeak RSS: " + ", ".join(f"{pid}={mb:.0f}MB" for pid, mb in rss_mb.items()))
+        for name, limit, value in breaches:
+            print(f"SLO BREACH {name}: {value:.2f} > {limit:.2f}")
+    return 1 if breaches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
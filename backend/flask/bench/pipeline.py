@@ -0,0 +1,275 @@
+"""
+Upload Pipeline Benchmark
+Offline latency / throughput of the upload path against src.fakes, compared with stored baselines
+
+Gemini, Firestore and Storage are replaced by fakes with fixed latencies, so
+results reflect our own overhead plus how well the stages overlap. Run from
+backend/flask:
+
+    python bench/pipeline.py                     # compare with bench/baselines.json
+    python bench/pipeline.py --update-baselines  # record new baselines
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import PIL.Image  # noqa: E402
+from src import metrics  # noqa: E402
+from src.fakes import (  # noqa: E402
+    Faults,
+    FakeBucket,
+    FakeFirestore,
+    FakeGenerativeModel,
+    SAMPLE_RESPONSE_TEXT,
+)
+from src.vision_parser import VisionMenuParser, parse_response_text  # noqa: E402
+from src.firebase_uploader import FirebaseUploader  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Simulated service latencies (seconds)
+GEMINI_LATENCY = 0.05
+STORAGE_LATENCY = 0.02
+FIRESTORE_LATENCY = 0.005
+
+STAGES = ("preprocess", "storage_upload", "gemini_call", "json_parse", "firestore_add")
+
+
+def make_image(seed, size=(640, 480)):
+    """Distinct noisy PNG per seed so the parse cache never hits"""
+    rng = random.Random(seed)
+    img = PIL.Image.frombytes("RGB", size, rng.randbytes(size[0] * size[1] * 3))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def make_uploader(failure_rate=0.0, seed=0):
+    model = FakeGenerativeModel(faults=Faults(GEMINI_LATENCY, failure_rate=failure_rate, seed=seed))
+    parser = VisionMenuParser(model=model)
+    parser.cache = None
+    return FirebaseUploader(
+        db=FakeFirestore(Faults(FIRESTORE_LATENCY, failure_rate=failure_rate, seed=seed + 1)),
+        bucket=FakeBucket(faults=Faults(STORAGE_LATENCY, failure_rate=failure_rate, seed=seed + 2)),
+        parser=parser,
+    )
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples):
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+    }
+
+
+def stage_snapshot():
+    return {
+        stage: (metrics.STAGE_SECONDS.count(stage=stage), metrics.STAGE_SECONDS.sum(stage=stage))
+        for stage in STAGES
+    }
+
+
+def stage_means(before, after):
+    """Mean milliseconds per stage between two snapshots"""
+    means = {}
+    for stage in STAGES:
+        count = after[stage][0] - before[stage][0]
+        if count:
+            means[f"{stage}_ms"] = (after[stage][1] - before[stage][1]) / count * 1000
+    return means
+
+
+def bench_response_cleaning(iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse_response_text(SAMPLE_RESPONSE_TEXT)
+    elapsed = time.perf_counter() - start
+    return {"us_per_call": elapsed / iterations * 1e6, "calls_per_s": iterations / elapsed}
+
+
+def bench_parse_deal(images):
+    model = FakeGenerativeModel()  # no latency: measures our own overhead
+    parser = VisionMenuParser(model=model)
+    parser.cache = None
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        parser.parse_deal(image)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def bench_upload_deal(images):
+    uploader = make_uploader()
+    before = stage_snapshot()
+    samples = []
+    for i, image in enumerate(images):
+        start = time.perf_counter()
+        uploader.upload_deal(image, filename=f"bench_{i}.png")
+        samples.append(time.perf_counter() - start)
+    result = latency_summary(samples)
+    result["uploads_per_s"] = len(images) / sum(samples)
+    result.update(stage_means(before, stage_snapshot()))
+    return result
+
+
+def bench_batch_upload(images, workers, failure_rate):
+    uploader = make_uploader(failure_rate=failure_rate, seed=42)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i, image in enumerate(images):
+            path = os.path.join(tmp, f"bench_{i}.png")
+            with open(path, "wb") as f:
+                f.write(image)
+            paths.append(path)
+
+        start = time.perf_counter()
+        # The image set repeats; parse every copy rather than skip duplicates
+        results = uploader.batch_upload(
+            paths,
+            workers=workers,
+            base_delay=0.01,
+            skip_duplicates=False,
+            progress=lambda *args: None,
+        )
+        elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    return {
+        "images_per_s": len(images) / elapsed,
+        "elapsed_s": elapsed,
+        "success_rate": succeeded / len(images),
+    }
+
+
+def bench_route(images):
+    import endpoints.routes as routes
+    from src.app import app
+
+    routes._uploader = make_uploader()
+    client = app.test_client()
+    samples = []
+    statuses = set()
+    for i, image in enumerate(images):
+        start = time.perf_counter()
+        response = client.post(
+            "/upload-deal",
+            data={"image": (io.BytesIO(image), f"bench_{i}.png")},
+            content_type="multipart/form-data",
+        )
+        samples.append(time.perf_counter() - start)
+        statuses.add(response.status_code)
+    result = latency_summary(samples)
+    result["ok"] = statuses == {200}
+    return result
+
+
+# Metrics compared against baselines: (benchmark, key) -> higher_is_better
+TRACKED = {
+    ("response_cleaning", "calls_per_s"): True,
+    ("parse_deal", "p50_ms"): False,
+    ("upload_deal", "p50_ms"): False,
+    ("upload_deal", "p95_ms"): False,
+    ("batch_upload", "images_per_s"): True,
+    ("batch_upload_flaky", "success_rate"): True,
+    ("route_upload_deal", "p50_ms"): False,
+}
+
+
+def compare(results, baselines, tolerance):
+    """
+    Returns:
+        list: (name, baseline, current, change, regressed) rows
+    """
+    rows = []
+    for (bench, key), higher_is_better in TRACKED.items():
+        baseline = baselines.get(bench, {}).get(key)
+        current = results.get(bench, {}).get(key)
+        if baseline is None or current is None:
+            continue
+        change = (current - baseline) / baseline if baseline else 0.0
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        rows.append((f"{bench}.{key}", baseline, current, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline upload pipeline benchmark")
+    parser.add_argument("--images", type=int, default=20, help="Images per benchmark (default: 20)")
+    parser.add_argument("--workers", type=int, default=8, help="batch_upload workers (default: 8)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression before failing (default: 0.25)",
+    )
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Baselines JSON file")
+    parser.add_argument("--update-baselines", action="store_true", help="Write results as the new baselines")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)  # injected failures are expected here
+    os.environ.setdefault("IMAGE_PREPROCESS_ENABLED", "1")
+
+    images = [make_image(seed) for seed in range(args.images)]
+    results = {
+        "response_cleaning": bench_response_cleaning(20000),
+        "parse_deal": bench_parse_deal(images),
+        "upload_deal": bench_upload_deal(images),
+        "batch_upload": bench_batch_upload(images * 2, args.workers, 0.0),
+        "batch_upload_flaky": bench_batch_upload(images * 2, args.workers, 0.05),
+        "route_upload_deal": bench_route(images),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for bench, values in results.items():
+            formatted = ", ".join(
+                f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items()
+            )
+            print(f"{bench:<20} {formatted}")
+
+    if args.update_baselines:
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaselines written to {args.baselines}")
+        return 0
+
+    if not os.path.exists(args.baselines):
+        print("\nNo baselines yet; run with --update-baselines")
+        return 0
+
+    with open(args.baselines, "r", encoding="utf-8") as f:
+        baselines = json.load(f)
+
+    print(f"\n{'metric':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    failed = False
+    for name, baseline, current, change, regressed in compare(results, baselines, args.tolerance):
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<34}{baseline:>12.2f}{current:>12.2f}{change:>+10.1%}{flag}")
+        failed = failed or regressed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
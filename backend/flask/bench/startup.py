@@ -0,0 +1,167 @@
+"""
+Startup Benchmark
+Per-module import time and time-to-first-response for /health and /upload-deal
+
+Every measurement runs in a fresh interpreter so nothing is already imported,
+the way a serverless cold start sees it. Run from backend/flask:
+
+    python bench/startup.py --repeat 5
+"""
+
+import os
+import io
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "flask",
+    "numpy",
+    "PIL.Image",
+    "firebase_admin.firestore",
+    "google.generativeai",
+    "src.vision_parser",
+    "src.venue_search",
+    "src.firebase_uploader",
+    "endpoints.routes",
+    "src.app",
+]
+
+IMPORT_SNIPPET = """
+import sys, time, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Import the app, then time the first request to one endpoint
+FIRST_RESPONSE_SNIPPET = """
+import io, os, sys, json, time, contextlib, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from src.app import app
+    imported = time.perf_counter()
+    client = app.test_client()
+    if {endpoint!r} == "/health":
+        response = client.get("/health")
+    else:
+        with open({image!r}, "rb") as f:
+            response = client.post(
+                "/upload-deal",
+                data={{"image": (f, "bench.png")}},
+                content_type="multipart/form-data",
+            )
+done = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "first_response": done - imported,
+    "total": done - start,
+    "status": response.status_code,
+}}))
+"""
+
+
+def run_snippet(code, env=None):
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=env,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+    return out.stdout.strip().splitlines()[-1]
+
+
+def bench_imports(repeat):
+    """Median cold import time (seconds) per module; None if it cannot be imported"""
+    results = {}
+    for module in MODULES:
+        samples = []
+        for _ in range(repeat):
+            try:
+                samples.append(float(run_snippet(IMPORT_SNIPPET.format(root=ROOT, module=module))))
+            except RuntimeError as e:
+                print(f"[WARNING] import {module} failed: {e}")
+                break
+        results[module] = statistics.median(samples) if samples else None
+    return results
+
+
+def bench_first_response(endpoint, image_path, repeat, env=None):
+    """Median import / first-response / total seconds for one endpoint"""
+    samples = []
+    for _ in range(repeat):
+        code = FIRST_RESPONSE_SNIPPET.format(root=ROOT, endpoint=endpoint, image=image_path)
+        samples.append(json.loads(run_snippet(code, env=env)))
+    summary = {
+        key: statistics.median(s[key] for s in samples)
+        for key in ("import", "first_response", "total")
+    }
+    summary["status"] = samples[-1]["status"]
+    return summary
+
+
+def sample_image(path):
+    import PIL.Image
+
+    buf = io.BytesIO()
+    PIL.Image.new("RGB", (640, 480), (200, 120, 40)).save(buf, "PNG")
+    with open(path, "wb") as f:
+        f.write(buf.getvalue())
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start cost of the Flask app")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (default: 3)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument(
+        "--warmup", action="store_true", help="Also measure with WARMUP_ON_START=1"
+    )
+    args = parser.parse_args()
+
+    image_path = sample_image(os.path.join(ROOT, "bench", ".startup_sample.png"))
+    try:
+        report = {"imports": bench_imports(args.repeat), "endpoints": {}}
+        for endpoint in ("/health", "/upload-deal"):
+            report["endpoints"][endpoint] = bench_first_response(
+                endpoint, image_path, args.repeat
+            )
+        if args.warmup:
+            env = dict(os.environ, WARMUP_ON_START="1")
+            report["endpoints"]["/health (warmup)"] = bench_first_response(
+                "/health", image_path, args.repeat, env=env
+            )
+    finally:
+        os.remove(image_path)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'module':<28}{'import (ms)':>12}")
+    for module, seconds in report["imports"].items():
+        value = f"{seconds * 1000:.1f}" if seconds is not None else "n/a"
+        print(f"{module:<28}{value:>12}")
+    print()
+    print(f"{'endpoint (ms)':<22}{'import':>10}{'first req':>12}{'total':>10}{'status':>8}")
+    for endpoint, r in report["endpoints"].items():
+        print(
+            f"{endpoint:<22}{r['import'] * 1000:>10.1f}{r['first_response'] * 1000:>12.1f}"
+            f"{r['total'] * 1000:>10.1f}{r['status']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# endpoints/async_routes.py
+# Quart (ASGI) counterpart of the upload route in endpoints/routes.py
+import os
+import math
+import asyncio
+import logging
+from quart import Blueprint, jsonify, request
+from werkzeug.utils import secure_filename
+from src.metrics import span, BYTES_IN
+from src.admission import Overloaded
+from src.upload_stream import sniff_image_type
+from endpoints.routes import (
+    ALLOWED_EXTENSIONS,
+    allowed_file,
+    venue_fields_from_form,
+    duplicate_response,
+    get_uploader,
+)
+
+logger = logging.getLogger(__name__)
+
+async_api_bp = Blueprint("async_api", __name__)
+
+_async_uploader = None
+_async_uploader_lock = asyncio.Lock()
+
+
+async def get_async_uploader():
+    """
+    Shared AsyncFirebaseUploader over the sync uploader from endpoints.routes
+
+    Returns:
+        AsyncFirebaseUploader or None: None when Firebase cannot be initialized
+    """
+    global _async_uploader
+    if _async_uploader is not None:
+        return _async_uploader
+    async with _async_uploader_lock:
+        if _async_uploader is None:
+            # First call connects to Firebase: keep that off the event loop
+            uploader = await asyncio.to_thread(get_uploader)
+            if uploader is None:
+                return None
+            try:
+                from src.async_uploader import AsyncFirebaseUploader
+
+                _async_uploader = AsyncFirebaseUploader(uploader)
+            except Exception as e:
+                logger.error("Failed to initialize async Firestore client: %s", e)
+    return _async_uploader
+
+
+def overloaded_response(error):
+    """429 / 503 with Retry-After (see endpoints.routes.overloaded_response)"""
+    body = {"success": False, "error": str(error), "retry_after": round(error.retry_after, 1)}
+    headers = {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    return jsonify(body), error.status, headers
+
+
+@async_api_bp.route("/upload-deal", methods=["POST"])
+async def upload_deal():
+    """
+    Same request and responses as the Flask /upload-deal, without async=1
+
+    Background jobs belong to the WSGI app's job queue; here every upload is
+    awaited in the request, which no longer ties up a worker thread.
+    """
+    uploader = await get_async_uploader()
+    if not uploader:
+        return jsonify(
+            {"success": False, "error": "Firebase uploader not initialized"}
+        ), 500
+
+    try:
+        uploader.check_admission()
+    except Overloaded as e:
+        logger.warning("Shedding upload: %s", e)
+        return overloaded_response(e)
+
+    files = await request.files
+    form = await request.form
+
+    if "image" not in files:
+        return jsonify({"success": False, "error": "No image provided"}), 400
+
+    files = files.getlist("image")
+    max_images = int(os.getenv("UPLOAD_MAX_IMAGES", 8))
+    if len(files) > max_images:
+        return jsonify(
+            {"success": False, "error": f"At most {max_images} images per upload"}
+        ), 400
+
+    for file in files:
+        if file.filename == "":
+            return jsonify({"success": False, "error": "No selected file"}), 400
+        if not allowed_file(file.filename):
+            return jsonify(
+                {
+                    "success": False,
+                    "error": f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
+                }
+            ), 400
+
+    collection = form.get("collection", "final_schema")
+    venue_fields = venue_fields_from_form(form)
+    filenames = [secure_filename(file.filename) for file in files]
+    force = (form.get("force") or request.args.get("force", "")).lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    with span("file_receive"):
+        images = [file.read() for file in files]
+    BYTES_IN.inc(sum(len(image) for image in images), source="request")
+    if not all(images):
+        return jsonify({"success": False, "error": "Empty image upload"}), 400
+    if not all(sniff_image_type(image) for image in images):
+        return jsonify(
+            {"success": False, "error": "Upload is not a PNG, JPEG, GIF or WebP image"}
+        ), 415
+
+    from src.firebase_uploader import DuplicateImage
+
+    try:
+        doc_id, uploaded_data = await uploader.create_combined_deal(
+            images,
+            collection=collection,
+            filenames=filenames,
+            extra_fields=venue_fields,
+            reject_duplicates=not force,
+        )
+        return jsonify(
+            {
+                "success": True,
+                "document_id": doc_id,
+                "data": {"id": doc_id, **uploaded_data},
+                "message": "Deals uploaded and processed successfully",
+            }
+        ), 200
+
+    except DuplicateImage as dup:
+        return jsonify(duplicate_response(dup)), 200
+
+    except Overloaded as e:
+        logger.warning("Upload refused by admission control: %s", e)
+        return overloaded_response(e)
+
+    except Exception as e:
+        logger.error("Upload failed: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 422
+
+
+@async_api_bp.get("/warmup")
+async def warmup():
+    """Build the clients ahead of traffic (see endpoints.routes.warmup)"""
+    from endpoints.routes import warm_up
+
+    collection = request.args.get("collection", "final_schema")
+    timings = await asyncio.to_thread(warm_up, collection)
+    uploader = await get_async_uploader()
+    return jsonify(
+        {
+            "success": uploader is not None,
+            "timings": {k: round(v, 4) for k, v in timings.items()},
+        }
+    ), 200
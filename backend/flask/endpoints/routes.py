@@ -1,30 +1,274 @@
 # endpoints/routes.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
 import os
-from werkzeug.utils import secure_filename
+import json
+import math
+import time
+import logging
+import threading
 from datetime import datetime
-from src.firebase_uploader import FirebaseUploader
+from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from src.jobs import JobQueue, JobQueueFull
+from src.metrics import span, BYTES_IN
+from src.admission import Overloaded
+from src.retry import retry_call
+from src.upload_stream import IngestStream
+from src.ndjson_export import ndjson_chunks, gzip_chunks, accepts_gzip
+from src.projection import (
+    parse_fields,
+    select_paths,
+    project,
+    document_etag,
+    list_etag,
+)
 import sys
 
 sys.path.insert(
     0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
+logger = logging.getLogger(__name__)
+
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
-UPLOAD_FOLDER = "/tmp"
+
+# Async upload jobs skip load shedding; while Gemini is saturated they wait
+# for capacity (honoring Overloaded.retry_after) instead of failing
+JOB_ADMISSION_ATTEMPTS = 8
+JOB_ADMISSION_MAX_DELAY = 60.0
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def parse_timestamp(value):
+    """Epoch seconds or ISO 8601 string -> datetime / float (None means now)"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def venue_fields_from_form(form):
+    """Collect venue_name / venue_address (JSON string) / latitude / longitude form fields"""
+    venue_fields = {}
+
+    venue_name = form.get("venue_name")
+    if venue_name:
+        venue_fields["venue_name"] = venue_name
+
+    venue_address = form.get("venue_address")  # Expecting JSON string
+    if venue_address:
+        try:
+            venue_fields["address"] = json.loads(venue_address)
+        except json.JSONDecodeError:
+            logger.warning("Invalid venue_address JSON, skipping")
+
+    # Optional venue coordinates (match uploads to nearby venues of the same name)
+    try:
+        lat = float(form["latitude"])
+        lon = float(form["longitude"])
+    except (KeyError, ValueError):
+        pass
+    else:
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            venue_fields["latitude"] = lat
+            venue_fields["longitude"] = lon
+
+    return venue_fields
+
+
 api_bp = Blueprint("api", __name__)
 
-uploader = None
-try:
-    uploader = FirebaseUploader()
-except Exception as e:
-    print(f"[ERROR] Failed to initialize Firebase uploader: {e}")
+# Built on first use so cold starts (and /health) skip firebase_admin, Gemini and PIL
+_uploader = None
+_uploader_lock = threading.Lock()
+
+job_queue = JobQueue.from_env()
+
+
+def get_uploader():
+    """
+    Shared FirebaseUploader, initialized on first call
+
+    Returns:
+        FirebaseUploader or None: None when Firebase cannot be initialized
+                                  (retried on the next call)
+    """
+    global _uploader
+    if _uploader is not None:
+        return _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            try:
+                from src.firebase_uploader import FirebaseUploader
+                from src.venue_search import apply_venue_write
+
+                instance = FirebaseUploader()
+                instance.add_write_listener(apply_venue_write)
+                if instance.replica is not None:
+                    instance.replica.start(
+                        instance, interval=float(os.getenv("REPLICA_SYNC_INTERVAL", 5))
+                    )
+                _uploader = instance
+            except Exception as e:
+                logger.error("Failed to initialize Firebase uploader: %s", e)
+    return _uploader
+
+
+def warm_up(collection="final_schema"):
+    """
+    Initialize the uploader, Gemini parser and venue index ahead of traffic
+
+    Returns:
+        dict: Seconds spent per step
+    """
+    from src.venue_search import get_venue_search
+
+    timings = {}
+    start = time.perf_counter()
+    uploader = get_uploader()
+    timings["uploader"] = time.perf_counter() - start
+
+    if uploader is not None:
+        start = time.perf_counter()
+        try:
+            uploader.parser
+        except Exception as e:
+            logger.error("Failed to initialize Gemini parser: %s", e)
+        timings["parser"] = time.perf_counter() - start
+
+        # No persisted hash index yet: rebuild it from the stored documents
+        if uploader.dedupe is not None and not len(uploader.dedupe):
+            start = time.perf_counter()
+            try:
+                uploader.dedupe.backfill(
+                    uploader.iter_restaurants(
+                        collection, fields=["metadata.image_hashes"]
+                    )
+                )
+            except Exception as e:
+                logger.warning("Could not backfill image hash index: %s", e)
+            timings["image_hashes"] = time.perf_counter() - start
+
+        # Same for the venue resolution index
+        if uploader.venues is not None and not len(uploader.venues):
+            start = time.perf_counter()
+            try:
+                uploader.venues.backfill(
+                    uploader.iter_restaurants(
+                        collection,
+                        fields=[
+                            "venue_name",
+                            "restaurant_name",
+                            "address",
+                            "latitude",
+                            "longitude",
+                        ],
+                    ),
+                    collection,
+                )
+            except Exception as e:
+                logger.warning("Could not backfill venue index: %s", e)
+            timings["venue_resolver"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_venue_search(uploader, collection=collection)
+    timings["venue_index"] = time.perf_counter() - start
+    return timings
+
+
+def duplicate_response(dup):
+    """/upload-deal body for an image that matched a stored document"""
+    return {
+        "success": True,
+        "document_id": dup.doc_id,
+        "data": {**dup.data, "id": dup.doc_id},
+        "duplicate": True,
+        "hash_distance": dup.distance,
+        "message": "Matches an existing deal; nothing was re-processed",
+    }
+
+
+def overloaded_response(error):
+    """429 / 503 with Retry-After for work refused by admission control"""
+    response = jsonify(
+        {
+            "success": False,
+            "error": str(error),
+            "retry_after": round(error.retry_after, 1),
+        }
+    )
+    response.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return response, error.status
+
+
+@api_bp.errorhandler(RequestEntityTooLarge)
+@api_bp.errorhandler(UnsupportedMediaType)
+def upload_rejected(error):
+    """Oversized or non-image uploads, refused while the body is still streaming in"""
+    return jsonify({"success": False, "error": error.description}), error.code
+
+
+def not_modified(etag):
+    """
+    304 for a conditional GET whose If-None-Match already has this ETag
+
+    Returns:
+        Response or None: None when the full body has to be sent
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def tagged_response(body, etag):
+    """200 JSON response carrying a strong ETag"""
+    response = jsonify(body)
+    response.set_etag(etag)
+    return response, 200
+
+
+def invalid_fields(error):
+    return jsonify({"success": False, "error": str(error)}), 400
+
+
+def process_upload_job(
+    images, collection, filenames, venue_fields, reject_duplicates=False
+):
+    """Background job body for async /upload-deal requests"""
+    from src.firebase_uploader import DuplicateImage
+
+    try:
+        # Admission is checked before any Storage work, so a refused try is safe to repeat
+        doc_id, uploaded_data = retry_call(
+            get_uploader().create_combined_deal,
+            images,
+            attempts=JOB_ADMISSION_ATTEMPTS,
+            max_delay=JOB_ADMISSION_MAX_DELAY,
+            is_retryable=lambda e: isinstance(e, Overloaded),
+            collection=collection,
+            filenames=filenames,
+            extra_fields=venue_fields,
+            reject_duplicates=reject_duplicates,
+        )
+    except DuplicateImage as dup:
+        return {
+            "document_id": dup.doc_id,
+            "data": {**dup.data, "id": dup.doc_id},
+            "duplicate": True,
+            "hash_distance": dup.distance,
+        }
+    return {
+        "document_id": doc_id,
+        "data": {"id": doc_id, **uploaded_data},
+        "merged": (uploaded_data.get("metadata") or {}).get("upload_count", 1) > 1,
+    }
 
 
 @api_bp.get("/api/data")
@@ -62,110 +306,517 @@ def upload_deal():
     Upload deal image, process with Gemini Vision, and upload to Firebase
 
     Request:
-        - image: Image file (multipart/form-data)
+        - image: Image file (multipart/form-data); repeat the field (up to
+                 UPLOAD_MAX_IMAGES, default 8) to send several photos of one
+                 menu, which are read together and stored as one document
         - collection: Optional Firestore collection name
         - venue_name: Optional venue name (form data)
         - venue_address: Optional venue address JSON string (form data)
+        - latitude, longitude: Optional venue coordinates (form data)
+        - async: Optional "1"/"true" (form or query) to queue the work and
+                 return 202 immediately; poll GET /jobs/<job_id> for the result
+        - force: Optional "1"/"true" to process even when the image is a
+                 near-duplicate of a stored one (otherwise that document is
+                 returned with "duplicate": true)
+        - fields: Optional comma-separated field paths; "data" in the response
+                  only carries these (and "id")
 
     Response:
         {
       "success": true,
             "document_id": "abc123",
             "data": { extracted deal data },
+            "merged": false,
             "message": "deal uploaded successfully"
         }
+
+        An upload for a venue that already has a document (same normalized
+        address, or same name nearby) is added to that document: document_id
+        is the existing venue and "merged" is true.
+
+    Async response (202):
+        {
+            "success": true,
+            "job_id": "f3c1...",
+            "status_url": "/jobs/f3c1..."
+        }
     """
-    print("[DEBUG] Received upload request")
-    print("[DEBUG] request.files: {request.files}")
-    print("[DEBUG] request.form: {request.form}")
+    logger.debug("Upload request: files=%s form=%s", request.files, request.form)
 
+    uploader = get_uploader()
     if not uploader:
         return jsonify(
             {"success": False, "error": "Firebase uploader not initialized"}
         ), 500
 
+    # Shed load before reading the body (request.files consumes all of it).
+    # async=1 in the query string skips this: the job queue absorbs bursts and
+    # the job waits for capacity (process_upload_job).
+    if request.args.get("async", "").lower() not in ("1", "true", "yes"):
+        try:
+            uploader.check_admission()
+        except Overloaded as e:
+            logger.warning("Shedding upload: %s", e)
+            return overloaded_response(e)
+
     # Check if image is in request
     if "image" not in request.files:
-        print(
-            f"[ERROR] No image in request.files. Available keys: {list(request.files.keys())}"
+        logger.warning(
+            "No image in request.files. Available keys: %s", list(request.files.keys())
         )
         return jsonify({"success": False, "error": "No image provided"}), 400
 
-    file = request.files["image"]
-
-    if file.filename == "":
-        print("[ERROR] Empty filename")
-        return jsonify({"success": False, "error": "No selected file"}), 400
-
-    if not allowed_file(file.filename):
-        print("[ERROR] Invalid file type: {file.filename}")
+    # Several "image" parts = photos of one menu, combined into one document
+    files = request.files.getlist("image")
+    max_images = int(os.getenv("UPLOAD_MAX_IMAGES", 8))
+    if len(files) > max_images:
         return jsonify(
-            {
-                "success": False,
-                "error": f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
-            }
+            {"success": False, "error": f"At most {max_images} images per upload"}
         ), 400
 
-    # Get collection parameter
-    collection = request.form.get("collection", "final_schema")
-
-    # Get venue information from form data
-    venue_name = request.form.get("venue_name")
-    venue_address = request.form.get("venue_address")  # Expecting JSON string
-
-    # Save file temporarily
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filepath = os.path.join(UPLOAD_FOLDER, f"{timestamp}_{filename}")
+    for file in files:
+        if file.filename == "":
+            logger.warning("Empty filename")
+            return jsonify({"success": False, "error": "No selected file"}), 400
 
-    try:
-        file.save(filepath)
-        print(f"[OK] Saved image to: {filepath}")
+        if not allowed_file(file.filename):
+            logger.warning("Invalid file type: %s", file.filename)
+            return jsonify(
+                {
+                    "success": False,
+                    "error": f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
+                }
+            ), 400
 
-        # Process and upload to Firebase with Gemini Vision
-        doc_id = uploader.upload_deal(filepath, collection=collection)
+    # Get collection parameter
+    collection = request.form.get("collection", "final_schema")
 
-        # If venue information is provided, update the document
-        if venue_name or venue_address:
-            import json
+    # Venue information from the form goes into the first (and only) write
+    venue_fields = venue_fields_from_form(request.form)
 
-            venue_updates = {}
+    filenames = [secure_filename(file.filename) for file in files]
 
-            if venue_name:
-                venue_updates["venue_name"] = venue_name
+    # Re-sent or re-compressed copies of a stored flyer are answered with the
+    # existing document instead of another Storage upload and Gemini call
+    force = request.values.get("force", "").lower() in ("1", "true", "yes")
 
-            if venue_address:
-                try:
-                    address_data = json.loads(venue_address)
-                    venue_updates["address"] = address_data
-                except json.JSONDecodeError:
-                    print("[WARNING] Invalid venue_address JSON, skipping")
+    run_async = request.values.get("async", "").lower() in ("1", "true", "yes")
 
-            if venue_updates:
-                uploader.update_deal(doc_id, venue_updates, collection=collection)
-                print(f"[OK] Updated venue information for {doc_id}")
+    # Projection of the returned document (the stored one is always complete)
+    try:
+        fields = parse_fields(request.values.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+
+    # Parts were streamed in, hashed and size-checked by src.upload_stream;
+    # the type check by magic bytes already ran for all but the tiniest parts
+    streams = [file.stream for file in files]
+    for stream in streams:
+        if isinstance(stream, IngestStream) and stream.size:
+            stream.verify()
+
+    with span("file_receive"):
+        if run_async:
+            # The job outlives the request and its spooled files: keep the bytes
+            images = [file.read() for file in files]
+        else:
+            # The preprocessor decodes straight from the spool (no full copy)
+            images = [
+                stream if isinstance(stream, IngestStream) else file.read()
+                for stream, file in zip(streams, files)
+            ]
+    sizes = [image.size if isinstance(image, IngestStream) else len(image) for image in images]
+    BYTES_IN.inc(sum(sizes), source="request")
+    if not all(sizes):
+        return jsonify({"success": False, "error": "Empty image upload"}), 400
+
+    if run_async:
+        try:
+            job_id = job_queue.submit(
+                process_upload_job,
+                images,
+                collection,
+                filenames,
+                venue_fields,
+                not force,
+            )
+        except JobQueueFull:
+            response = jsonify(
+                {"success": False, "error": "Upload queue is full, retry later"}
+            )
+            response.headers["Retry-After"] = "5"
+            return response, 503
+
+        status_url = url_for("api.get_job", job_id=job_id)
+        response = jsonify(
+            {"success": True, "job_id": job_id, "status_url": status_url}
+        )
+        response.headers["Location"] = status_url
+        return response, 202
 
-        # Get the uploaded data
-        uploaded_data = uploader.get_restaurant(doc_id, collection=collection)
+    from src.firebase_uploader import DuplicateImage
 
-        # Clean up temp file
-        os.remove(filepath)
-        print(f"[OK] Cleaned up temp file: {filepath}")
+    try:
+        # Process and upload to Firebase with Gemini Vision
+        doc_id, uploaded_data = uploader.create_combined_deal(
+            images,
+            collection=collection,
+            filenames=filenames,
+            extra_fields=venue_fields,
+            reject_duplicates=not force,
+        )
 
+        # Deals for a venue that already has a document were added to it
+        merged = (uploaded_data.get("metadata") or {}).get("upload_count", 1) > 1
         return jsonify(
             {
                 "success": True,
                 "document_id": doc_id,
-                "data": uploaded_data,
-                "message": "Deals uploaded and processed successfully",
+                "data": project({"id": doc_id, **uploaded_data}, fields),
+                "merged": merged,
+                "message": "Deals added to existing venue"
+                if merged
+                else "Deals uploaded and processed successfully",
             }
         ), 200
 
-    except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(filepath):
-            os.remove(filepath)
+    except DuplicateImage as dup:
+        body = duplicate_response(dup)
+        body["data"] = project(body["data"], fields)
+        return jsonify(body), 200
+
+    except Overloaded as e:
+        logger.warning("Upload refused by admission control: %s", e)
+        return overloaded_response(e)
 
-        print(f"[ERROR] Upload failed: {str(e)}")
+    except Exception as e:
+        logger.error("Upload failed: %s", e)
         return jsonify({"success": False, "error": str(e)}), 422
+
+
+@api_bp.get("/jobs/<job_id>")
+def get_job(job_id):
+    """
+    Status of an async upload job
+
+    Response:
+        {
+            "success": true,
+            "job": {
+                "id": "f3c1...",
+                "status": "queued" | "running" | "succeeded" | "failed",
+                "result": { "document_id": ..., "data": ... } or null,
+                "error": null
+            }
+        }
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job}), 200
+
+
+@api_bp.get("/get-menu/<document_id>")
+def get_menu(document_id):
+    """
+    One stored menu document
+
+    Query params:
+        - collection: Optional Firestore collection name
+        - fields: Optional comma-separated field paths (e.g. venue_name,deals);
+                  only these are read from Firestore and returned
+
+    Response (with an ETag; 304 when If-None-Match matches):
+        { "success": true, "data": { "id": "abc123", ...fields } }
+    """
+    uploader = get_uploader()
+    if not uploader:
+        return jsonify(
+            {"success": False, "error": "Firebase uploader not initialized"}
+        ), 500
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+
+    collection = request.args.get("collection", "final_schema")
+    doc = uploader.get_restaurant(document_id, collection, fields=select_paths(fields))
+    if doc is None:
+        return jsonify({"success": False, "error": "Menu not found"}), 404
+
+    etag = document_etag(doc, fields)
+    return not_modified(etag) or tagged_response(
+        {"success": True, "data": project(doc, fields)}, etag
+    )
+
+
+@api_bp.get("/get-all-menus")
+def get_all_menus():
+    """
+    Stored menu documents in ID order
+
+    Query params:
+        - collection: Optional Firestore collection name
+        - limit: Optional maximum number of documents
+        - fields: Optional comma-separated field paths, pushed down to select()
+
+    Response (with an ETag; 304 when If-None-Match matches):
+        { "success": true, "count": 2, "data": [{ "id": ..., ...fields }] }
+    """
+    uploader = get_uploader()
+    if not uploader:
+        return jsonify(
+            {"success": False, "error": "Firebase uploader not initialized"}
+        ), 500
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+    try:
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be a number"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"success": False, "error": "limit must be positive"}), 400
+
+    collection = request.args.get("collection", "final_schema")
+    docs = uploader.get_all_restaurants(
+        collection, limit=limit, fields=select_paths(fields)
+    )
+
+    etag = list_etag(docs, fields)
+    return not_modified(etag) or tagged_response(
+        {
+            "success": True,
+            "count": len(docs),
+            "data": [project(doc, fields) for doc in docs],
+        },
+        etag,
+    )
+
+
+@api_bp.get("/search-restaurants-by-name")
+def search_restaurants_by_name():
+    """
+    Search venues near a point, optionally filtered by name
+
+    Query params:
+        - lat, lon: Search origin (required)
+        - name: Optional venue name filter
+        - radius: Search radius in meters (default 5000)
+        - limit: Maximum results (default 20, max 100)
+        - collection: Optional Firestore collection name
+        - fields: Optional comma-separated field paths kept per venue
+                  (e.g. venue_name,latitude,longitude,deals)
+
+    Response (with an ETag; 304 when If-None-Match matches):
+        {
+            "success": true,
+            "count": 1,
+            "data": [{ venue fields..., "distance_meters": 123.4 }]
+        }
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+    except (KeyError, ValueError):
+        return jsonify(
+            {"success": False, "error": "lat and lon query parameters are required"}
+        ), 400
+
+    try:
+        radius = float(request.args.get("radius", 5000))
+        limit = min(int(request.args.get("limit", 20)), 100)
+    except ValueError:
+        return jsonify(
+            {"success": False, "error": "radius and limit must be numbers"}
+        ), 400
+    if radius <= 0 or limit <= 0:
+        return jsonify(
+            {"success": False, "error": "radius and limit must be positive"}
+        ), 400
+
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+
+    from src.venue_search import get_venue_search
+
+    collection = request.args.get("collection", "final_schema")
+    search = get_venue_search(get_uploader(), collection=collection)
+    results = search.search(
+        lat, lon, radius, limit=limit, name=request.args.get("name")
+    )
+
+    # Same query + same venue versions = same body (distances included)
+    etag = list_etag(results, fields, key="venue_id", extra=request.query_string)
+    return not_modified(etag) or tagged_response(
+        {
+            "success": True,
+            "count": len(results),
+            "data": [project(venue, fields) for venue in results],
+        },
+        etag,
+    )
+
+
+@api_bp.get("/active-deals")
+def active_deals():
+    """
+    Deals running at a moment (default: now)
+
+    Query params:
+        - at: Epoch seconds or ISO 8601 timestamp (naive times are local)
+        - venue_ids: Optional comma-separated venue IDs to restrict to
+        - lat, lon, radius: Optional area filter (radius in meters, default 5000)
+        - collection: Optional Firestore collection name
+        - fields: Optional comma-separated deal fields to keep (e.g. name,price,venue_id)
+
+    Response:
+        {
+            "success": true,
+            "count": 1,
+            "data": [{ deal fields..., "deal_id": "v1:0", "venue_id": "v1", "venue_name": "..." }]
+        }
+    """
+    try:
+        when = parse_timestamp(request.args.get("at"))
+    except ValueError:
+        return jsonify(
+            {"success": False, "error": "at must be epoch seconds or ISO 8601"}
+        ), 400
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+
+    from src.venue_search import get_venue_search
+
+    collection = request.args.get("collection", "final_schema")
+    search = get_venue_search(get_uploader(), collection=collection)
+
+    venue_ids = None
+    if request.args.get("venue_ids"):
+        venue_ids = {v for v in request.args["venue_ids"].split(",") if v}
+
+    if "lat" in request.args or "lon" in request.args:
+        try:
+            lat = float(request.args["lat"])
+            lon = float(request.args["lon"])
+            radius = float(request.args.get("radius", 5000))
+        except (KeyError, ValueError):
+            return jsonify(
+                {"success": False, "error": "lat, lon and radius must be numbers"}
+            ), 400
+        nearby = {v["venue_id"] for v in search.search(lat, lon, radius, limit=None)}
+        venue_ids = nearby if venue_ids is None else venue_ids & nearby
+
+    results = search.active_deals(when, venue_ids)
+    if fields:
+        results = [project(deal, fields) for deal in results]
+    return jsonify({"success": True, "count": len(results), "data": results}), 200
+
+
+@api_bp.get("/export/venues")
+def export_venues():
+    """
+    Stream every venue document as newline-delimited JSON
+
+    Documents are read from Firestore one page at a time and written out as
+    they arrive, so memory stays flat regardless of collection size.
+
+    Query params:
+        - collection: Optional Firestore collection name
+        - since: Optional ISO timestamp; only documents whose metadata.updated_at
+                 is later are exported, oldest change first
+        - cursor: Optional document ID to resume after (the id of the last
+                  line received; with since, pass that line's updated_at as since)
+        - page_size: Documents per Firestore query (default 500, max 1000)
+        - gzip: "0" to disable compression (default: gzip when accepted)
+        - shape: "frontend" for FrontendVenueWithDeals lines (deals flattened
+                 per time window, as in shared-schemas.ts); default is the stored document
+        - fields: Optional comma-separated field paths kept per line; with the
+                  default shape they are pushed down to Firestore select()
+
+    Response:
+        application/x-ndjson, one venue per line
+    """
+    uploader = get_uploader()
+    if not uploader:
+        return jsonify(
+            {"success": False, "error": "Firebase uploader not initialized"}
+        ), 500
+
+    try:
+        page_size = min(int(request.args.get("page_size", 500)), 1000)
+    except ValueError:
+        return jsonify({"success": False, "error": "page_size must be a number"}), 400
+    if page_size <= 0:
+        return jsonify({"success": False, "error": "page_size must be positive"}), 400
+
+    collection = request.args.get("collection", "final_schema")
+    since = request.args.get("since") or None
+    cursor = request.args.get("cursor") or None
+
+    shape = request.args.get("shape", "document")
+    if shape not in ("document", "frontend"):
+        return jsonify(
+            {"success": False, "error": "shape must be 'document' or 'frontend'"}
+        ), 400
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return invalid_fields(e)
+    # Frontend lines are derived from whole documents: project them afterwards
+    read_fields = fields if shape == "document" else None
+    # Resuming with since needs each line's updated_at
+    line_fields = select_paths(fields) if since is not None else fields
+
+    if shape == "frontend":
+        from src.deal_models import frontend_venue as encode
+    else:
+        from src.venue_search import normalize_venue
+
+        def encode(doc, venue_id):
+            return normalize_venue(doc, venue_id=venue_id) or doc
+
+    def venues():
+        for doc in uploader.iter_restaurants(
+            collection,
+            page_size=page_size,
+            fields=read_fields,
+            start_after=cursor,
+            since=since,
+        ):
+            yield project(encode(doc, venue_id=doc["id"]), line_fields)
+
+    body = ndjson_chunks(venues())
+    headers = {"Vary": "Accept-Encoding", "X-Accel-Buffering": "no"}
+    if request.args.get("gzip") != "0" and accepts_gzip(
+        request.headers.get("Accept-Encoding")
+    ):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(
+        stream_with_context(body), mimetype="application/x-ndjson", headers=headers
+    )
+
+
+@api_bp.get("/warmup")
+def warmup():
+    """
+    Build the lazily initialized clients and indexes now (for platform warmers / cron)
+
+    Response:
+        { "success": true, "timings": { "uploader": 0.41, ... } }
+    """
+    collection = request.args.get("collection", "final_schema")
+    timings = warm_up(collection)
+    return jsonify(
+        {
+            "success": get_uploader() is not None,
+            "timings": {k: round(v, 4) for k, v in timings.items()},
+        }
+    ), 200
@@ -0,0 +1,358 @@
+"""
+Active Deal Index
+Deal time windows parsed once into minute-of-week intervals, bucketed into per-slot bitsets
+"""
+
+import os
+import re
+from datetime import datetime, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9 fallback keeps UTC
+    ZoneInfo = None
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+SLOT_MINUTES = 15
+SLOTS = MINUTES_PER_WEEK // SLOT_MINUTES
+
+DAY_INDEX = {
+    "monday": 0,
+    "tuesday": 1,
+    "wednesday": 2,
+    "thursday": 3,
+    "friday": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+_DAY_PREFIXES = {name[:3]: index for name, index in DAY_INDEX.items()}
+# Day words that stand for several days (a list of them means every day)
+DAY_ALIASES = {
+    "weekdays": (0, 1, 2, 3, 4),
+    "weekday": (0, 1, 2, 3, 4),
+    "weekends": (5, 6),
+    "weekend": (5, 6),
+    "daily": tuple(range(7)),
+    "everyday": tuple(range(7)),
+    "every day": tuple(range(7)),
+    "all week": tuple(range(7)),
+}
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?\s*$", re.I)
+# "close", "'til close", "until closing", "late", "late night" as a window's end
+_CLOSE_RE = re.compile(r"^(?:'?til+|until|to)?\s*(?:close|closing|late(?: night)?)$")
+_DAY_RANGE_RE = re.compile(r"\s*(?:-|\u2013|\u2014|\bthrough\b|\bthru\b|\bto\b)\s*")
+
+
+def parse_time_minutes(text):
+    """
+    Parse "4:00 PM", "4pm", "16:00", "noon" or "midnight" into minutes after midnight
+
+    Returns:
+        int or None: None when the string is not a recognizable time
+    """
+    if text is None:
+        return None
+    value = str(text).strip().lower()
+    if value == "noon":
+        return 12 * 60
+    if value == "midnight":
+        return 0
+    match = _TIME_RE.match(value)
+    if not match:
+        return None
+    hour = int(match.group(1))
+    minute = int(match.group(2) or 0)
+    meridiem = match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        return None
+    return hour * 60 + minute
+
+
+def closing_minutes():
+    """
+    DEAL_CLOSING_TIME : Time "close" / "late" window ends stand for (default 2:00 AM)
+    """
+    minutes = parse_time_minutes(os.getenv("DEAL_CLOSING_TIME", "2:00 AM"))
+    return 2 * 60 if minutes is None else minutes
+
+
+def parse_end_minutes(text):
+    """
+    parse_time_minutes for a window's end, which may also be "close" or "late"
+
+    Returns:
+        int or None: None when the string is not a recognizable end time
+    """
+    if text is not None and _CLOSE_RE.match(" ".join(str(text).lower().split())):
+        return closing_minutes()
+    return parse_time_minutes(text)
+
+
+def parse_day(name):
+    """Day name or abbreviation ("Mon", "Tues") -> 0 (Monday) .. 6 (Sunday)"""
+    key = str(name).strip().lower().rstrip(".")
+    if key in DAY_INDEX:
+        return DAY_INDEX[key]
+    return _DAY_PREFIXES.get(key[:3]) if len(key) >= 3 else None
+
+
+def parse_days(days):
+    """
+    Day indexes of a days list, with ranges and aliases expanded
+
+    Entries may be names ("Mon"), ranges ("Monday-Friday", "Fri thru Sun",
+    wrapping "Sat-Mon"), comma lists ("Mon, Wed") or aliases ("Weekdays",
+    "Daily"). A plain string is read as a one-entry list.
+
+    Returns:
+        set: 0 (Monday) .. 6 (Sunday); empty when nothing is recognizable
+    """
+    if isinstance(days, str):
+        days = [days]
+    indexes = set()
+    for entry in days or ():
+        for part in re.split(r"[,/&]|\band\b", str(entry).lower()):
+            part = " ".join(part.split())
+            if not part:
+                continue
+            if part in DAY_ALIASES:
+                indexes.update(DAY_ALIASES[part])
+                continue
+            ends = _DAY_RANGE_RE.split(part)
+            if len(ends) == 2:
+                first, last = parse_day(ends[0]), parse_day(ends[1])
+                if first is not None and last is not None:
+                    indexes.update((first + i) % 7 for i in range((last - first) % 7 + 1))
+                continue
+            day = parse_day(part)
+            if day is not None:
+                indexes.add(day)
+    return indexes
+
+
+def window_intervals(start_time, end_time, days=None):
+    """
+    Convert one time window into half-open minute-of-week intervals
+
+    A window whose end is not after its start crosses midnight and runs into
+    the next day; Sunday-night windows wrap to Monday and are split in two.
+
+    Args:
+        start_time, end_time: Time strings such as "4:00 PM" (end_time may be "close")
+        days: Day names / ranges (see parse_days), or None/empty for every day
+
+    Returns:
+        list: (start, end) tuples with 0 <= start < end <= MINUTES_PER_WEEK
+    """
+    start = parse_time_minutes(start_time)
+    end = parse_end_minutes(end_time)
+    if start is None or end is None:
+        return []
+    return minute_intervals(start, end, parse_days(days))
+
+
+def minute_intervals(start, end, day_indexes=None):
+    """
+    window_intervals() for already-parsed values
+
+    Args:
+        start, end: Minutes after midnight
+        day_indexes: Iterable of 0 (Monday) .. 6 (Sunday); empty for every day
+    """
+    if end <= start:
+        end += MINUTES_PER_DAY
+
+    intervals = []
+    for day in sorted(set(day_indexes or ())) or range(7):
+        lo = day * MINUTES_PER_DAY + start
+        hi = day * MINUTES_PER_DAY + end
+        if hi <= MINUTES_PER_WEEK:
+            intervals.append((lo, hi))
+        else:
+            intervals.append((lo, MINUTES_PER_WEEK))
+            intervals.append((0, hi - MINUTES_PER_WEEK))
+    return intervals
+
+
+def document_windows(time_frame):
+    """
+    Minute-of-week intervals for a parsed document's time_frame list
+
+    Returns:
+        list: [{"start": int, "end": int}, ...] (Firestore-friendly)
+    """
+    windows = []
+    for frame in time_frame or []:
+        if not isinstance(frame, dict):
+            continue
+        for lo, hi in frame_intervals(frame):
+            windows.append({"start": lo, "end": hi})
+    return windows
+
+
+def frame_intervals(frame):
+    """Intervals of one time_frame entry, or of a deal carrying its own times"""
+    if isinstance(frame.get("start_minute"), int) and isinstance(frame.get("end_minute"), int):
+        # Already normalized by deal_models; skip string parsing
+        return minute_intervals(
+            frame["start_minute"], frame["end_minute"], parse_days(frame.get("days"))
+        )
+    return window_intervals(frame.get("start_time"), frame.get("end_time"), frame.get("days"))
+
+
+def venue_deal_windows(venue):
+    """
+    Yield (deal_index, deal, intervals) for every deal of a venue record
+
+    Handles both shapes in use: deals that carry their own start_time /
+    end_time / days (venues.json, and uploads merged into a venue), and
+    Gemini documents whose time_frame list (or its precomputed time_windows)
+    applies to every deal in the document. A deal with its own times never
+    falls back to the document's windows, even when they are blank.
+    """
+    shared = None
+    if venue.get("time_windows"):
+        shared = [(w["start"], w["end"]) for w in venue["time_windows"]]
+    elif venue.get("time_frame"):
+        shared = [(w["start"], w["end"]) for w in document_windows(venue["time_frame"])]
+
+    for i, deal in enumerate(venue.get("deals") or []):
+        if not isinstance(deal, dict):
+            continue
+        if "start_time" in deal or "end_time" in deal:
+            intervals = frame_intervals(deal)
+        else:
+            intervals = shared or []
+        yield i, deal, intervals
+
+
+def minute_of_week(when=None, tz=None):
+    """
+    Minute of the week (Monday 00:00 = 0) for a datetime or epoch seconds
+
+    Naive datetimes are taken as already local; epoch seconds and aware
+    datetimes are converted to tz (DEALS_TIMEZONE, default America/Los_Angeles).
+    """
+    if tz is None:
+        tz_name = os.getenv("DEALS_TIMEZONE", "America/Los_Angeles")
+        tz = ZoneInfo(tz_name) if ZoneInfo is not None else timezone.utc
+    if when is None:
+        when = datetime.now(tz)
+    elif isinstance(when, (int, float)):
+        when = datetime.fromtimestamp(when, tz)
+    elif when.tzinfo is not None:
+        when = when.astimezone(tz)
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+class ActiveDealIndex:
+    """
+    Which deals are on at a given minute of the week
+
+    The week is cut into SLOT_MINUTES slots. Each slot holds two bitsets
+    (Python ints over deal ordinals): deals covering the whole slot, and
+    deals covering only part of it. A lookup ORs the "full" set with the
+    partial deals whose exact intervals contain the minute.
+    """
+
+    def __init__(self):
+        self._full = [0] * SLOTS
+        self._partial = [0] * SLOTS
+        self._intervals = []  # ordinal -> list of (start, end)
+        self._deal_ids = []  # ordinal -> deal id
+        self._deals = []  # ordinal -> (venue_id, deal dict)
+        self._venue_bits = {}  # venue_id -> bitset of its ordinals
+        self._free = 0  # bitset of ordinals removed (never reused)
+
+    def __len__(self):
+        return len(self._deal_ids) - bin(self._free).count("1")
+
+    @classmethod
+    def from_venues(cls, venues):
+        index = cls()
+        for venue in venues:
+            index.add_venue(venue)
+        return index
+
+    def add_venue(self, venue):
+        """Index every deal of a venue record (replacing earlier ones)"""
+        venue_id = str(venue.get("venue_id") or venue.get("id"))
+        self.remove_venue(venue_id)
+        for i, deal, intervals in venue_deal_windows(venue):
+            if intervals:
+                self._add(f"{venue_id}:{i}", venue_id, deal, intervals)
+
+    def _add(self, deal_id, venue_id, deal, intervals):
+        ordinal = len(self._deal_ids)
+        bit = 1 << ordinal
+        self._deal_ids.append(deal_id)
+        self._deals.append((venue_id, deal))
+        self._intervals.append(intervals)
+        self._venue_bits[venue_id] = self._venue_bits.get(venue_id, 0) | bit
+        for lo, hi in intervals:
+            for slot in range(lo // SLOT_MINUTES, (hi - 1) // SLOT_MINUTES + 1):
+                slot_lo = slot * SLOT_MINUTES
+                if lo <= slot_lo and slot_lo + SLOT_MINUTES <= hi:
+                    self._full[slot] |= bit
+                else:
+                    self._partial[slot] |= bit
+
+    def remove_venue(self, venue_id):
+        bits = self._venue_bits.pop(str(venue_id), 0)
+        if not bits:
+            return
+        self._free |= bits
+        mask = ~bits
+        for slot in range(SLOTS):
+            self._full[slot] &= mask
+            self._partial[slot] &= mask
+
+    def active_bits(self, minute):
+        """Bitset of deal ordinals active at a minute of the week"""
+        slot = (minute % MINUTES_PER_WEEK) // SLOT_MINUTES
+        bits = self._full[slot]
+        partial = self._partial[slot]
+        while partial:
+            low = partial & -partial
+            ordinal = low.bit_length() - 1
+            if any(lo <= minute < hi for lo, hi in self._intervals[ordinal]):
+                bits |= low
+            partial ^= low
+        return bits
+
+    def active(self, when=None, venue_ids=None):
+        """
+        Deals active at a moment
+
+        Args:
+            when: datetime, epoch seconds, or None for now
+            venue_ids: Optional iterable of venue IDs to intersect with
+
+        Returns:
+            list: (deal_id, venue_id, deal) tuples
+        """
+        bits = self.active_bits(minute_of_week(when))
+        if venue_ids is not None:
+            venue_mask = 0
+            for venue_id in venue_ids:
+                venue_mask |= self._venue_bits.get(str(venue_id), 0)
+            bits &= venue_mask
+
+        results = []
+        while bits:
+            low = bits & -bits
+            ordinal = low.bit_length() - 1
+            venue_id, deal = self._deals[ordinal]
+            results.append((self._deal_ids[ordinal], venue_id, deal))
+            bits ^= low
+        return results
+
+    def active_ids(self, when=None, venue_ids=None):
+        """Deal IDs active at a moment, optionally limited to venue_ids"""
+        return [deal_id for deal_id, _, _ in self.active(when, venue_ids)]
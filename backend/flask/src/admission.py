@@ -0,0 +1,411 @@
+"""
+Admission Control
+Token-bucket rate limit, concurrency cap and circuit breaker in front of Gemini calls
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from src.retry import is_transient
+from src.metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """
+    Work refused because Gemini capacity is used up
+
+    retry_after is the caller's hint in seconds; status is the HTTP status
+    the API answers with.
+    """
+
+    status = 503
+    reason = "busy"
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = max(0.0, retry_after)
+
+
+class RateLimited(Overloaded):
+    """The request rate budget (GEMINI_RATE_LIMIT) is spent for now"""
+
+    status = 429
+    reason = "rate_limited"
+
+
+class CircuitOpen(Overloaded):
+    """Recent Gemini calls kept failing; calls are paused until the breaker resets"""
+
+    reason = "circuit_open"
+
+
+class TokenBucket:
+    """
+    Classic token bucket; a negative balance is a queue of reservations
+
+    acquire() takes a token and sleeps until it is due, so waiting callers
+    are served in order without polling.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket size (default: one second worth of tokens, at least 1)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self):
+        """Seconds until a token taken now would be due (0 if one is available)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def reserve(self, timeout):
+        """
+        Take one token now; it is due after the returned delay
+
+        Returns:
+            float or None: Seconds to wait before using the token; None (nothing
+                           taken) when that would be longer than timeout
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > timeout:
+                return None
+            self._tokens -= 1
+        return wait
+
+    def acquire(self, timeout):
+        """
+        Take one token, sleeping until it is due
+
+        Returns:
+            bool: False (without sleeping or taking anything) when the token
+                  would not be due within timeout seconds
+        """
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures; after
+    reset_timeout one probe call is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until calls are allowed again (0 when closed)"""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def is_open(self):
+        """True while calls would be refused right now (without claiming the probe)"""
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return True
+            return self._probing
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpen: While open, or while the half-open probe is in flight
+        """
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen("Gemini circuit is open", retry_after=remaining)
+            if self._probing:
+                raise CircuitOpen("Gemini circuit is half-open", retry_after=1.0)
+            self.state = "half_open"
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Gemini circuit closed")
+            self.failures = 0
+            self.state = "closed"
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(
+                        "Gemini circuit opened after %d failures; pausing %.1fs",
+                        self.failures,
+                        self.reset_timeout,
+                    )
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class AdmissionController:
+    """Gate every Gemini call passes through; check() lets routes shed load early"""
+
+    def __init__(
+        self,
+        rate=None,
+        burst=None,
+        max_concurrent=8,
+        max_waiting=16,
+        queue_timeout=10.0,
+        breaker=None,
+    ):
+        """
+        Args:
+            rate: Calls per second (None: no rate limit)
+            burst: Token bucket size (default: max_concurrent)
+            max_concurrent: Calls in flight at once
+            max_waiting: Callers allowed to queue for a slot; more are refused
+            queue_timeout: Longest a caller waits for a token or a slot
+            breaker: CircuitBreaker (None disables it)
+        """
+        self.bucket = TokenBucket(rate, burst or max_concurrent) if rate else None
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._async_slots = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        GEMINI_ADMISSION        : "0" disables admission control (returns None)
+        GEMINI_RATE_LIMIT       : Calls per minute, 0 = unlimited (default 0)
+        GEMINI_BURST            : Calls allowed back to back (default: GEMINI_MAX_CONCURRENT)
+        GEMINI_MAX_CONCURRENT   : Calls in flight at once (default 8)
+        GEMINI_MAX_WAITING      : Requests queued for a slot before shedding (default 16)
+        GEMINI_QUEUE_TIMEOUT    : Seconds a request may wait for a slot or token (default 10)
+        GEMINI_BREAKER_FAILURES : Consecutive failures that open the circuit, 0 disables (default 5)
+        GEMINI_BREAKER_RESET    : Seconds the circuit stays open (default 30)
+        """
+        if os.getenv("GEMINI_ADMISSION", "1") == "0":
+            return None
+        per_minute = float(os.getenv("GEMINI_RATE_LIMIT", 0))
+        failures = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+        return cls(
+            rate=per_minute / 60 if per_minute > 0 else None,
+            burst=float(os.getenv("GEMINI_BURST", 0)) or None,
+            max_concurrent=int(os.getenv("GEMINI_MAX_CONCURRENT", 8)),
+            max_waiting=int(os.getenv("GEMINI_MAX_WAITING", 16)),
+            queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT", 10)),
+            breaker=CircuitBreaker(
+                failure_threshold=failures,
+                reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET", 30)),
+            )
+            if failures > 0
+            else None,
+        )
+
+    def _reject(self, error):
+        ADMISSION_REJECTED.inc(reason=error.reason)
+        return error
+
+    def check(self):
+        """
+        Refuse new work now if it would be refused later anyway (never blocks)
+
+        Raises:
+            Overloaded: CircuitOpen, RateLimited or plain Overloaded (queue full)
+        """
+        if self.breaker is not None and self.breaker.is_open():
+            raise self._reject(
+                CircuitOpen(
+                    "Gemini is unavailable, retry later",
+                    retry_after=self.breaker.retry_after() or 1.0,
+                )
+            )
+        with self._lock:
+            busy = self.in_flight >= self.max_concurrent and self.waiting >= self.max_waiting
+        if busy:
+            raise self._reject(Overloaded("Too many uploads in progress, retry later"))
+        if self.bucket is not None:
+            wait = self.bucket.wait_time()
+            if wait > self.queue_timeout:
+                raise self._reject(
+                    RateLimited("Gemini rate limit reached, retry later", retry_after=wait)
+                )
+
+    def _enter_queue(self):
+        if self.breaker is not None and self.breaker.is_open():
+            raise self._reject(
+                CircuitOpen(
+                    "Gemini is unavailable, retry later",
+                    retry_after=self.breaker.retry_after() or 1.0,
+                )
+            )
+        with self._lock:
+            if self.waiting >= self.max_waiting and self.in_flight >= self.max_concurrent:
+                raise self._reject(Overloaded("Too many uploads in progress, retry later"))
+            self.waiting += 1
+
+    def _leave_queue(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def _rate_limited(self):
+        return self._reject(
+            RateLimited(
+                "Gemini rate limit reached, retry later",
+                retry_after=self.bucket.wait_time(),
+            )
+        )
+
+    def _start_call(self, release):
+        if self.breaker is not None:
+            # Claims the half-open probe, so only after capacity is secured
+            try:
+                self.breaker.before_call()
+            except CircuitOpen as e:
+                release()
+                raise self._reject(e)
+        with self._lock:
+            self.in_flight += 1
+
+    def _end_call(self, error=None):
+        with self._lock:
+            self.in_flight -= 1
+        if self.breaker is not None:
+            if error is not None and is_transient(error):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one Gemini call's worth of capacity for the with-block
+
+        Transient failures inside the block count towards the circuit breaker;
+        anything else (including a clean return) counts as the service being up.
+
+        Raises:
+            Overloaded: When no capacity frees up within queue_timeout
+        """
+        self._enter_queue()
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            if self.bucket is not None and not self.bucket.acquire(self.queue_timeout):
+                raise self._rate_limited()
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise self._reject(
+                    Overloaded("Timed out waiting for a Gemini slot", retry_after=1.0)
+                )
+        finally:
+            self._leave_queue()
+
+        self._start_call(self._slots.release)
+        try:
+            yield
+        except Exception as e:
+            self._end_call(e)
+            raise
+        else:
+            self._end_call()
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """
+        slot() for coroutines: waits on the event loop instead of blocking a thread
+
+        The concurrency cap is an asyncio.Semaphore of the same size, created
+        on first use; the rate limit and circuit breaker are shared with slot().
+        """
+        import asyncio
+
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrent)
+
+        self._enter_queue()
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            if self.bucket is not None:
+                wait = self.bucket.reserve(self.queue_timeout)
+                if wait is None:
+                    raise self._rate_limited()
+                if wait:
+                    await asyncio.sleep(wait)
+            try:
+                await asyncio.wait_for(
+                    self._async_slots.acquire(), max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                raise self._reject(
+                    Overloaded("Timed out waiting for a Gemini slot", retry_after=1.0)
+                ) from None
+        finally:
+            self._leave_queue()
+
+        self._start_call(self._async_slots.release)
+        try:
+            yield
+        except Exception as e:
+            self._end_call(e)
+            raise
+        else:
+            self._end_call()
+        finally:
+            self._async_slots.release()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+_UNSET = object()
+
+
+def shared_admission():
+    """
+    Process-wide AdmissionController (Gemini quota is per API key, not per parser)
+
+    Returns:
+        AdmissionController or None: None when GEMINI_ADMISSION=0
+    """
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = AdmissionController.from_env() or _UNSET
+    return None if _shared is _UNSET else _shared
@@ -3,20 +3,55 @@ Flask API for deal Image Upload and Processing
 Accepts image uploads from frontend, processes with Gemini Vision, uploads to Firebase
 """
 
-from flask import Flask, request, jsonify
+import os
+import time
+import threading
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from endpoints.routes import api_bp
+from endpoints.routes import api_bp, warm_up
+from src import metrics
+from src.upload_stream import StreamingUploadRequest
 from datetime import datetime
 
+metrics.configure_logging()
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend requests
 
-app.config["UPLOAD_FOLDER"] = "/tmp"  # has to be "/tmp"
+# Upload parts are hashed, size-capped and type-sniffed while they stream in
+app.request_class = StreamingUploadRequest
+
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
 
 # Register routes from endpoints/routes.py
 app.register_blueprint(api_bp)
 
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """Count every request and its latency, labelled by route template"""
+    started = g.pop("request_started", None)
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.REQUESTS.inc(
+        endpoint=endpoint, method=request.method, status=response.status_code
+    )
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, endpoint=endpoint
+        )
+    return response
+
+
+# Clients are created lazily; WARMUP_ON_START=1 builds them in the background
+# right away so the first real request does not pay for it
+if os.getenv("WARMUP_ON_START") == "1":
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 
@@ -38,6 +73,12 @@ def health_check():
     ), 200
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Counters and latency histograms in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print("deal Parser API Server")
@@ -45,6 +86,7 @@ if __name__ == "__main__":
     print("Endpoints:")
     print("  GET  /health              - Health check")
     print("  POST /upload-deal         - Upload and process deal image")
+    print("  GET  /metrics             - Prometheus metrics")
     print("=" * 70)
     # print("Starting server on http://0.0.0.0:5000")
     print("=" * 70)
@@ -0,0 +1,64 @@
+"""
+ASGI App for deal Image Upload and Processing
+Quart app serving /upload-deal with async Gemini and Firestore clients
+"""
+
+import os
+import time
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from endpoints.async_routes import async_api_bp
+from src import metrics
+from datetime import datetime
+
+metrics.configure_logging()
+
+app = cors(Quart(__name__))
+
+app.config["MAX_CONTENT_LENGTH"] = int(
+    os.getenv("UPLOAD_MAX_IMAGE_BYTES", 16 * 1024 * 1024)
+)
+
+app.register_blueprint(async_api_bp)
+
+
+@app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request(response):
+    """Count every request and its latency, labelled by route template"""
+    started = g.pop("request_started", None)
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.REQUESTS.inc(
+        endpoint=endpoint, method=request.method, status=response.status_code
+    )
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+@app.route("/health", methods=["GET"])
+async def health_check():
+    """Health check endpoint"""
+    return jsonify(
+        {
+            "status": "healthy",
+            "service": "deal-parser-api",
+            "server": "asgi",
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+    ), 200
+
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    """Counters and latency histograms in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+if __name__ == "__main__":
+    # Production: hypercorn src.asgi:app --bind 0.0.0.0:8000
+    app.run()
@@ -0,0 +1,300 @@
+"""
+Async Uploader
+Coroutine versions of FirebaseUploader and VisionMenuParser for the ASGI app
+"""
+
+import time
+import asyncio
+import logging
+from functools import partial
+from datetime import datetime
+from src.retry import retry_call_async
+from src.deal_models import MenuParsing
+from src.metrics import span, BYTES_IN
+from src.image_source import read_image_bytes, source_filename
+from src.firebase_uploader import (
+    FirebaseUploader,
+    DuplicateImage,
+    assemble_deal_document,
+    first_duplicate,
+    shared_executor,
+    stamp_updated,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def in_executor(fn, *args, **kwargs):
+    """
+    Run blocking Storage calls on the shared upload pool
+
+    CPU work (decoding, preprocessing) goes to asyncio.to_thread instead, so
+    it never queues behind a burst of uploads.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(shared_executor(), partial(fn, *args, **kwargs))
+
+
+class AsyncVisionMenuParser:
+    """
+    VisionMenuParser whose Gemini call is awaited (generate_content_async)
+
+    Wraps a sync parser and reuses its model, result cache, admission
+    controller and response handling, so both paths produce identical results.
+    """
+
+    def __init__(self, parser):
+        """
+        Args:
+            parser: VisionMenuParser; its model must have generate_content_async()
+        """
+        self.sync = parser
+
+    @property
+    def admission(self):
+        return self.sync.admission
+
+    async def parse_deal(self, image, raise_errors=False, token_budget=None):
+        """See VisionMenuParser.parse_deal"""
+        logger.info("Processing: %s", source_filename(image, default="<in-memory image>"))
+        return await self._extract(
+            [image], raise_errors, self.sync.image_budget(1, token_budget)
+        )
+
+    async def parse_deals(self, images, raise_errors=False, token_budget=None):
+        """See VisionMenuParser.parse_deals; batches are sent concurrently"""
+        images = list(images)
+        if len(images) == 1:
+            return await self.parse_deal(
+                images[0], raise_errors=raise_errors, token_budget=token_budget
+            )
+
+        max_tokens = self.sync.image_budget(len(images), token_budget)
+        size = self.sync.batch_size
+        batches = [images[i : i + size] for i in range(0, len(images), size)]
+        results = await asyncio.gather(
+            *(self._extract(batch, raise_errors, max_tokens) for batch in batches)
+        )
+        for data in results:
+            if data.get("error"):
+                return data
+        if len(results) == 1:
+            return results[0]
+        return MenuParsing.merge(
+            [MenuParsing.from_gemini(data) for data in results]
+        ).to_document()
+
+    async def _generate(self, contents, image_tokens=0):
+        parser = self.sync
+
+        async def timed(model):
+            start = time.perf_counter()
+            response = await model.generate_content_async(contents)
+            parser.record_usage(response, time.perf_counter() - start, image_tokens)
+            return response
+
+        async def call():
+            if parser.context_cache_ttl:
+                # May create the context cache: a blocking API call
+                model = await asyncio.to_thread(parser.current_model)
+            else:
+                model = parser.model
+            if parser.admission is None:
+                return await timed(model)
+            async with parser.admission.async_slot():
+                return await timed(model)
+
+        return await retry_call_async(call, attempts=parser.max_attempts, max_delay=10.0)
+
+    async def _extract(self, images, raise_errors, max_tokens=0):
+        parser = self.sync
+        response_text = None
+        try:
+            images_bytes = [read_image_bytes(image) for image in images]
+            cache_key, cached = parser._lookup_cached(images_bytes, max_tokens)
+            if cached is not None:
+                return cached
+
+            # Decoding and downscaling are CPU work: keep them off the event loop
+            imgs, image_tokens = await asyncio.to_thread(
+                parser._load_images, images_bytes, max_tokens
+            )
+
+            with span("gemini_call"):
+                response = await self._generate(parser._contents(imgs), image_tokens)
+            response_text = response.text.strip()
+            return parser._finish(response_text, cache_key, len(imgs))
+
+        except Exception as e:
+            return parser._failure(e, response_text, raise_errors)
+
+
+class AsyncFirebaseUploader:
+    """
+    FirebaseUploader for coroutines: async Firestore and Gemini, pooled Storage
+
+    Storage has no async client, so uploads and deletes run on the shared
+    executor. Preprocessing, dedupe, caches and write listeners are those of
+    the wrapped sync uploader.
+    """
+
+    def __init__(self, uploader=None, db=None, parser=None):
+        """
+        Args:
+            uploader: FirebaseUploader providing the bucket, preprocessor and caches
+                      (default: one connected from the environment)
+            db: Async Firestore client (default: firestore_async.client(),
+                e.g. src.fakes.FakeAsyncFirestore in tests)
+            parser: AsyncVisionMenuParser (default: wraps uploader.parser on first use)
+        """
+        self.sync = uploader or FirebaseUploader()
+        self._parser = parser
+
+        if db is None:
+            # Same firebase_admin app the sync uploader initialized
+            from firebase_admin import firestore_async
+
+            db = firestore_async.client()
+        self.db = db
+
+    @property
+    def parser(self):
+        """AsyncVisionMenuParser, created on first access."""
+        if self._parser is None:
+            self._parser = AsyncVisionMenuParser(self.sync.parser)
+        return self._parser
+
+    def check_admission(self):
+        """See FirebaseUploader.check_admission"""
+        if self._parser is None:
+            self.sync.check_admission()
+        elif self._parser.admission is not None:
+            self._parser.admission.check()
+
+    async def create_deal(
+        self,
+        image,
+        collection="final_schema",
+        filename=None,
+        extra_fields=None,
+        reject_duplicates=False,
+    ):
+        """See FirebaseUploader.create_deal"""
+        filename = filename or source_filename(image)
+        return await self.create_combined_deal(
+            [image],
+            collection=collection,
+            filenames=[filename],
+            extra_fields=extra_fields,
+            reject_duplicates=reject_duplicates,
+        )
+
+    async def create_combined_deal(
+        self,
+        images,
+        collection="final_schema",
+        filenames=None,
+        extra_fields=None,
+        reject_duplicates=False,
+    ):
+        """
+        See FirebaseUploader.create_combined_deal
+
+        Storage uploads run on the executor while the Gemini call is awaited;
+        one image behaves exactly like create_deal.
+
+        Raises:
+            DuplicateImage: Only with reject_duplicates
+            src.admission.Overloaded: Gemini is saturated; nothing is stored
+        """
+        sync = self.sync
+        images = list(images)
+        if not images:
+            raise ValueError("create_combined_deal needs at least one image")
+        filenames = list(filenames or [source_filename(image) for image in images])
+        logger.info("Processing %d image(s) as one menu: %s", len(images), filenames)
+
+        normalized = await asyncio.gather(
+            *(
+                asyncio.to_thread(sync.prepare_image, image, filename)
+                for image, filename in zip(images, filenames)
+            )
+        )
+        for item in normalized:
+            BYTES_IN.inc(item.original_bytes, source="upload")
+
+        image_hashes = sync.image_hashes(normalized)
+        if reject_duplicates:
+            duplicate = await self.find_duplicate(image_hashes, collection)
+            if duplicate is not None:
+                raise DuplicateImage(*duplicate)
+
+        self.check_admission()
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        stores = [
+            asyncio.ensure_future(in_executor(sync.store_image, n, timestamp=timestamp))
+            for n in normalized
+        ]
+        try:
+            if len(normalized) == 1:
+                data = await self.parser.parse_deal(normalized[0].data)
+            else:
+                data = await self.parser.parse_deals([n.data for n in normalized])
+        except Exception:
+            # No document will point at the images; don't leave them in Storage
+            await asyncio.gather(*stores, return_exceptions=True)
+            await in_executor(sync.discard_images, normalized, timestamp)
+            raise
+        urls = await asyncio.gather(*stores)
+
+        data = assemble_deal_document(
+            data, images, filenames, normalized, urls, extra_fields, image_hashes
+        )
+
+        # Repeat uploads for a known venue extend it (a transaction, on the pool)
+        merged = await in_executor(sync.merge_into_venue, data, collection, image_hashes)
+        if merged is not None:
+            return merged
+
+        with span("firestore_add"):
+            doc_ref = self.db.collection(collection).document()
+            await doc_ref.set(data)
+        return sync.record_added(collection, doc_ref.id, data, image_hashes)
+
+    async def find_duplicate(self, hashes, collection="final_schema"):
+        """See FirebaseUploader.find_duplicate; candidates are checked concurrently"""
+        sync = self.sync
+        if sync.dedupe is None or not hashes:
+            return None
+        ranked = sync.duplicate_candidates(hashes)
+        found = await asyncio.gather(
+            *(self.get_restaurant(doc_id, collection) for doc_id, _ in ranked)
+        )
+        return first_duplicate(
+            ((doc_id, distance, data) for (doc_id, distance), data in zip(ranked, found)),
+            collection,
+        )
+
+    async def get_restaurant(self, doc_id, collection="final_schema"):
+        """See FirebaseUploader.get_restaurant (shares its document cache and replica)"""
+        sync = self.sync
+        restaurant = sync.local_restaurant(doc_id, collection)
+        if restaurant is not None:
+            return restaurant
+
+        with span("firestore_get"):
+            doc = await self.db.collection(collection).document(doc_id).get()
+        if not doc.exists:
+            return None
+        restaurant = {"id": doc.id, **(doc.to_dict() or {})}
+        sync.cache_restaurant(collection, restaurant)
+        return restaurant
+
+    async def update_deal(self, doc_id, updates, collection="final_schema"):
+        """See FirebaseUploader.update_deal"""
+        stamp_updated(updates)
+        with span("firestore_update"):
+            await self.db.collection(collection).document(doc_id).update(updates)
+        logger.info("Updated %s/%s", collection, doc_id)
+        self.sync.notify_write(collection, doc_id, updates)
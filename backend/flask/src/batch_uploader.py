@@ -0,0 +1,289 @@
+"""
+Batch Upload Engine
+Bounded-concurrency backfill of menu images with batched Firestore commits and checkpoints
+"""
+
+import os
+import json
+import logging
+import glob
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from src.retry import retry_call
+from src.admission import Overloaded
+from src.image_source import read_image_bytes, source_filename
+from src.firebase_uploader import assemble_deal_document
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+# Firestore rejects WriteBatch commits with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+
+def collect_images(source):
+    """
+    Expand a file path, directory or glob pattern into a sorted list of image paths
+
+    Args:
+        source: Image path, directory (scanned recursively) or glob pattern
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+    if glob.has_magic(source):
+        return sorted(
+            p
+            for p in glob.glob(source, recursive=True)
+            if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS
+        )
+    return [source]
+
+
+class Checkpoint:
+    """Append-only JSONL record of committed images, used to resume a batch"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return {image_path: doc_id} for every image already committed"""
+        done = {}
+        if not self.path or not os.path.exists(self.path):
+            return done
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                if record.get("status") == "success":
+                    done[record["image"]] = record["id"]
+        return done
+
+    def record(self, results):
+        if not self.path:
+            return
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+
+
+def _overloaded(exc):
+    return isinstance(exc, Overloaded)
+
+
+class PreparedImage:
+    """An image stored and parsed, waiting for its batch commit"""
+
+    __slots__ = ("path", "doc_ref", "data", "image_hashes", "normalized", "timestamp")
+
+    def __init__(self, path, doc_ref, data, image_hashes, normalized, timestamp):
+        self.path = path
+        self.doc_ref = doc_ref
+        self.data = data
+        self.image_hashes = image_hashes
+        self.normalized = normalized
+        # Storage blob name prefix, so a failed commit can delete the images
+        self.timestamp = timestamp
+
+
+class BatchUploadEngine:
+    """Runs many upload_deal-style pipelines in parallel with per-stage limits"""
+
+    def __init__(
+        self,
+        uploader,
+        collection="final_schema",
+        workers=4,
+        gemini_concurrency=4,
+        storage_concurrency=8,
+        firestore_concurrency=2,
+        batch_size=200,
+        max_attempts=4,
+        base_delay=0.5,
+        checkpoint_path=None,
+        skip_duplicates=True,
+    ):
+        """
+        Args:
+            uploader: FirebaseUploader providing db, bucket and parser
+            collection: Firestore collection name
+            workers: Threads preparing images (read, Storage upload, Gemini parse)
+            gemini_concurrency: Max in-flight Gemini calls
+            storage_concurrency: Max in-flight Storage uploads
+            firestore_concurrency: Max in-flight Firestore batch commits
+            batch_size: Documents per WriteBatch commit (<= 500)
+            max_attempts: Tries for transient Storage / Firestore errors, and for
+                          admission refusals of the Gemini call (the parser
+                          retries its own transient errors, GEMINI_MAX_ATTEMPTS)
+            base_delay: Backoff scale in seconds
+            checkpoint_path: Optional JSONL file used to resume interrupted runs
+            skip_duplicates: Near-duplicates of stored images are reported with
+                             status "duplicate" instead of being parsed again
+        """
+        self.uploader = uploader
+        self.collection = collection
+        self.workers = max(1, workers)
+        self.firestore_concurrency = max(1, firestore_concurrency)
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.skip_duplicates = skip_duplicates
+        self._gemini = threading.BoundedSemaphore(max(1, gemini_concurrency))
+        self._storage = threading.BoundedSemaphore(max(1, storage_concurrency))
+
+    def _retry(self, fn, *args, **kwargs):
+        return retry_call(
+            fn,
+            *args,
+            attempts=self.max_attempts,
+            base_delay=self.base_delay,
+            **kwargs,
+        )
+
+    def _store(self, normalized, timestamp):
+        with self._storage:
+            return self.uploader.store_image(
+                normalized, raise_errors=True, timestamp=timestamp
+            )
+
+    def _parse(self, image_bytes):
+        with self._gemini:
+            return self.uploader.parser.parse_deal(image_bytes, raise_errors=True)
+
+    def _prepare(self, image_path):
+        """
+        Dedupe, Storage upload and Gemini parse for one image, as create_deal does
+
+        Returns:
+            PreparedImage for the next batch commit, or a finished result dict
+            (a near-duplicate, or an upload merged into its existing venue)
+        """
+        uploader = self.uploader
+        filename = source_filename(image_path)
+        normalized = uploader.prepare_image(read_image_bytes(image_path), filename)
+
+        image_hashes = uploader.image_hashes([normalized])
+        if self.skip_duplicates:
+            duplicate = uploader.find_duplicate(image_hashes, self.collection)
+            if duplicate is not None:
+                return {"image": image_path, "id": duplicate[0], "status": "duplicate"}
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        urls = self._retry(self._store, normalized, timestamp)
+        try:
+            # Offline work waits out admission refusals instead of failing the image
+            data = self._retry(self._parse, normalized.data, is_retryable=_overloaded)
+        except Exception:
+            # No document will point at the image; don't leave it in Storage
+            uploader.discard_images([normalized], timestamp)
+            raise
+        data = assemble_deal_document(
+            data, [image_path], [filename], [normalized], [urls], image_hashes=image_hashes
+        )
+
+        # A known venue is extended in place (a transaction, not a batched set())
+        merged = self._retry(uploader.merge_into_venue, data, self.collection, image_hashes)
+        if merged is not None:
+            result = {"image": image_path, "id": merged[0], "status": "success"}
+            self.checkpoint.record([result])
+            return result
+
+        # Allocate the document ID client-side so the batch commit can use set()
+        doc_ref = uploader.db.collection(self.collection).document()
+        return PreparedImage(image_path, doc_ref, data, image_hashes, normalized, timestamp)
+
+    def _commit_once(self, items):
+        batch = self.uploader.db.batch()
+        for item in items:
+            batch.set(item.doc_ref, item.data)
+        batch.commit()
+
+    def _commit(self, items):
+        """Commit prepared documents in one WriteBatch; returns per-image results"""
+        try:
+            self._retry(self._commit_once, items)
+        except Exception as e:
+            logger.error("Batch commit of %d documents failed: %s", len(items), e)
+            for item in items:
+                self.uploader.discard_images([item.normalized], item.timestamp)
+            return [
+                {"image": item.path, "error": str(e), "status": "failed"}
+                for item in items
+            ]
+
+        logger.info("Committed %d documents to %s", len(items), self.collection)
+        for item in items:
+            self.uploader.notify_write(self.collection, item.doc_ref.id, item.data)
+            self.uploader.remember_hashes(item.doc_ref.id, item.image_hashes)
+        results = [
+            {"image": item.path, "id": item.doc_ref.id, "status": "success"}
+            for item in items
+        ]
+        self.checkpoint.record(results)
+        return results
+
+    def run(self, image_paths):
+        """
+        Process images, yielding one result dict per image as soon as it settles
+
+        Images already recorded in the checkpoint are yielded with status "skipped".
+        Results are only checkpointed after their Firestore commit succeeds, so an
+        interrupted run can be resumed with the same checkpoint file.
+        """
+        done = self.checkpoint.load()
+        todo = []
+        for path in image_paths:
+            if path in done:
+                yield {"image": path, "id": done[path], "status": "skipped"}
+            else:
+                todo.append(path)
+
+        with ThreadPoolExecutor(
+            self.workers, thread_name_prefix="batch-prepare"
+        ) as prepare_pool, ThreadPoolExecutor(
+            self.firestore_concurrency, thread_name_prefix="batch-commit"
+        ) as commit_pool:
+            prepared = {prepare_pool.submit(self._prepare, p): p for p in todo}
+            commits = set()
+            pending = []
+
+            for future in as_completed(prepared):
+                path = prepared.pop(future)
+                try:
+                    item = future.result()
+                except Exception as e:
+                    logger.error("Failed to process %s: %s", path, e)
+                    yield {"image": path, "error": str(e), "status": "failed"}
+                else:
+                    if isinstance(item, PreparedImage):
+                        pending.append(item)
+                    else:
+                        yield item
+
+                if len(pending) >= self.batch_size:
+                    commits.add(commit_pool.submit(self._commit, pending))
+                    pending = []
+
+                finished = {c for c in commits if c.done()}
+                commits -= finished
+                for commit in finished:
+                    yield from commit.result()
+
+            if pending:
+                commits.add(commit_pool.submit(self._commit, pending))
+
+            while commits:
+                finished, commits = wait(commits, return_when=FIRST_COMPLETED)
+                for commit in finished:
+                    yield from commit.result()
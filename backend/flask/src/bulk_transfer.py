@@ -0,0 +1,328 @@
+"""
+Bulk Transfer
+Seed Firestore from venues.json-shaped files and export collections to local columnar snapshots
+"""
+
+import os
+import json
+import time
+import zlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.retry import retry_call
+from src.metrics import configure_logging
+from src.batch_uploader import MAX_BATCH_WRITES
+from src.active_deals import venue_deal_windows
+
+logger = logging.getLogger(__name__)
+
+
+class TransferReport:
+    """Counts and timing of one import or export run"""
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.documents = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self):
+        elapsed = self.elapsed or 1e-9
+        return {
+            "direction": self.direction,
+            "documents": self.documents,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "elapsed_s": round(self.elapsed, 3),
+            "docs_per_s": round(self.documents / elapsed, 1),
+            "mb_per_s": round(self.bytes / elapsed / 1e6, 2),
+        }
+
+    def __str__(self):
+        r = self.as_dict()
+        return (
+            f"{r['direction']}: {r['documents']} documents ({r['failed']} failed) "
+            f"in {r['elapsed_s']}s = {r['docs_per_s']} docs/s, {r['mb_per_s']} MB/s"
+        )
+
+
+def read_records(path):
+    """
+    Venue records from a venues.json-shaped file or an export snapshot (.npz)
+
+    Returns:
+        list: Record dicts
+    """
+    if path.endswith(".npz"):
+        return load_snapshot(path)["documents"]
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if not isinstance(records, list):
+        raise ValueError(f"{path} must contain a JSON list of venue records")
+    return records
+
+
+def document_id(record, id_field):
+    """
+    Stable document ID from the record (so re-seeding overwrites, not duplicates)
+
+    id_field wins; records from an export snapshot fall back to their original ID.
+    """
+    for value in (record.get(id_field) if id_field else None, record.get("id")):
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def import_records(
+    db,
+    records,
+    collection="final_schema",
+    id_field="venue_id",
+    batch_size=MAX_BATCH_WRITES,
+    concurrency=4,
+    max_attempts=4,
+    base_delay=0.5,
+    progress=None,
+):
+    """
+    Write records to Firestore in WriteBatch commits, several in flight at once
+
+    Records keep their own ID (id_field) as document ID when present and
+    get metadata.updated_at, so incremental readers pick them up.
+
+    Args:
+        db: Firestore client (or src.fakes.FakeFirestore)
+        records: Iterable of venue dicts
+        collection: Target collection
+        id_field: Record field used as document ID (None: random IDs)
+        batch_size: Writes per commit (<= 500)
+        concurrency: Commits in flight
+        max_attempts: Tries per commit for transient errors
+        base_delay: Backoff scale in seconds
+        progress: Optional callback(report) after each commit
+
+    Returns:
+        TransferReport
+    """
+    report = TransferReport("import")
+    batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+    target = db.collection(collection)
+    now = datetime.utcnow().isoformat()
+
+    def commit(items):
+        def once():
+            batch = db.batch()
+            for ref, data in items:
+                batch.set(ref, data)
+            batch.commit()
+
+        try:
+            retry_call(once, attempts=max_attempts, base_delay=base_delay)
+            return len(items), 0
+        except Exception as e:
+            logger.error("Commit of %d documents failed: %s", len(items), e)
+            return 0, len(items)
+
+    def batches():
+        items = []
+        for record in records:
+            data = dict(record)
+            metadata = dict(data.get("metadata") or {})
+            metadata.setdefault("uploaded_at", now)
+            metadata["updated_at"] = now
+            metadata.setdefault("extraction_method", "bulk_import")
+            data["metadata"] = metadata
+            data.pop("id", None)
+
+            report.bytes += len(json.dumps(data, default=str))
+            items.append((target.document(document_id(record, id_field)), data))
+            if len(items) >= batch_size:
+                yield items
+                items = []
+        if items:
+            yield items
+
+    with ThreadPoolExecutor(max(1, concurrency), thread_name_prefix="bulk-import") as pool:
+        # Bounded window of in-flight commits so huge files never queue up in memory
+        pending = []
+        for items in batches():
+            pending.append(pool.submit(commit, items))
+            if len(pending) >= concurrency * 2:
+                _collect(pending.pop(0), report, progress)
+        for future in pending:
+            _collect(future, report, progress)
+
+    return report.finish()
+
+
+def _collect(future, report, progress):
+    written, failed = future.result()
+    report.documents += written
+    report.failed += failed
+    if progress:
+        progress(report)
+
+
+def export_snapshot(uploader, path, collection="final_schema", page_size=1000, since=None):
+    """
+    Write a collection to a columnar .npz snapshot
+
+    Arrays (one row per document unless noted):
+        ids, names             : str
+        lat, lon               : float64 (NaN when missing)
+        updated_at             : datetime64[s] (NaT when missing)
+        deal_counts            : int32
+        window_offsets         : int64, len(ids) + 1; window_*[offsets[i]:offsets[i + 1]]
+                                 belong to document i
+        window_start/window_end: int32 minute-of-week intervals of every deal
+        window_deal            : int32 deal index within its document
+        documents              : uint8, zlib-compressed JSON list of the full documents
+
+    Returns:
+        TransferReport
+    """
+    report = TransferReport("export")
+    ids, names, lats, lons, updated, deal_counts = [], [], [], [], [], []
+    offsets = [0]
+    starts, ends, deal_rows = [], [], []
+    documents = []
+
+    for doc in uploader.iter_restaurants(collection, page_size=page_size, since=since):
+        documents.append(doc)
+        ids.append(str(doc["id"]))
+        names.append(doc.get("venue_name") or doc.get("restaurant_name") or "")
+        lats.append(_float(doc.get("latitude")))
+        lons.append(_float(doc.get("longitude")))
+        updated.append(_timestamp((doc.get("metadata") or {}).get("updated_at")))
+        deal_counts.append(len(doc.get("deals") or []))
+        for deal_index, _, intervals in venue_deal_windows(doc):
+            for start, end in intervals:
+                starts.append(start)
+                ends.append(end)
+                deal_rows.append(deal_index)
+        offsets.append(len(starts))
+        report.documents += 1
+
+    payload = zlib.compress(json.dumps(documents, default=str).encode("utf-8"))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            ids=np.array(ids, dtype=str),
+            names=np.array(names, dtype=str),
+            lat=np.array(lats, dtype=np.float64),
+            lon=np.array(lons, dtype=np.float64),
+            updated_at=np.array(updated, dtype="datetime64[s]"),
+            deal_counts=np.array(deal_counts, dtype=np.int32),
+            window_offsets=np.array(offsets, dtype=np.int64),
+            window_start=np.array(starts, dtype=np.int32),
+            window_end=np.array(ends, dtype=np.int32),
+            window_deal=np.array(deal_rows, dtype=np.int32),
+            documents=np.frombuffer(payload, dtype=np.uint8),
+            collection=np.array(collection),
+        )
+    os.replace(tmp, path)
+    report.bytes = os.path.getsize(path)
+    return report.finish()
+
+
+def _timestamp(value):
+    # Stored timestamps are naive UTC ISO strings; seconds resolution is plenty here
+    try:
+        return np.datetime64(str(value)[:19], "s") if value else np.datetime64("NaT")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def load_snapshot(path):
+    """
+    Read an export_snapshot() file
+
+    Returns:
+        dict: The arrays by name, with "documents" decoded back to a list of dicts
+    """
+    with np.load(path) as arrays:
+        snapshot = {name: arrays[name] for name in arrays.files}
+    snapshot["documents"] = json.loads(zlib.decompress(snapshot["documents"].tobytes()))
+    snapshot["collection"] = str(snapshot["collection"])
+    return snapshot
+
+
+def main():
+    """Bulk import / export CLI"""
+    import argparse
+    from src.firebase_uploader import FirebaseUploader
+
+    parser = argparse.ArgumentParser(
+        description="Bulk-load venues into Firestore or export a collection snapshot"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Load a venues.json-shaped file (or .npz snapshot)")
+    imp.add_argument("source", help="venues.json-shaped file or export snapshot (.npz)")
+    imp.add_argument("--collection", default="final_schema", help="Target collection")
+    imp.add_argument(
+        "--id-field",
+        default="venue_id",
+        help="Record field used as document ID; empty for random IDs (default: venue_id)",
+    )
+    imp.add_argument(
+        "--batch-size", type=int, default=MAX_BATCH_WRITES, help="Writes per commit (max 500)"
+    )
+    imp.add_argument("--concurrency", type=int, default=4, help="Commits in flight (default: 4)")
+
+    exp = sub.add_parser("export", help="Write a collection to a columnar .npz snapshot")
+    exp.add_argument("output", help="Snapshot path (.npz)")
+    exp.add_argument("--collection", default="final_schema", help="Source collection")
+    exp.add_argument("--page-size", type=int, default=1000, help="Documents per query")
+    exp.add_argument("--since", help="Only documents updated after this ISO timestamp")
+
+    args = parser.parse_args()
+    configure_logging()
+
+    uploader = FirebaseUploader()
+
+    if args.command == "import":
+        records = read_records(args.source)
+        report = import_records(
+            uploader.db,
+            records,
+            collection=args.collection,
+            id_field=args.id_field or None,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            progress=lambda r: logger.info("Imported %d/%d", r.documents, len(records)),
+        )
+    else:
+        report = export_snapshot(
+            uploader,
+            args.output,
+            collection=args.collection,
+            page_size=args.page_size,
+            since=args.since,
+        )
+
+    print(f"\n{'=' * 70}")
+    print(report)
+    print(f"{'=' * 70}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,374 @@
+"""
+Deal Models
+Slotted Python counterparts of shared-schemas.ts (AIMenuParsing, FirestoreDeal, FrontendDeal)
+"""
+
+import logging
+from src.active_deals import (
+    DAY_INDEX,
+    minute_intervals,
+    parse_days,
+    parse_end_minutes,
+    parse_time_minutes,
+)
+
+logger = logging.getLogger(__name__)
+
+DAY_NAMES = tuple(name.capitalize() for name in sorted(DAY_INDEX, key=DAY_INDEX.get))
+
+
+class DealValidationError(ValueError):
+    """Gemini output that does not match the AIMenuParsing schema"""
+
+
+def format_minutes(minutes):
+    """960 -> "4:00 PM" (the 12-hour form the frontend displays)"""
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    period = "PM" if hour >= 12 else "AM"
+    return f"{hour % 12 or 12}:{minute:02d} {period}"
+
+
+def format_minutes_24h(minutes):
+    """960 -> "16:00" (FirestoreTimeWindow.startTime)"""
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _minutes_text(minutes, formatter=format_minutes):
+    return None if minutes is None else formatter(minutes)
+
+
+def _optional_text(value, field):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise DealValidationError(f"{field} must be a string")
+    return value.strip() or None
+
+
+def _list(value, field):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise DealValidationError(f"{field} must be a list")
+    return value
+
+
+class DealItem:
+    """AIDealItem / FirestoreDealItem"""
+
+    __slots__ = ("name", "price", "description")
+
+    def __init__(self, name, price, description=None):
+        self.name = name
+        self.price = price
+        self.description = description
+
+    @classmethod
+    def from_gemini(cls, item):
+        if not isinstance(item, dict):
+            raise DealValidationError("deals entries must be objects")
+        name = _optional_text(item.get("name"), "deals[].name")
+        if name is None:
+            raise DealValidationError("deals[].name is required")
+        return cls(
+            name,
+            _optional_text(item.get("price"), "deals[].price") or "",
+            _optional_text(item.get("description"), "deals[].description"),
+        )
+
+    def to_dict(self):
+        return {"name": self.name, "price": self.price, "description": self.description}
+
+
+class TimeWindow:
+    """
+    AITimeWindow with times also as integer minutes after midnight
+
+    start_time / end_time keep Gemini's strings as read; start / end are None
+    when a string is not a recognizable time. days holds day indexes
+    (0 = Monday); an empty tuple means every day.
+    """
+
+    __slots__ = ("start_time", "end_time", "start", "end", "days", "day_text")
+
+    def __init__(self, start_time, end_time, start, end, days=(), day_text=None):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start = start
+        self.end = end
+        self.days = days
+        self.day_text = day_text
+
+    @classmethod
+    def from_gemini(cls, frame):
+        if not isinstance(frame, dict):
+            raise DealValidationError("time_frame entries must be objects")
+        start_time = _optional_text(frame.get("start_time"), "time_frame[].start_time")
+        end_time = _optional_text(frame.get("end_time"), "time_frame[].end_time")
+        start = frame.get("start_minute")
+        end = frame.get("end_minute")
+        if not (isinstance(start, int) and isinstance(end, int)):
+            start = parse_time_minutes(start_time)
+            end = parse_end_minutes(end_time)
+        if start is None or end is None:
+            logger.warning("Time window %r-%r has no readable time", start_time, end_time)
+        days = _list(frame.get("days"), "time_frame[].days")
+        indexes = tuple(sorted(parse_days(days)))
+        # Days that could not be read are kept as written rather than dropped
+        return cls(
+            start_time if start_time is not None else _minutes_text(start),
+            end_time if end_time is not None else _minutes_text(end),
+            start,
+            end,
+            indexes,
+            None if indexes or not days else [str(day) for day in days],
+        )
+
+    def key(self):
+        """Identity used to drop repeated windows when merging"""
+        if self.start is None or self.end is None:
+            return (self.start_time, self.end_time, self.days)
+        return (self.start, self.end, self.days)
+
+    def day_names(self):
+        return [DAY_NAMES[d] for d in self.days]
+
+    def intervals(self):
+        """Minute-of-week intervals (see active_deals.minute_intervals); none when unreadable"""
+        if self.start is None or self.end is None:
+            return []
+        return minute_intervals(self.start, self.end, self.days)
+
+    def to_dict(self):
+        """Stored form: Gemini's strings as read plus the parsed minutes"""
+        return {
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "days": self.day_names() or self.day_text,
+            "start_minute": self.start,
+            "end_minute": self.end,
+        }
+
+    def deal_times(self):
+        """Fields a deal carries when it holds this window itself (see timed_deals)"""
+        return {
+            "start_time": self.start_time or "",
+            "end_time": self.end_time or "",
+            "days": self.day_names() or self.day_text or list(DAY_NAMES),
+            "start_minute": self.start,
+            "end_minute": self.end,
+        }
+
+    def to_firestore_window(self):
+        """FirestoreTimeWindow (24h strings, lowercase days)"""
+        return {
+            "startTime": _minutes_text(self.start, format_minutes_24h) or self.start_time,
+            "endTime": _minutes_text(self.end, format_minutes_24h) or self.end_time,
+            "days": [DAY_NAMES[d].lower() for d in self.days],
+        }
+
+
+class MenuParsing:
+    """AIMenuParsing, validated once when it comes out of Gemini"""
+
+    __slots__ = ("restaurant_name", "deals", "time_frame", "special_conditions")
+
+    def __init__(self, restaurant_name, deals, time_frame, special_conditions=None):
+        self.restaurant_name = restaurant_name
+        self.deals = deals
+        self.time_frame = time_frame
+        self.special_conditions = special_conditions
+
+    @classmethod
+    def from_gemini(cls, data):
+        """
+        Validate decoded Gemini JSON (also accepts a stored document)
+
+        Raises:
+            DealValidationError: When the structure does not match the schema
+        """
+        if not isinstance(data, dict):
+            raise DealValidationError("Gemini response must be a JSON object")
+
+        deals = [DealItem.from_gemini(item) for item in _list(data.get("deals"), "deals")]
+        time_frame = [
+            TimeWindow.from_gemini(frame) for frame in _list(data.get("time_frame"), "time_frame")
+        ]
+
+        conditions = data.get("special_conditions")
+        if isinstance(conditions, str):
+            conditions = [conditions]
+        conditions = [
+            text
+            for text in (
+                _optional_text(c, "special_conditions[]")
+                for c in _list(conditions, "special_conditions")
+            )
+            if text
+        ] or None
+
+        return cls(
+            _optional_text(data.get("restaurant_name"), "restaurant_name"),
+            deals,
+            time_frame,
+            conditions,
+        )
+
+    @classmethod
+    def merge(cls, parsings):
+        """
+        Combine results for different photos of the same menu
+
+        The first restaurant name wins; deals, windows and conditions that
+        appear in more than one result are kept once, in first-seen order.
+        """
+        name = next((p.restaurant_name for p in parsings if p.restaurant_name), None)
+        deals = {}
+        windows = {}
+        conditions = {}
+        for parsing in parsings:
+            for deal in parsing.deals:
+                deals.setdefault((deal.name.casefold(), deal.price), deal)
+            for window in parsing.time_frame:
+                windows.setdefault(window.key(), window)
+            for condition in parsing.special_conditions or ():
+                conditions.setdefault(condition.casefold(), condition)
+        return cls(
+            name,
+            list(deals.values()),
+            list(windows.values()),
+            list(conditions.values()) or None,
+        )
+
+    def time_windows(self):
+        """Minute-of-week intervals of every window, Firestore-friendly"""
+        return [
+            {"start": lo, "end": hi}
+            for window in self.time_frame
+            for lo, hi in window.intervals()
+        ]
+
+    def to_document(self):
+        """
+        Shape stored in the deals collection (what parse_deal returns)
+
+        Keeps the AIMenuParsing keys the rest of the app reads, with times
+        also stored as integer minutes and precomputed time_windows.
+        """
+        return {
+            "restaurant_name": self.restaurant_name,
+            "deals": [deal.to_dict() for deal in self.deals],
+            "time_frame": [window.to_dict() for window in self.time_frame],
+            "special_conditions": self.special_conditions,
+            "time_windows": self.time_windows(),
+        }
+
+    def to_firestore_extracted(self):
+        """FirestoreDeal.extractedData (camelCase, 24h times)"""
+        return {
+            "restaurantName": self.restaurant_name,
+            "deals": [deal.to_dict() for deal in self.deals],
+            "timeFrames": [window.to_firestore_window() for window in self.time_frame],
+            "specialConditions": self.special_conditions,
+        }
+
+    def to_frontend_deals(self):
+        """
+        FrontendDeal list: one entry per deal item and time window
+        (mirrors convertToFrontendFormat in shared-schemas.ts)
+        """
+        conditions = self.special_conditions
+        if not self.time_frame:
+            return [
+                {
+                    "name": deal.name,
+                    "price": deal.price,
+                    "description": deal.description,
+                    "start_time": "",
+                    "end_time": "",
+                    "days": [],
+                    "special_conditions": conditions,
+                }
+                for deal in self.deals
+            ]
+
+        frontend = []
+        for window in self.time_frame:
+            start = _minutes_text(window.start) or window.start_time or ""
+            end = _minutes_text(window.end) or window.end_time or ""
+            days = window.day_names() or list(DAY_NAMES)
+            for deal in self.deals:
+                frontend.append(
+                    {
+                        "name": deal.name,
+                        "price": deal.price,
+                        "description": deal.description,
+                        "start_time": start,
+                        "end_time": end,
+                        "days": days,
+                        "special_conditions": conditions,
+                    }
+                )
+        return frontend
+
+
+def timed_deals(document):
+    """
+    A document's deals, each carrying the times of the upload it came from
+
+    A Gemini document's time_frame applies to all of its deals; once
+    uploads are merged into one venue that no longer holds, so every deal
+    gets its own start_time / end_time / days (one copy per window). Deals
+    that already carry times are returned as they are; deals of an upload
+    without windows get blank times, so they never borrow another upload's.
+    """
+    try:
+        windows = [
+            TimeWindow.from_gemini(frame)
+            for frame in _list(document.get("time_frame"), "time_frame")
+        ]
+    except DealValidationError as e:
+        logger.warning("Unreadable time_frame kept off the merged deals: %s", e)
+        windows = []
+
+    deals = []
+    for deal in document.get("deals") or []:
+        if not isinstance(deal, dict):
+            continue
+        if "start_time" in deal or "end_time" in deal:
+            deals.append(deal)
+        elif windows:
+            deals.extend({**deal, **window.deal_times()} for window in windows)
+        else:
+            deals.append({**deal, "start_time": "", "end_time": "", "days": []})
+    return deals
+
+
+def frontend_venue(document, venue_id=None):
+    """
+    FrontendVenueWithDeals for a stored document
+
+    Documents whose deals already carry their own times (venues.json style,
+    merged venues) pass through; Gemini-shaped ones are flattened with
+    to_frontend_deals().
+    """
+    deals = document.get("deals") or []
+    if not any(isinstance(d, dict) and "start_time" in d for d in deals):
+        try:
+            deals = MenuParsing.from_gemini(document).to_frontend_deals()
+        except DealValidationError as e:
+            logger.warning("Document %s does not match the deal schema: %s", venue_id, e)
+            deals = []
+
+    return {
+        "venue_id": str(document.get("venue_id") or venue_id or document.get("id")),
+        "venue_name": document.get("venue_name") or document.get("restaurant_name"),
+        "latitude": document.get("latitude"),
+        "longitude": document.get("longitude"),
+        "address": document.get("address"),
+        "image_url": document.get("image_url"),
+        "deals": deals,
+    }
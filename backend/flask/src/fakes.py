@@ -0,0 +1,597 @@
+"""
+Fakes
+In-memory stand-ins for the Gemini model, Firestore client and Storage bucket with injectable latency and failures
+"""
+
+import json
+import time
+import asyncio
+import uuid
+import random
+import threading
+from src.gemini_usage import IMAGE_TILE_TOKENS, image_tokens
+
+SAMPLE_RESULT = {
+    "restaurant_name": "Fake Taproom",
+    "deals": [
+        {"name": "Draft Beer", "price": "$4", "description": "All local drafts"},
+        {"name": "Wings", "price": "$8", "description": None},
+    ],
+    "time_frame": [
+        {
+            "start_time": "4:00 PM",
+            "end_time": "7:00 PM",
+            "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+        }
+    ],
+    "special_conditions": ["Dine-in only"],
+}
+
+# What Gemini usually sends back: the JSON wrapped in a markdown fence
+SAMPLE_RESPONSE_TEXT = "```json\n" + json.dumps(SAMPLE_RESULT, indent=2) + "\n```"
+
+
+class FakeServiceError(ConnectionError):
+    """Injected failure; a ConnectionError so retry.is_transient() retries it"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Faults:
+    """
+    Latency and failure injection shared by the fakes
+
+    Args:
+        latency: Seconds slept per call
+        jitter: Extra uniform random seconds in [0, jitter)
+        failure_rate: Probability (0-1) that a call raises FakeServiceError
+        seed: Optional RNG seed for repeatable runs
+        retry_after: Seconds injected failures ask callers to wait (like a
+                     quota error's Retry-After); None sends no hint
+    """
+
+    def __init__(
+        self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, retry_after=None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0)
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        return delay, fail
+
+    def _error(self, operation):
+        return FakeServiceError(f"injected {operation} failure", retry_after=self.retry_after)
+
+    def __call__(self, operation):
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise self._error(operation)
+
+    async def wait(self, operation):
+        """Same as calling, for async fakes: sleeps on the event loop"""
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise self._error(operation)
+
+
+def _copy(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+# ---------------------------------------------------------------------------
+# Gemini
+# ---------------------------------------------------------------------------
+
+
+# Rough text tokenization: Gemini averages about 4 characters per token
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(contents):
+    """Approximate prompt tokens: text by length, images by Gemini's tile rule"""
+    tokens = 0
+    for part in contents:
+        if isinstance(part, str):
+            tokens += -(-len(part) // CHARS_PER_TOKEN)
+        elif hasattr(part, "size") and not isinstance(part, (bytes, bytearray)):
+            tokens += image_tokens(*part.size)
+        else:
+            tokens += IMAGE_TILE_TOKENS
+    return tokens
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = 0
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens=0):
+        self.text = text
+        self.usage_metadata = FakeUsageMetadata(
+            prompt_tokens, -(-len(text) // CHARS_PER_TOKEN)
+        )
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel (generate_content only, with usage_metadata)"""
+
+    def __init__(self, response_text=SAMPLE_RESPONSE_TEXT, faults=None):
+        """
+        Args:
+            response_text: Text returned by every call, or a callable(contents) -> text
+            faults: Optional Faults
+        """
+        self.response_text = response_text
+        self.faults = faults or Faults()
+
+    def generate_content(self, contents, **kwargs):
+        self.faults("generate_content")
+        return self._respond(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await self.faults.wait("generate_content")
+        return self._respond(contents)
+
+    def _respond(self, contents):
+        text = self.response_text
+        if callable(text):
+            text = text(contents)
+        return FakeResponse(text, count_tokens(contents))
+
+
+# ---------------------------------------------------------------------------
+# Firestore
+# ---------------------------------------------------------------------------
+
+
+def _lookup(data, path):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _lookup(self._data or {}, field_path)
+
+
+def _select(data, field_paths):
+    """Keep only field_paths (dotted), as select() / get(field_paths=...) do"""
+    projected = {}
+    for field in field_paths:
+        value = _lookup(data, field)
+        if value is None:
+            continue
+        target = projected
+        parts = field.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        self._collection._client.faults("set")
+        self._collection._write(self.id, data, merge=merge)
+
+    def update(self, updates):
+        self._collection._client.faults("update")
+        self._collection._update(self.id, updates)
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        self._collection._client.faults("get")
+        if transaction is not None:
+            transaction._observe(self)
+        data = self._collection._read(self.id)
+        if data is not None and field_paths is not None:
+            data = _select(data, field_paths)
+        return FakeDocumentSnapshot(self, data)
+
+    def delete(self):
+        self._collection._client.faults("delete")
+        self._collection._delete(self.id)
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class FakeQuery:
+    """Supports where / order_by / select / limit / start_after / stream"""
+
+    def __init__(self, collection, filters=(), orders=(), fields=None, limit=None, after=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._fields = fields
+        self._limit = limit
+        self._after = after
+
+    def _with(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "fields": self._fields,
+            "limit": self._limit,
+            "after": self._after,
+        }
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._with(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=None):
+        return self._with(orders=self._orders + (field_path,))
+
+    def select(self, field_paths):
+        return self._with(fields=list(field_paths))
+
+    def limit(self, count):
+        return self._with(limit=count)
+
+    def start_after(self, document_fields):
+        if isinstance(document_fields, FakeDocumentSnapshot):
+            document_fields = {
+                **(document_fields._data or {}),
+                "__name__": document_fields.id,
+            }
+        return self._with(after=document_fields)
+
+    def _sort_key(self, doc_id, data):
+        key = []
+        for field in self._orders or ("__name__",):
+            value = doc_id if field == "__name__" else _lookup(data, field)
+            key.append((value is not None, value if value is not None else ""))
+        return tuple(key)
+
+    def stream(self):
+        self._collection._client.faults("stream")
+        items = self._collection._items()
+        for field, op, value in self._filters:
+            items = [(i, d) for i, d in items if _OPERATORS[op](_lookup(d, field), value)]
+        items.sort(key=lambda item: self._sort_key(*item))
+
+        if self._after is not None:
+            orders = self._orders or ("__name__",)
+            bound = tuple(
+                (True, self._after.get(field) if field in self._after else _lookup(self._after, field))
+                for field in orders
+            )
+            items = [item for item in items if self._sort_key(*item) > bound]
+
+        if self._limit is not None:
+            items = items[: self._limit]
+
+        for doc_id, data in items:
+            if self._fields is not None:
+                data = _select(data, self._fields)
+            yield FakeDocumentSnapshot(self._collection.document(doc_id), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(self)
+        self._client = client
+        self.id = name
+        self._docs = {}
+        self._versions = {}  # doc id -> write count, for transaction conflicts
+        self._lock = threading.Lock()
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def _items(self):
+        with self._lock:
+            return [(doc_id, data) for doc_id, data in self._docs.items()]
+
+    def _read(self, doc_id):
+        with self._lock:
+            data = self._docs.get(doc_id)
+        return _copy(data) if data is not None else None
+
+    def _version(self, doc_id):
+        with self._lock:
+            return self._versions.get(doc_id, 0)
+
+    def _write(self, doc_id, data, merge=False):
+        data = _copy(data)
+        with self._lock:
+            self._versions[doc_id] = self._versions.get(doc_id, 0) + 1
+            if merge and doc_id in self._docs:
+                self._docs[doc_id].update(data)
+            else:
+                self._docs[doc_id] = data
+
+    def _update(self, doc_id, updates):
+        updates = _copy(updates)
+        with self._lock:
+            if doc_id not in self._docs:
+                raise KeyError(f"No document to update: {self.id}/{doc_id}")
+            self._versions[doc_id] = self._versions.get(doc_id, 0) + 1
+            doc = self._docs[doc_id]
+            for path, value in updates.items():
+                target = doc
+                parts = path.split(".")
+                for part in parts[:-1]:
+                    target = target.setdefault(part, {})
+                target[parts[-1]] = value
+
+    def _delete(self, doc_id):
+        with self._lock:
+            self._versions[doc_id] = self._versions.get(doc_id, 0) + 1
+            self._docs.pop(doc_id, None)
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, data, merge))
+        return self
+
+    def commit(self):
+        self._client.faults("commit")
+        for reference, data, merge in self._writes:
+            reference._collection._write(reference.id, data, merge=merge)
+        self._writes = []
+
+
+class FakeTransaction:
+    """
+    Optimistic stand-in for firestore.Transaction, driven by @firestore.transactional
+
+    Reads record each document's version; commit applies the buffered writes
+    only if none of them changed since, and raises Aborted otherwise so the
+    decorator retries the whole function, as Firestore does under contention.
+    """
+
+    def __init__(self, client, max_attempts=5):
+        self._client = client
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+        self._reads = {}
+        self._writes = []
+        self.commits = 0
+        self.aborts = 0
+
+    def _clean_up(self):
+        self._id = None
+        self._reads = {}
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _observe(self, reference):
+        key = (reference._collection, reference.id)
+        self._reads.setdefault(key, reference._collection._version(reference.id))
+
+    def update(self, reference, updates):
+        self._writes.append((reference, updates))
+        return self
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, (data, merge)))
+        return self
+
+    def _commit(self):
+        from google.api_core.exceptions import Aborted
+
+        self._client.faults("commit")
+        # One commit at a time, so the version check and the writes are atomic
+        with self._client._commit_lock:
+            for (collection, doc_id), version in self._reads.items():
+                if collection._version(doc_id) != version:
+                    self.aborts += 1
+                    self._clean_up()
+                    raise Aborted(f"Contention on {collection.id}/{doc_id}")
+            for reference, change in self._writes:
+                if isinstance(change, tuple):
+                    reference._collection._write(reference.id, change[0], merge=change[1])
+                else:
+                    reference._collection._update(reference.id, change)
+        self.commits += 1
+        self._clean_up()
+        return []
+
+
+class FakeFirestore:
+    """Drop-in for firestore.client(): collections, documents, queries, batches, transactions"""
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts=5):
+        return FakeTransaction(self, max_attempts=max_attempts)
+
+
+class FakeAsyncDocumentReference:
+    """AsyncDocumentReference over a FakeCollection (set / update / get / delete)"""
+
+    def __init__(self, reference):
+        self._reference = reference
+        self._faults = reference._collection._client.faults
+        self.id = reference.id
+
+    async def set(self, data, merge=False):
+        await self._faults.wait("set")
+        self._reference._collection._write(self.id, data, merge=merge)
+
+    async def update(self, updates):
+        await self._faults.wait("update")
+        self._reference._collection._update(self.id, updates)
+
+    async def get(self, field_paths=None, **kwargs):
+        await self._faults.wait("get")
+        data = self._reference._collection._read(self.id)
+        if data is not None and field_paths is not None:
+            data = _select(data, field_paths)
+        return FakeDocumentSnapshot(self._reference, data)
+
+    async def delete(self):
+        await self._faults.wait("delete")
+        self._reference._collection._delete(self.id)
+
+
+class FakeAsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.id = collection.id
+
+    def document(self, doc_id=None):
+        return FakeAsyncDocumentReference(self._collection.document(doc_id))
+
+
+class FakeAsyncFirestore:
+    """
+    Drop-in for firestore_async.client() (document reads and writes only)
+
+    Shares its documents with a FakeFirestore, so sync and async code under
+    test see the same data.
+    """
+
+    def __init__(self, sync=None, faults=None):
+        self.sync = sync or FakeFirestore(faults=faults)
+        self.faults = self.sync.faults
+
+    def collection(self, name):
+        return FakeAsyncCollection(self.sync.collection(name))
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.chunk_size = None  # set for resumable uploads, as on storage.Blob
+        self.public_url = f"https://storage.fake/{bucket.name}/{name}"
+
+    def upload_from_file(self, file_obj, size=None, content_type=None, **kwargs):
+        self.bucket.faults("upload")
+        data = file_obj.read(size) if size is not None else file_obj.read()
+        self.content_type = content_type
+        self.bucket._store(self.name, data)
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        self.bucket.faults("upload")
+        self.content_type = content_type
+        self.bucket._store(self.name, bytes(data))
+
+    def make_public(self):
+        pass
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def delete(self):
+        self.bucket.faults("delete")
+        self.bucket.objects.pop(self.name, None)
+
+    def download_as_bytes(self):
+        self.bucket.faults("download")
+        return self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    """Drop-in for storage.bucket(); objects are kept in a dict"""
+
+    def __init__(self, name="fake-bucket", faults=None, keep_data=True):
+        """
+        Args:
+            name: Bucket name used in public URLs
+            faults: Optional Faults
+            keep_data: Store uploaded bytes (False keeps only sizes, for long benchmarks)
+        """
+        self.name = name
+        self.faults = faults or Faults()
+        self.keep_data = keep_data
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def _store(self, name, data):
+        with self._lock:
+            self.objects[name] = data if self.keep_data else len(data)
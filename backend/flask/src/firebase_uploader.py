@@ -4,25 +4,330 @@ Extracts menu information using Gemini Vision and uploads to Firestore
 """
 
 import os
+import copy
 import json
 import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
 from datetime import datetime
 from src.vision_parser import VisionMenuParser
+from src.image_preprocess import ImagePreprocessor, passthrough
+from src.active_deals import document_windows
+from src.deal_models import timed_deals
+from src.image_hash import DuplicateIndex, dhash, hash_hex
+from src.replica import VenueReplica
+from src.venue_resolver import VenueResolver
+from src.admission import shared_admission
+from src.result_cache import LRUCache
+from src.projection import project, apply_updates, UPDATED_AT
+from src.metrics import span, configure_logging, CACHE_LOOKUPS, BYTES_IN
+from src.image_source import (
+    read_image_bytes,
+    open_image_stream,
+    source_filename,
+    guess_content_type,
+)
+
+# Firestore's special field path for ordering / paging by document ID
+DOCUMENT_ID = "__name__"
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_parser_lock = threading.Lock()
+
+
+def shared_executor():
+    """
+    Process-wide thread pool for overlapping blocking I/O (Storage, Gemini).
+
+    Sized by UPLOAD_EXECUTOR_WORKERS (default 8).
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("UPLOAD_EXECUTOR_WORKERS", 8)),
+                    thread_name_prefix="upload-io",
+                )
+    return _executor
+
+
+def storage_blob_name(filename, timestamp, folder="menu_images"):
+    """Storage object name for an upload (timestamp prefix keeps names unique)"""
+    return f"{folder}/{timestamp}_{filename}"
+
+
+def build_deal_document(
+    data,
+    filename,
+    image_url=None,
+    extra_fields=None,
+    thumbnail_url=None,
+    preprocessing=None,
+):
+    """Attach form fields, upload metadata and image URLs to parsed deal data"""
+    if extra_fields:
+        data.update(extra_fields)
+    now = datetime.utcnow().isoformat()
+    data["metadata"] = {
+        "uploaded_at": now,
+        "updated_at": now,
+        "image_filename": filename,
+        "extraction_method": "gemini_vision",
+    }
+    if preprocessing:
+        data["metadata"]["preprocessing"] = preprocessing
+
+    # Minute-of-week intervals so "active now" lookups never re-parse time strings
+    # (parse_deal already adds them; older cached results may not have them)
+    if "time_windows" not in data and data.get("time_frame"):
+        data["time_windows"] = document_windows(data["time_frame"])
+
+    # Add image URL to data
+    if image_url:
+        data["image_url"] = image_url
+    if thumbnail_url:
+        data["thumbnail_url"] = thumbnail_url
+    return data
+
+
+def assemble_deal_document(
+    data, images, filenames, normalized, urls, extra_fields=None, image_hashes=None
+):
+    """
+    Parsed deal data -> the document create_deal / create_combined_deal store
+
+    One image keeps the single-image shape; several also get image_urls,
+    thumbnail_urls and metadata.image_filenames (image_url is the first photo).
+
+    Args:
+        data: parse_deal / parse_deals result
+        images: The sources as passed in (streamed uploads carry a sha256)
+        filenames: Original filenames, one per image
+        normalized: NormalizedImages, one per image
+        urls: (image_url, thumbnail_url) per image
+        extra_fields: Optional dict merged into the document
+        image_hashes: Optional perceptual hashes, one per image
+    """
+    single = len(normalized) == 1
+    data = build_deal_document(
+        data,
+        filenames[0],
+        urls[0][0],
+        extra_fields,
+        thumbnail_url=urls[0][1],
+        preprocessing=(
+            normalized[0].report() if single else [n.report() for n in normalized]
+        ),
+    )
+    if not single:
+        data["image_urls"] = [image_url for image_url, _ in urls]
+        data["thumbnail_urls"] = [thumbnail_url for _, thumbnail_url in urls]
+        data["metadata"]["image_filenames"] = list(filenames)
+    if image_hashes:
+        data["metadata"]["image_hashes"] = [hash_hex(h) for h in image_hashes]
+    # Streamed uploads (src.upload_stream) were hashed while they arrived
+    digests = [getattr(image, "sha256", None) for image in images]
+    if all(digests):
+        data["metadata"]["image_sha256"] = digests
+    return data
+
+
+def stamp_updated(updates):
+    """Set metadata.updated_at on an update() payload (in place) and return it"""
+    now = datetime.utcnow().isoformat()
+    if isinstance(updates.get("metadata"), dict):
+        updates["metadata"]["updated_at"] = now
+    else:
+        # Dotted path: touches only the timestamp, keeps uploaded_at etc.
+        updates["metadata.updated_at"] = now
+    return updates
+
+
+def first_duplicate(found, collection="final_schema"):
+    """
+    The first candidate that still exists, as find_duplicate returns it
+
+    Args:
+        found: (doc_id, distance, document or None) triples, closest first
+    """
+    for doc_id, distance, data in found:
+        if data is not None:
+            CACHE_LOOKUPS.inc(cache="dhash", result="hit")
+            logger.info(
+                "Near-duplicate of %s/%s (distance %d)", collection, doc_id, distance
+            )
+            return doc_id, data, distance
+    CACHE_LOOKUPS.inc(cache="dhash", result="miss")
+    return None
+
+
+def _deal_key(deal):
+    """Same deal at the same times (merged deals carry their own window)"""
+    start, end = deal.get("start_minute"), deal.get("end_minute")
+    if start is None or end is None:
+        start, end = deal.get("start_time"), deal.get("end_time")
+    return (
+        str(deal.get("name") or "").casefold(),
+        deal.get("price"),
+        start,
+        end,
+        tuple(deal.get("days") or ()),
+    )
+
+
+def _window_key(window):
+    start, end = window.get("start_minute"), window.get("end_minute")
+    if start is None or end is None:
+        start, end = window.get("start_time"), window.get("end_time")
+    return (start, end, tuple(window.get("days") or ()))
+
+
+def _union(existing, new, key):
+    merged = list(existing or [])
+    seen = {key(item) for item in merged}
+    for item in new or []:
+        if key(item) not in seen:
+            seen.add(key(item))
+            merged.append(item)
+    return merged
+
+
+def venue_merge_updates(existing, upload):
+    """
+    update() payload that folds an upload's document into an existing venue
+
+    Every merged deal carries the times of the upload it came from (see
+    deal_models.timed_deals): the venue's time_frame / time_windows are the
+    union of all uploads and no longer apply to each deal. Deals, windows and
+    conditions already on the venue are kept once; the upload's images are
+    appended and venue fields the venue lacks are filled in.
+    """
+    updates = {
+        "deals": _union(timed_deals(existing), timed_deals(upload), _deal_key),
+        "time_frame": _union(
+            existing.get("time_frame"), upload.get("time_frame"), _window_key
+        ),
+        "time_windows": _union(
+            existing.get("time_windows"),
+            upload.get("time_windows"),
+            lambda w: (w.get("start"), w.get("end")),
+        ),
+        "special_conditions": _union(
+            existing.get("special_conditions"),
+            upload.get("special_conditions"),
+            lambda c: str(c).casefold(),
+        )
+        or None,
+    }
+    for field in ("image_urls", "thumbnail_urls"):
+        single = field[:-1]  # image_url / thumbnail_url
+        before = existing.get(field) or [u for u in [existing.get(single)] if u]
+        added = upload.get(field) or [u for u in [upload.get(single)] if u]
+        if added:
+            updates[field] = before + added
+    for field in ("restaurant_name", "venue_name", "address", "latitude", "longitude"):
+        if existing.get(field) is None and upload.get(field) is not None:
+            updates[field] = upload[field]
+
+    metadata = existing.get("metadata") or {}
+    new_metadata = upload.get("metadata") or {}
+    updates["metadata.upload_count"] = int(metadata.get("upload_count") or 1) + 1
+    if new_metadata.get("image_hashes"):
+        updates["metadata.image_hashes"] = (
+            list(metadata.get("image_hashes") or []) + new_metadata["image_hashes"]
+        )
+    return updates
+
+
+class DuplicateImage(Exception):
+    """Raised by create_deal when reject_duplicates finds a stored near-duplicate"""
+
+    def __init__(self, doc_id, data, distance):
+        super().__init__(f"Near-duplicate of document {doc_id} (distance {distance})")
+        self.doc_id = doc_id
+        self.data = data
+        self.distance = distance
+
+
+def document_cache_from_env():
+    """
+    Cache for single-document reads
+
+    DOC_CACHE_TTL         : Seconds a cached document stays fresh, 0 disables
+                            (default 30)
+    DOC_CACHE_MAX_ENTRIES : Maximum cached documents (default 1024)
+    """
+    ttl = float(os.getenv("DOC_CACHE_TTL", 30))
+    if ttl <= 0:
+        return None
+    return LRUCache(max_entries=int(os.getenv("DOC_CACHE_MAX_ENTRIES", 1024)), ttl=ttl)
 
 
 class FirebaseUploader:
     """Handles Vision parsing and Firebase Firestore uploads"""
 
-    def __init__(self):
+    def __init__(self, db=None, bucket=None, parser=None):
         """
         Initialize Firebase connection and Vision parser.
 
         Expected environment variable:
           - FIREBASE_SERVICE_ACCOUNT_JSON : raw JSON or base64-encoded JSON string
+
+        Args:
+            db: Firestore client to use instead of connecting
+                (e.g. src.fakes.FakeFirestore)
+            bucket: Storage bucket to use instead of connecting
+                    (e.g. src.fakes.FakeBucket)
+            parser: VisionMenuParser to use instead of building one on first use
         """
+        # Vision parser (and the Gemini SDK) is built on first use, see parser
+        self._parser = parser
+
+        # Resize/re-encode uploads once before Storage and Gemini see them
+        self.preprocessor = ImagePreprocessor.from_env()
+
+        # Images above the threshold go up as a resumable upload in chunk_size
+        # pieces (a multiple of 256 KB, as Storage requires)
+        chunk_kb = int(os.getenv("STORAGE_CHUNK_KB", 1024))
+        self.chunk_size = max(1, chunk_kb // 256) * 256 * 1024
+        threshold_kb = int(os.getenv("STORAGE_RESUMABLE_THRESHOLD_KB", 5120))
+        self.resumable_threshold = threshold_kb * 1024
+
+        # Read-through cache for get_restaurant; every write drops the cached copy
+        self.doc_cache = document_cache_from_env()
+
+        # Perceptual hashes of stored images -> doc ids, for near-duplicate uploads
+        self.dedupe = DuplicateIndex.from_env()
+
+        # Local SQLite copy serving reads when READ_MODE=replica (see src.replica)
+        self.replica = VenueReplica.from_env()
+
+        # Address / geohash -> venue doc id, so repeat uploads extend one venue
+        self.venues = VenueResolver.from_env()
+        self._venue_locks = [threading.Lock() for _ in range(32)]
+
+        # Callbacks (collection, doc_id, fields) run after every document write
+        self.write_listeners = [self.invalidate_cached]
+        if self.replica is not None:
+            self.write_listeners.append(self.replica.apply_write)
+        if self.venues is not None:
+            self.write_listeners.append(self.venues.apply_write)
+
+        if db is not None and bucket is not None:
+            self.db = db
+            self.bucket = bucket
+            return
+
+        # firebase_admin pulls in the whole google-cloud stack; import on first use
+        import firebase_admin
+        from firebase_admin import credentials, firestore, storage
+
         # Load .env locally; Vercel uses environment variables directly
         load_dotenv()
 
@@ -49,112 +354,738 @@ class FirebaseUploader:
             firebase_admin.initialize_app(
                 cred, {"storageBucket": "happy-hour-mvp.firebasestorage.app"}
             )
-            print("[OK] Firebase initialized")
+            logger.info("Firebase initialized")
         else:
-            print("[OK] Using existing Firebase connection")
+            logger.info("Using existing Firebase connection")
+
+        self.db = db if db is not None else firestore.client()
+        logger.info("Connected to Firestore")
+
+        self.bucket = bucket if bucket is not None else storage.bucket()
+        logger.info("Connected to Firebase Storage")
 
-        self.db = firestore.client()
-        print("[OK] Connected to Firestore")
+    @property
+    def parser(self):
+        """VisionMenuParser, created on first access."""
+        if self._parser is None:
+            with _parser_lock:
+                if self._parser is None:
+                    self._parser = VisionMenuParser()
+        return self._parser
 
-        self.bucket = storage.bucket()
-        print("[OK] Connected to Firebase Storage")
+    @parser.setter
+    def parser(self, value):
+        self._parser = value
 
-        # Initialize Vision parser
-        self.parser = VisionMenuParser()
+    def add_write_listener(self, callback):
+        """
+        Register callback(collection, doc_id, fields) for document writes.
+
+        fields is the whole document on create and the update() payload on
+        update, dotted paths included (see src.projection.apply_updates).
+        """
+        self.write_listeners.append(callback)
+
+    def invalidate_cached(self, collection, doc_id, fields=None):
+        """Drop a document from the read-through cache."""
+        if getattr(self, "doc_cache", None) is not None:
+            self.doc_cache.delete((collection, doc_id))
+
+    def notify_write(self, collection, doc_id, fields):
+        """Run write listeners; a failing listener never fails the write."""
+        for callback in self.write_listeners:
+            try:
+                callback(collection, doc_id, fields)
+            except Exception as e:
+                logger.warning(
+                    "Write listener failed for %s/%s: %s", collection, doc_id, e
+                )
+
+    def upload_image_to_storage(
+        self,
+        image,
+        folder="menu_images",
+        filename=None,
+        content_type=None,
+        raise_errors=False,
+        timestamp=None,
+    ):
+        """
+        Upload image to Firebase Storage and return public URL.
 
-    def upload_image_to_storage(self, image_path, folder="menu_images"):
-        """Upload image to Firebase Storage and return public URL."""
+        Args:
+            image: Path to image, or image bytes / memoryview / file-like object
+            folder: Storage folder for the blob
+            filename: Name used for the blob (defaults to the path/file name)
+            content_type: MIME type (guessed from filename if omitted)
+            raise_errors: Re-raise failures instead of returning None
+            timestamp: Blob name prefix (defaults to the current UTC time)
+        """
         try:
             # Generate unique filename
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.basename(image_path)
-            blob_name = f"{folder}/{timestamp}_{filename}"
+            timestamp = timestamp or datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            filename = filename or source_filename(image)
+            blob_name = storage_blob_name(filename, timestamp, folder)
 
-            # Upload to Firebase Storage
-            blob = self.bucket.blob(blob_name)
-            blob.upload_from_filename(image_path)
+            # Upload to Firebase Storage straight from memory
+            buffer = read_image_bytes(image)
+            size = memoryview(buffer).nbytes
+            with span("storage_upload"):
+                blob = self.bucket.blob(blob_name)
+                if size > self.resumable_threshold:
+                    # Resumable upload sent (and retried) one chunk at a time
+                    blob.chunk_size = self.chunk_size
+                blob.upload_from_file(
+                    open_image_stream(buffer),
+                    size=size,
+                    content_type=content_type or guess_content_type(filename),
+                )
 
-            # Make the blob publicly accessible
-            blob.make_public()
+                # Make the blob publicly accessible
+                blob.make_public()
 
             # Get public URL
             public_url = blob.public_url
-            print(f"[OK] Uploaded image to Storage: {blob_name}")
-            print(f"[OK] Public URL: {public_url}")
+            logger.info("Uploaded image to Storage: %s", blob_name)
 
             return public_url
         except Exception as e:
-            print(f"[ERROR] Failed to upload image to Storage: {e}")
+            logger.error("Failed to upload image to Storage: %s", e)
+            if raise_errors:
+                raise
             return None
 
-    def upload_deal(self, image_path, collection="final_schema"):
-        """Extract menu data via Gemini and upload to Firestore."""
-        print(f"\n{'=' * 70}")
-        print(f"Processing: {image_path}")
-        print(f"{'=' * 70}\n")
+    def prepare_image(self, image, filename):
+        """
+        Run the preprocessing stage (resize, orient, re-encode, thumbnail).
 
-        # Upload image to Firebase Storage
-        image_url = self.upload_image_to_storage(image_path)
+        Returns:
+            NormalizedImage: Shared by the Storage upload and the Gemini call
+        """
+        if self.preprocessor is None:
+            return passthrough(image, filename)
+        try:
+            with span("preprocess"):
+                normalized = self.preprocessor.process(image, filename)
+        except Exception as e:
+            logger.warning("Image preprocessing failed, using original: %s", e)
+            return passthrough(image, filename)
 
-        data = self.parser.parse_deal(image_path)
-        data["metadata"] = {
-            "uploaded_at": datetime.utcnow().isoformat(),
-            "image_filename": os.path.basename(image_path),
-            "extraction_method": "gemini_vision",
-        }
+        logger.info(
+            "Preprocessed %s: %d -> %d bytes (%d saved)",
+            filename,
+            normalized.original_bytes,
+            len(normalized.data),
+            normalized.bytes_saved,
+        )
+        return normalized
 
-        # Add image URL to data
-        if image_url:
-            data["image_url"] = image_url
+    def store_image(self, normalized, raise_errors=False, timestamp=None):
+        """
+        Upload a NormalizedImage and its thumbnail (if any) side by side.
 
-        print(f"\n{'=' * 70}")
-        print("Uploading to Firestore...")
-        print(f"{'=' * 70}\n")
+        Args:
+            timestamp: Blob name prefix (defaults to the current UTC time)
+
+        Returns:
+            tuple: (image_url, thumbnail_url)
+        """
+        timestamp = timestamp or datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        image_url = self.upload_image_to_storage(
+            normalized.data,
+            filename=normalized.filename,
+            content_type=normalized.content_type,
+            raise_errors=raise_errors,
+            timestamp=timestamp,
+        )
+        thumbnail_url = None
+        if normalized.thumbnail is not None:
+            thumbnail_url = self.upload_image_to_storage(
+                normalized.thumbnail,
+                filename=normalized.thumbnail_filename,
+                content_type=normalized.content_type,
+                raise_errors=raise_errors,
+                timestamp=timestamp,
+            )
+        return image_url, thumbnail_url
 
-        doc_ref = self.db.collection(collection).add(data)
-        doc_id = doc_ref[1].id
+    def discard_images(self, normalized, timestamp, pending=()):
+        """
+        Delete images stored for an upload that failed after the Storage step.
 
-        print(f"[OK] Uploaded to Firestore: {collection}/{doc_id}")
-        print(f"{'=' * 70}\n")
+        Args:
+            normalized: NormalizedImages passed to store_image
+            timestamp: The timestamp they were stored under
+            pending: Futures of store_image calls to wait for first
+        """
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                pass  # nothing (or only part) was stored; deleting is still safe
+        for item in normalized:
+            for filename in (item.filename, item.thumbnail_filename):
+                if not filename:
+                    continue
+                blob_name = storage_blob_name(filename, timestamp)
+                try:
+                    self.bucket.blob(blob_name).delete()
+                    logger.info("Deleted orphaned image %s", blob_name)
+                except Exception as e:
+                    logger.warning(
+                        "Could not delete orphaned image %s: %s", blob_name, e
+                    )
 
+    def check_admission(self):
+        """
+        Refuse an upload before any Storage work when Gemini is saturated.
+
+        Raises:
+            src.admission.Overloaded
+        """
+        # Before the parser exists (first request) its controller is the shared one
+        if self._parser is None:
+            admission = shared_admission()
+        else:
+            admission = getattr(self._parser, "admission", None)
+        if admission is not None:
+            admission.check()
+
+    def image_hashes(self, normalized):
+        """
+        Perceptual hashes (dHash) of preprocessed images.
+
+        Uses the hash the preprocessor took while the image was decoded, and
+        only decodes again for passthrough images.
+
+        Returns:
+            list or None: One int per image; None when dedupe is disabled or an
+                          image cannot be decoded
+        """
+        if self.dedupe is None:
+            return None
+        try:
+            with span("dhash"):
+                return [
+                    n.dhash if n.dhash is not None else dhash(n.data)
+                    for n in normalized
+                ]
+        except Exception as e:
+            logger.warning("Could not hash image for dedupe: %s", e)
+            return None
+
+    def find_duplicate(self, hashes, collection="final_schema"):
+        """
+        Existing document whose images match every one of the given hashes.
+
+        Returns:
+            tuple or None: (doc_id, data, distance) of the closest stored document
+                           that still exists; distance is the worst per-image match
+        """
+        if self.dedupe is None or not hashes:
+            return None
+        # Lazily: stop reading documents at the first one that still exists
+        found = (
+            (doc_id, distance, self.get_restaurant(doc_id, collection))
+            for doc_id, distance in self.duplicate_candidates(hashes)
+        )
+        return first_duplicate(found, collection)
+
+    def duplicate_candidates(self, hashes):
+        """
+        Stored documents within the dedupe threshold of every one of the hashes.
+
+        Returns:
+            list: (doc_id, distance) pairs, closest first; distance is the
+                  worst per-image match
+        """
+        if self.dedupe is None or not hashes:
+            return []
+
+        candidates = None
+        for value in hashes:
+            matches = {}
+            for distance, doc_id in self.dedupe.find(value):
+                matches.setdefault(doc_id, distance)
+            if candidates is None:
+                candidates = matches
+            else:
+                candidates = {
+                    doc_id: max(candidates[doc_id], distance)
+                    for doc_id, distance in matches.items()
+                    if doc_id in candidates
+                }
+            if not candidates:
+                break
+        return sorted((candidates or {}).items(), key=lambda item: item[1])
+
+    def remember_hashes(self, doc_id, hashes):
+        """Map a stored document's image hashes to it for later lookups."""
+        if self.dedupe is None or not hashes:
+            return
+        for value in hashes:
+            self.dedupe.add(value, doc_id)
+
+    def upload_deal(self, image, collection="final_schema", filename=None):
+        """
+        Extract menu data via Gemini and upload to Firestore.
+
+        Args:
+            image: Path to image, or image bytes / memoryview / file-like object.
+                   The contents are read once and shared by every stage.
+            collection: Firestore collection name
+            filename: Original filename (defaults to the path/file name)
+
+        Returns:
+            str: Firestore document ID
+        """
+        doc_id, _ = self.create_deal(image, collection=collection, filename=filename)
         return doc_id
 
+    def create_deal(
+        self,
+        image,
+        collection="final_schema",
+        filename=None,
+        extra_fields=None,
+        reject_duplicates=False,
+    ):
+        """
+        Extract menu data and write it to Firestore in a single document write.
+
+        The Storage upload runs on the shared executor while Gemini parses the
+        same buffer on the calling thread, so latency is roughly the slower of
+        the two instead of their sum.
+
+        Args:
+            image: Path to image, or image bytes / memoryview / file-like object
+            collection: Firestore collection name
+            filename: Original filename (defaults to the path/file name)
+            extra_fields: Optional dict merged into the document before the
+                          write (e.g. venue_name, address from the upload form)
+            reject_duplicates: Raise DuplicateImage instead of uploading and
+                               parsing when a stored image is a near-duplicate
+
+        Returns:
+            tuple: (doc_id, data) where data is exactly what was stored
+
+        Raises:
+            DuplicateImage: Only with reject_duplicates
+            src.admission.Overloaded: Gemini is saturated; nothing is left in
+                                      Storage or Firestore
+        """
+        filename = filename or source_filename(image)
+        logger.info("Processing: %s", filename)
+
+        normalized = self.prepare_image(image, filename)
+        BYTES_IN.inc(normalized.original_bytes, source="upload")
+
+        image_hashes = self.image_hashes([normalized])
+        if reject_duplicates:
+            duplicate = self.find_duplicate(image_hashes, collection)
+            if duplicate is not None:
+                raise DuplicateImage(*duplicate)
+
+        self.check_admission()
+
+        # Storage upload and Gemini parse don't depend on each other
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        urls_future = shared_executor().submit(
+            self.store_image, normalized, timestamp=timestamp
+        )
+        try:
+            data = self.parser.parse_deal(normalized.data)
+        except Exception:
+            # No document will point at the image; don't leave it in Storage
+            self.discard_images([normalized], timestamp, [urls_future])
+            raise
+        urls = urls_future.result()
+
+        data = assemble_deal_document(
+            data, [image], [filename], [normalized], [urls], extra_fields, image_hashes
+        )
+        return self.store_deal_document(data, collection, image_hashes)
+
+    def create_combined_deal(
+        self,
+        images,
+        collection="final_schema",
+        filenames=None,
+        extra_fields=None,
+        reject_duplicates=False,
+    ):
+        """
+        Extract one menu spread across several photos into a single document.
+
+        Every photo is preprocessed and uploaded to Storage in parallel while
+        Gemini reads them together (parser.parse_deals), so a 3-photo menu costs
+        one model call and one Firestore write instead of three of each.
+
+        Args:
+            images: List of paths / bytes / file-like objects of the same menu
+            collection: Firestore collection name
+            filenames: Original filenames, one per image (default: derived)
+            extra_fields: Optional dict merged into the document before the write
+            reject_duplicates: See create_deal; every photo must match the same
+                               stored document
+
+        Returns:
+            tuple: (doc_id, data) where data is exactly what was stored. image_url
+                   is the first photo; image_urls lists all of them in order.
+        """
+        images = list(images)
+        if not images:
+            raise ValueError("create_combined_deal needs at least one image")
+        filenames = list(filenames or [source_filename(image) for image in images])
+        if len(images) == 1:
+            return self.create_deal(
+                images[0],
+                collection=collection,
+                filename=filenames[0],
+                extra_fields=extra_fields,
+                reject_duplicates=reject_duplicates,
+            )
+        logger.info("Processing %d images as one menu: %s", len(images), filenames)
+
+        normalized = [
+            self.prepare_image(image, filename)
+            for image, filename in zip(images, filenames)
+        ]
+        for item in normalized:
+            BYTES_IN.inc(item.original_bytes, source="upload")
+
+        image_hashes = self.image_hashes(normalized)
+        if reject_duplicates:
+            duplicate = self.find_duplicate(image_hashes, collection)
+            if duplicate is not None:
+                raise DuplicateImage(*duplicate)
+
+        self.check_admission()
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        urls_futures = [
+            shared_executor().submit(self.store_image, n, timestamp=timestamp)
+            for n in normalized
+        ]
+        try:
+            data = self.parser.parse_deals([n.data for n in normalized])
+        except Exception:
+            self.discard_images(normalized, timestamp, urls_futures)
+            raise
+        urls = [future.result() for future in urls_futures]
+
+        data = assemble_deal_document(
+            data, images, filenames, normalized, urls, extra_fields, image_hashes
+        )
+        return self.store_deal_document(data, collection, image_hashes)
+
+    def store_deal_document(self, data, collection="final_schema", image_hashes=None):
+        """
+        Write an assembled upload: into the venue it belongs to, or as a new document.
+
+        A failed parse ({"error": ...}) is stored on its own and kept out of
+        the duplicate index, so uploading the same photo again retries it.
+
+        Returns:
+            tuple: (doc_id, data) where data is the stored document
+        """
+        merged = self.merge_into_venue(data, collection, image_hashes)
+        if merged is not None:
+            return merged
+
+        with span("firestore_add"):
+            doc_ref = self.db.collection(collection).document()
+            doc_ref.set(data)
+        return self.record_added(collection, doc_ref.id, data, image_hashes)
+
+    def merge_into_venue(self, data, collection="final_schema", image_hashes=None):
+        """
+        Fold an assembled upload into the existing venue it belongs to, if any.
+
+        Returns:
+            tuple or None: (doc_id, merged document); None when the upload is a
+                           failed parse or a venue not seen before
+        """
+        if data.get("error"):
+            return None
+        doc_id = self.match_venue(data, collection)
+        if doc_id is None:
+            return None
+        merged = self.append_to_venue(doc_id, data, collection)
+        if merged is None:
+            return None
+        self.remember_hashes(doc_id, image_hashes)
+        return doc_id, merged
+
+    def record_added(self, collection, doc_id, data, image_hashes=None):
+        """
+        Bookkeeping after a new upload document is written: listeners and dedupe.
+
+        Returns:
+            tuple: (doc_id, data)
+        """
+        self.notify_write(collection, doc_id, data)
+        if not data.get("error"):
+            self.remember_hashes(doc_id, image_hashes)
+        logger.info("Uploaded to Firestore: %s/%s", collection, doc_id)
+        return doc_id, data
+
+    def match_venue(self, data, collection="final_schema"):
+        """Document ID of the existing venue an upload belongs to, or None."""
+        if self.venues is None:
+            return None
+        return self.venues.resolve(data, collection)
+
+    def append_to_venue(self, doc_id, data, collection="final_schema"):
+        """
+        Fold an assembled upload into an existing venue document.
+
+        The read-modify-write runs in a Firestore transaction, which is retried
+        when another worker or instance writes the venue in between, so
+        concurrent uploads never drop each other's deals. A per-venue lock
+        keeps uploads in this process from contending with each other.
+
+        Returns:
+            dict or None: The venue document after the update; None when it no
+                          longer exists
+        """
+        from firebase_admin import firestore
+
+        ref = self.db.collection(collection).document(doc_id)
+
+        @firestore.transactional
+        def merge(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None, None
+            existing = snapshot.to_dict() or {}
+            updates = stamp_updated(venue_merge_updates(existing, data))
+            transaction.update(ref, updates)
+            return existing, updates
+
+        with self._venue_locks[hash(doc_id) % len(self._venue_locks)]:
+            with span("firestore_transaction"):
+                existing, updates = merge(self.db.transaction())
+        if existing is None:
+            return None
+        logger.info("Updated %s/%s", collection, doc_id)
+        self.notify_write(collection, doc_id, updates)
+
+        logger.info(
+            "Merged upload (%d deals) into existing venue %s/%s",
+            len(data.get("deals") or ()),
+            collection,
+            doc_id,
+        )
+        return apply_updates(existing, updates)
+
     def update_deal(self, doc_id, updates, collection="final_schema"):
         """Update existing restaurant data in Firestore."""
-        if "metadata" not in updates:
-            updates["metadata"] = {}
-        updates["metadata"]["updated_at"] = datetime.utcnow().isoformat()
-
-        self.db.collection(collection).document(doc_id).update(updates)
-        print(f"[OK] Updated {collection}/{doc_id}")
-
-    def get_restaurant(self, doc_id, collection="final_schema"):
-        """Get a single restaurant by document ID."""
-        doc = self.db.collection(collection).document(doc_id).get()
-        if doc.exists:
-            return {"id": doc.id, **doc.to_dict()}
+        stamp_updated(updates)
+        with span("firestore_update"):
+            self.db.collection(collection).document(doc_id).update(updates)
+        logger.info("Updated %s/%s", collection, doc_id)
+        self.notify_write(collection, doc_id, updates)
+
+    def replica_for(self, collection):
+        """Read replica if it mirrors collection and is within its staleness bound"""
+        replica = self.replica
+        if replica is None or replica.collection != collection:
+            return None
+        return replica if replica.is_fresh() else None
+
+    def get_restaurant(self, doc_id, collection="final_schema", fields=None):
+        """
+        Get a single restaurant by document ID (cached for DOC_CACHE_TTL seconds).
+
+        Args:
+            fields: Optional list of field paths; only these (and "id") are
+                    returned. A cache miss then reads just these fields from
+                    Firestore (get(field_paths=...)) and is not cached.
+        """
+        restaurant = self.local_restaurant(doc_id, collection, fields)
+        if restaurant is not None:
+            return restaurant
+
+        with span("firestore_get"):
+            doc = self.db.collection(collection).document(doc_id).get(
+                field_paths=list(fields) if fields else None
+            )
+        if not doc.exists:
+            return None
+        restaurant = {"id": doc.id, **(doc.to_dict() or {})}
+        if not fields:
+            self.cache_restaurant(collection, restaurant)
+        return restaurant
+
+    def local_restaurant(self, doc_id, collection="final_schema", fields=None):
+        """
+        get_restaurant without Firestore: the document cache, then the replica.
+
+        Returns:
+            dict or None: None when neither has the document
+        """
+        cache = self.doc_cache
+        if cache is not None:
+            cached = cache.get((collection, doc_id))
+            if cached is not None:
+                CACHE_LOOKUPS.inc(cache="document", result="hit")
+                return project(cached, fields) if fields else copy.deepcopy(cached)
+            CACHE_LOOKUPS.inc(cache="document", result="miss")
+
+        replica = self.replica_for(collection)
+        if replica is not None:
+            restaurant = replica.get(doc_id)
+            if restaurant is not None:
+                CACHE_LOOKUPS.inc(cache="replica", result="hit")
+                return project(restaurant, fields)
+            # Possibly written elsewhere since the last sync: ask Firestore
+            CACHE_LOOKUPS.inc(cache="replica", result="miss")
         return None
 
-    def get_all_restaurants(self, collection="final_schema", limit=None):
+    def cache_restaurant(self, collection, restaurant):
+        """Keep a full document read from Firestore in the document cache."""
+        if self.doc_cache is not None:
+            self.doc_cache.set(
+                (collection, restaurant["id"]), copy.deepcopy(restaurant)
+            )
+
+    def iter_restaurants(
+        self,
+        collection="final_schema",
+        page_size=500,
+        fields=None,
+        start_after=None,
+        limit=None,
+        since=None,
+        use_replica=True,
+    ):
+        """
+        Stream restaurants page by page.
+
+        Only one page is held in memory at a time; each page is a fresh query
+        resuming after the last document seen, so no stream stays open long.
+
+        Without since, documents come in document-ID order. With since, only
+        documents whose metadata.updated_at is after the watermark are read,
+        ordered by (updated_at, document ID); start_after then resumes after
+        the document with that ID at exactly the since timestamp.
+
+        Args:
+            collection: Firestore collection name
+            page_size: Documents fetched per query
+            fields: Optional list of field paths to project with select()
+            start_after: Optional document ID to resume after (a page cursor)
+            limit: Optional maximum number of documents
+            since: Optional ISO timestamp watermark on metadata.updated_at
+            use_replica: Serve full scans from the read replica when it is
+                         fresh (False always reads Firestore)
+
+        Yields:
+            dict: {"id": ..., **fields}
+        """
+        replica = self.replica_for(collection) if use_replica else None
+        if replica is not None and since is None and start_after is None:
+            yield from replica.iter_documents(fields=fields, limit=limit)
+            return
+
+        from firebase_admin import firestore
+
+        base = self.db.collection(collection)
+        if since is not None:
+            op = ">=" if start_after is not None else ">"
+            base = base.where(
+                filter=firestore.FieldFilter(UPDATED_AT, op, since)
+            ).order_by(UPDATED_AT)
+        base = base.order_by(DOCUMENT_ID)
+        if fields:
+            fields = list(fields)
+            if since is not None and UPDATED_AT not in fields:
+                fields.append(UPDATED_AT)
+            base = base.select(fields)
+
+        remaining = limit
+        cursor = None
+        if start_after is not None:
+            cursor = {DOCUMENT_ID: start_after}
+            if since is not None:
+                cursor = {UPDATED_AT: since, DOCUMENT_ID: start_after}
+
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            query = base.limit(size)
+            if cursor is not None:
+                query = query.start_after(cursor)
+
+            count = 0
+            for doc in query.stream():
+                count += 1
+                cursor = {DOCUMENT_ID: doc.id}
+                if since is not None:
+                    cursor = {UPDATED_AT: doc.get(UPDATED_AT), DOCUMENT_ID: doc.id}
+                yield {"id": doc.id, **(doc.to_dict() or {})}
+
+            if remaining is not None:
+                remaining -= count
+            if count < size:
+                return
+
+    def get_all_restaurants(self, collection="final_schema", limit=None, fields=None):
         """Get all restaurants from Firestore."""
-        query = self.db.collection(collection)
-        if limit:
-            query = query.limit(limit)
-        docs = query.stream()
-        return [{"id": doc.id, **doc.to_dict()} for doc in docs]
-
-    def batch_upload(self, image_paths, collection="final_schema"):
-        """Upload multiple menu images to Firestore."""
+        return list(self.iter_restaurants(collection, fields=fields, limit=limit))
+
+    def batch_upload(
+        self,
+        image_paths,
+        collection="final_schema",
+        workers=4,
+        checkpoint_path=None,
+        progress=None,
+        **engine_options,
+    ):
+        """
+        Upload multiple menu images to Firestore.
+
+        Images are processed on a bounded worker pool with per-stage
+        concurrency limits and retries; documents are committed in batches.
+
+        Args:
+            image_paths: List of image paths
+            collection: Firestore collection name
+            workers: Number of worker threads
+            checkpoint_path: Optional JSONL checkpoint file for resuming
+            progress: Optional callback called with (done, total, result)
+            **engine_options: Extra BatchUploadEngine options
+                              (gemini_concurrency, storage_concurrency,
+                              firestore_concurrency, batch_size, max_attempts,
+                              skip_duplicates)
+
+        Returns:
+            list: One result dict per image
+        """
+        from src.batch_uploader import BatchUploadEngine
+
+        engine = BatchUploadEngine(
+            self,
+            collection=collection,
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+            **engine_options,
+        )
+
         results = []
-        for i, image_path in enumerate(image_paths, 1):
-            print(f"\n[{i}/{len(image_paths)}] Processing {image_path}...")
-            try:
-                doc_id = self.upload_deal(image_path, collection)
-                results.append({"image": image_path, "id": doc_id, "status": "success"})
-            except Exception as e:
-                print(f"[ERROR] Failed to process {image_path}: {e}")
-                results.append(
-                    {"image": image_path, "error": str(e), "status": "failed"}
+        total = len(image_paths)
+        for result in engine.run(image_paths):
+            results.append(result)
+            if progress:
+                progress(len(results), total, result)
+            else:
+                logger.info(
+                    "[%d/%d] %s: %s",
+                    len(results),
+                    total,
+                    result["status"],
+                    result["image"],
                 )
         return results
 
@@ -162,24 +1093,72 @@ class FirebaseUploader:
 def main():
     """Example CLI usage"""
     import argparse
+    from src.batch_uploader import collect_images
 
     parser = argparse.ArgumentParser(
         description="Extract menu data and upload to Firestore"
     )
-    parser.add_argument("image", help="Path to menu image")
+    parser.add_argument(
+        "image", help="Path to menu image, a directory of images, or a glob pattern"
+    )
     parser.add_argument(
         "--collection",
         default="final_schema",
         help="Firestore collection name (default: final_schema)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Parallel workers for directory/glob uploads (default: 4)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="JSONL checkpoint file; re-run with the same file to resume",
+    )
+    parser.add_argument(
+        "--combine",
+        action="store_true",
+        help="Treat all matched images as photos of one menu (single document)",
+    )
 
     args = parser.parse_args()
+    configure_logging()
+
+    image_paths = collect_images(args.image)
+    if not image_paths:
+        parser.error(f"No images found for {args.image}")
 
     uploader = FirebaseUploader()
-    doc_id = uploader.upload_deal(args.image, collection=args.collection)
+
+    if args.combine:
+        doc_id, _ = uploader.create_combined_deal(
+            image_paths, collection=args.collection
+        )
+
+        print(f"\n{'=' * 70}")
+        print(f"SUCCESS! {len(image_paths)} images -> Document ID: {doc_id}")
+        print(f"{'=' * 70}")
+        return
+
+    if len(image_paths) == 1 and image_paths[0] == args.image:
+        doc_id = uploader.upload_deal(args.image, collection=args.collection)
+
+        print(f"\n{'=' * 70}")
+        print(f"SUCCESS! Document ID: {doc_id}")
+        print(f"{'=' * 70}")
+        return
+
+    results = uploader.batch_upload(
+        image_paths,
+        collection=args.collection,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+    )
+    succeeded = sum(1 for r in results if r["status"] != "failed")
 
     print(f"\n{'=' * 70}")
-    print(f"SUCCESS! Document ID: {doc_id}")
+    print(f"DONE! {succeeded}/{len(results)} images uploaded")
     print(f"{'=' * 70}")
 
 
@@ -0,0 +1,125 @@
+"""
+Gemini Usage
+Token and latency accounting per model call, and image token budgets
+"""
+
+import math
+import threading
+import PIL.Image
+
+# Gemini bills an image with both edges <= SMALL_IMAGE_EDGE as one tile;
+# larger images are scaled and cut into TILE_EDGE x TILE_EDGE tiles
+IMAGE_TILE_TOKENS = 258
+TILE_EDGE = 768
+SMALL_IMAGE_EDGE = 384
+
+USAGE_FIELDS = (
+    "prompt_tokens",
+    "output_tokens",
+    "cached_tokens",
+    "total_tokens",
+    "image_tokens",
+    "model_seconds",
+)
+
+
+def image_tokens(width, height):
+    """Estimated input tokens for one image of the given size"""
+    if width <= SMALL_IMAGE_EDGE and height <= SMALL_IMAGE_EDGE:
+        return IMAGE_TILE_TOKENS
+    return math.ceil(width / TILE_EDGE) * math.ceil(height / TILE_EDGE) * IMAGE_TILE_TOKENS
+
+
+def budget_scale(width, height, max_tokens):
+    """
+    Largest scale (<= 1) at which an image costs at most max_tokens
+
+    Tries every tile grid that fits the budget and keeps the one that needs
+    the least downscaling; a budget under two tiles means the one-tile size.
+    """
+    if image_tokens(width, height) <= max_tokens:
+        return 1.0
+    best = min(SMALL_IMAGE_EDGE / width, SMALL_IMAGE_EDGE / height)
+    tiles = max_tokens // IMAGE_TILE_TOKENS
+    for cols in range(1, tiles + 1):
+        rows = tiles // cols
+        scale = min(cols * TILE_EDGE / width, rows * TILE_EDGE / height)
+        best = max(best, scale)
+    return min(best, 1.0)
+
+
+def fit_image(img, max_tokens):
+    """
+    img, downscaled if needed so it costs at most max_tokens
+
+    Returns:
+        tuple: (image, estimated tokens); the image is img itself when it already fits
+    """
+    if not max_tokens:
+        return img, image_tokens(*img.size)
+    scale = budget_scale(img.width, img.height, max_tokens)
+    if scale < 1.0:
+        # floor keeps the edges inside the tile grid the scale was picked for
+        size = (max(1, math.floor(img.width * scale)), max(1, math.floor(img.height * scale)))
+        img = img.resize(size, PIL.Image.LANCZOS)
+    return img, image_tokens(*img.size)
+
+
+def usage_from_response(response):
+    """
+    Token counts from a generate_content response's usage_metadata
+
+    Returns:
+        dict: prompt_tokens, output_tokens, cached_tokens, total_tokens (0 when not reported)
+    """
+    metadata = getattr(response, "usage_metadata", None)
+
+    def count(name):
+        return int(getattr(metadata, name, 0) or 0)
+
+    prompt = count("prompt_token_count")
+    output = count("candidates_token_count")
+    return {
+        "prompt_tokens": prompt,
+        "output_tokens": output,
+        "cached_tokens": count("cached_content_token_count"),
+        "total_tokens": count("total_token_count") or prompt + output,
+    }
+
+
+class UsageTracker:
+    """Thread-safe running totals of Gemini calls (tokens, estimated image tokens, seconds)"""
+
+    def __init__(self):
+        self.calls = 0
+        self._totals = dict.fromkeys(USAGE_FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """Add one call's usage dict (keys from USAGE_FIELDS)"""
+        with self._lock:
+            self.calls += 1
+            for field in USAGE_FIELDS:
+                self._totals[field] += usage.get(field, 0)
+
+    def snapshot(self):
+        """
+        Totals so far, plus per-call means
+
+        prompt_overhead_tokens is the mean prompt cost beyond the estimated
+        image tokens: the instructions and per-request text, i.e. what prefix
+        caching can save.
+        """
+        with self._lock:
+            calls = self.calls
+            totals = dict(self._totals)
+        totals["model_seconds"] = round(totals["model_seconds"], 6)
+        result = {"calls": calls, **totals}
+        if calls:
+            result["mean_prompt_tokens"] = totals["prompt_tokens"] / calls
+            result["mean_output_tokens"] = totals["output_tokens"] / calls
+            result["mean_model_seconds"] = totals["model_seconds"] / calls
+            result["prompt_overhead_tokens"] = (
+                totals["prompt_tokens"] - totals["image_tokens"]
+            ) / calls
+        return result
@@ -0,0 +1,199 @@
+"""
+Geo Index
+Grid-bucketed spatial index over venue coordinates with NumPy haversine ranking
+"""
+
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_m(lat, lon, lats, lons):
+    """
+    Great-circle distance in meters from one point to many
+
+    Args:
+        lat, lon: Origin in degrees
+        lats, lons: NumPy arrays of degrees
+
+    Returns:
+        numpy.ndarray: Distances in meters
+    """
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def top_k(indices, distances, k):
+    """
+    Select the k nearest candidates without sorting all of them
+
+    Returns:
+        tuple: (indices, distances) of at most k items, nearest first
+    """
+    if k is not None and len(distances) > k:
+        part = np.argpartition(distances, k - 1)[:k]
+        indices, distances = indices[part], distances[part]
+    order = np.argsort(distances, kind="stable")
+    return indices[order], distances[order]
+
+
+class GeoIndex:
+    """
+    Points bucketed into fixed-size lat/lon cells.
+
+    Point indices are stored sorted by cell so each cell is one contiguous
+    slice; a radius query only touches the cells overlapping its bounding box.
+    Points added after build() sit in a small unsorted tail that is scanned
+    linearly and folded into the sorted part once it grows past
+    rebuild_threshold.
+    """
+
+    def __init__(self, cell_deg=0.01, rebuild_threshold=1024):
+        """
+        Args:
+            cell_deg: Cell size in degrees (0.01 deg is roughly 1.1 km)
+            rebuild_threshold: Tail size that triggers a rebuild on add()
+        """
+        self.cell_deg = cell_deg
+        self.rebuild_threshold = rebuild_threshold
+        self.lats = np.empty(0)
+        self.lons = np.empty(0)
+        self._order = np.empty(0, dtype=np.int64)
+        self._cells = {}
+        self._tail_lats = []
+        self._tail_lons = []
+
+    def __len__(self):
+        return len(self.lats) + len(self._tail_lats)
+
+    def build(self, lats, lons):
+        """
+        (Re)build the index
+
+        Args:
+            lats, lons: Sequences of coordinates; position i is point i
+        """
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self._tail_lats, self._tail_lons = [], []
+        if not len(self.lats):
+            self._order = np.empty(0, dtype=np.int64)
+            self._cells = {}
+            return self
+
+        rows = np.floor(self.lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(self.lons / self.cell_deg).astype(np.int64)
+        keys = rows * (1 << 32) + cols
+        self._order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[self._order]
+        uniq, starts = np.unique(sorted_keys, return_index=True)
+        ends = np.append(starts[1:], len(sorted_keys))
+        self._cells = {
+            int(key): (int(start), int(end))
+            for key, start, end in zip(uniq, starts, ends)
+        }
+        return self
+
+    def add(self, lat, lon):
+        """Append a point and return its index"""
+        self._tail_lats.append(float(lat))
+        self._tail_lons.append(float(lon))
+        index = len(self) - 1
+        if len(self._tail_lats) >= self.rebuild_threshold:
+            self.build(
+                np.concatenate([self.lats, self._tail_lats]),
+                np.concatenate([self.lons, self._tail_lons]),
+            )
+        return index
+
+    def _spans(self, lat, lon, radius_m):
+        """Sorted-order slices for the cells overlapping the query box, or None
+        when the box covers more cells than exist (full scan is cheaper)"""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        row_lo = math.floor((lat - dlat) / self.cell_deg)
+        row_hi = math.floor((lat + dlat) / self.cell_deg)
+        col_lo = math.floor((lon - dlon) / self.cell_deg)
+        col_hi = math.floor((lon + dlon) / self.cell_deg)
+
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            return None
+
+        spans = []
+        for row in range(row_lo, row_hi + 1):
+            base = row * (1 << 32)
+            for col in range(col_lo, col_hi + 1):
+                span = self._cells.get(base + col)
+                if span is not None:
+                    spans.append(span)
+        return spans
+
+    def estimate(self, lat, lon, radius_m):
+        """Number of points a radius query would have to measure"""
+        spans = self._spans(lat, lon, radius_m)
+        sorted_points = (
+            len(self.lats) if spans is None else sum(end - start for start, end in spans)
+        )
+        return sorted_points + len(self._tail_lats)
+
+    def _candidates(self, lat, lon, radius_m):
+        spans = self._spans(lat, lon, radius_m)
+        if spans is None:
+            candidates = np.arange(len(self.lats))
+        elif spans:
+            candidates = np.concatenate([self._order[a:b] for a, b in spans])
+        else:
+            candidates = np.empty(0, dtype=np.int64)
+        if self._tail_lats:
+            tail = np.arange(len(self.lats), len(self))
+            candidates = np.concatenate([candidates, tail])
+        return candidates
+
+    def _coords(self, indices):
+        if not self._tail_lats:
+            return self.lats[indices], self.lons[indices]
+        base = len(self.lats)
+        in_base = indices < base
+        lats = np.empty(len(indices))
+        lons = np.empty(len(indices))
+        lats[in_base] = self.lats[indices[in_base]]
+        lons[in_base] = self.lons[indices[in_base]]
+        lats[~in_base] = np.asarray(self._tail_lats)[indices[~in_base] - base]
+        lons[~in_base] = np.asarray(self._tail_lons)[indices[~in_base] - base]
+        return lats, lons
+
+    def distances(self, lat, lon, indices):
+        """Distances in meters from (lat, lon) to the given point indices"""
+        indices = np.asarray(indices, dtype=np.int64)
+        lats, lons = self._coords(indices)
+        return haversine_m(lat, lon, lats, lons)
+
+    def within(self, lat, lon, radius_m):
+        """
+        All points within radius_m of (lat, lon)
+
+        Returns:
+            tuple: (indices, distances) as NumPy arrays, unordered
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = self._candidates(lat, lon, radius_m)
+        distances = self.distances(lat, lon, candidates)
+        mask = distances <= radius_m
+        return candidates[mask], distances[mask]
+
+    def nearest(self, lat, lon, radius_m, k=None):
+        """
+        Up to k points within radius_m of (lat, lon), nearest first
+
+        Returns:
+            tuple: (indices, distances) as NumPy arrays
+        """
+        indices, distances = self.within(lat, lon, radius_m)
+        return top_k(indices, distances, k)
@@ -0,0 +1,271 @@
+"""
+Image Hash Index
+Perceptual (dHash) near-duplicate lookup of uploaded images via a persisted BK-tree
+"""
+
+import os
+import logging
+import threading
+from src.image_source import read_image_bytes, open_image_stream
+from src.journal import JournalReader, append_record, journal_lock, write_records
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash of an encoded image (see dhash_image)
+
+    Args:
+        image: Path, bytes / memoryview or file-like object
+
+    Returns:
+        int: hash_size * hash_size bit hash
+    """
+    import PIL.Image
+    import PIL.ImageOps
+
+    img = PIL.Image.open(open_image_stream(read_image_bytes(image)))
+    # JPEGs decode straight to a small grayscale image (much faster than full size)
+    img.draft("L", (hash_size * 16, hash_size * 16))
+    return dhash_image(PIL.ImageOps.exif_transpose(img), hash_size)
+
+
+def dhash_image(img, hash_size=HASH_SIZE):
+    """
+    Difference hash: one bit per horizontally adjacent pixel pair of a tiny
+    grayscale thumbnail
+
+    Survives re-compression, resizing and small brightness changes, so
+    re-saved or re-sent copies of a flyer land within a few bits of each other.
+
+    Args:
+        img: Decoded, upright PIL image
+
+    Returns:
+        int: hash_size * hash_size bit hash
+    """
+    import PIL.Image
+
+    img = img.convert("L").resize((hash_size + 1, hash_size), PIL.Image.LANCZOS)
+    pixels = img.tobytes()
+    width = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+if hasattr(int, "bit_count"):  # Python 3.10+
+
+    def hamming(a, b):
+        """Number of differing bits between two hashes"""
+        return (a ^ b).bit_count()
+
+else:
+
+    def hamming(a, b):
+        """Number of differing bits between two hashes"""
+        return bin(a ^ b).count("1")
+
+
+def hash_hex(value):
+    """64-bit hash -> 16 hex chars (how hashes are stored in documents)"""
+    return f"{value:016x}"
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance
+
+    Nodes live in flat lists (hash, doc id, child edges).
+    """
+
+    def __init__(self):
+        self.hashes = []
+        self.doc_ids = []
+        self._children = []  # node -> {distance: child node}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, value, doc_id):
+        """Insert a hash; an identical hash already present is re-pointed to doc_id"""
+        if not self.hashes:
+            self._append(value, doc_id)
+            return
+        node = 0
+        while True:
+            distance = hamming(value, self.hashes[node])
+            if distance == 0:
+                self.doc_ids[node] = doc_id
+                return
+            child = self._children[node].get(distance)
+            if child is None:
+                self._children[node][distance] = len(self.hashes)
+                self._append(value, doc_id)
+                return
+            node = child
+
+    def _append(self, value, doc_id):
+        self.hashes.append(value)
+        self.doc_ids.append(doc_id)
+        self._children.append({})
+
+    def search(self, value, max_distance):
+        """
+        Returns:
+            list: (distance, doc_id) pairs within max_distance, closest first
+        """
+        if not self.hashes:
+            return []
+        matches = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, self.hashes[node])
+            if distance <= max_distance:
+                matches.append((distance, self.doc_ids[node]))
+            # Triangle inequality: only subtrees at |d - edge| <= max can match
+            for edge, child in self._children[node].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        matches.sort()
+        return matches
+
+
+class DuplicateIndex:
+    """
+    Thread-safe image-hash -> Firestore doc id index with optional persistence
+
+    Persistence is an append-only journal (one JSON line per hash), replayed on
+    load and compacted after a backfill, so an upload costs one short append.
+    Several worker processes can share one journal (see src.journal): appends
+    are single O_APPEND writes, lookups first pick up what other workers
+    appended, and compaction holds the journal lock while it rewrites.
+    """
+
+    def __init__(self, max_distance=6, path=None):
+        """
+        Args:
+            max_distance: Largest Hamming distance treated as the same image
+            path: Optional journal file loaded now and appended to on every add
+        """
+        self.max_distance = max_distance
+        self.path = path
+        self.tree = BKTree()
+        self._lock = threading.Lock()
+        self._journal = JournalReader(path) if path else None
+        if self._journal is not None:
+            self._sync()
+            if len(self.tree):
+                logger.info("Image hash index loaded: %d hashes from %s", len(self.tree), path)
+
+    def __len__(self):
+        return len(self.tree)
+
+    @classmethod
+    def from_env(cls):
+        """
+        IMAGE_DEDUP_ENABLED      : "0" disables near-duplicate detection (returns None)
+        IMAGE_DEDUP_MAX_DISTANCE : Hamming distance threshold out of 64 bits (default 6)
+        IMAGE_DEDUP_INDEX_PATH   : Journal file the index is persisted to (memory only if unset)
+        """
+        if os.getenv("IMAGE_DEDUP_ENABLED", "1") == "0":
+            return None
+        return cls(
+            max_distance=int(os.getenv("IMAGE_DEDUP_MAX_DISTANCE", 6)),
+            path=os.getenv("IMAGE_DEDUP_INDEX_PATH") or None,
+        )
+
+    def find(self, value):
+        """
+        Returns:
+            list: (distance, doc_id) candidates, closest first
+        """
+        if self._journal is not None:
+            self._sync()
+        with self._lock:
+            return self.tree.search(value, self.max_distance)
+
+    def add(self, value, doc_id, save=True):
+        with self._lock:
+            self.tree.add(value, doc_id)
+        if save and self.path:
+            self._append([hash_hex(value), doc_id])
+
+    def backfill(self, documents):
+        """
+        Rebuild entries from stored documents (metadata.image_hashes)
+
+        Returns:
+            int: Number of hashes added
+        """
+        added = 0
+        for doc in documents:
+            hashes = (doc.get("metadata") or {}).get("image_hashes") or []
+            for value in hashes:
+                try:
+                    self.add(int(value, 16), doc["id"], save=False)
+                    added += 1
+                except (TypeError, ValueError):
+                    continue
+        if added and self.path:
+            self._compact()
+        return added
+
+    def _append(self, record):
+        try:
+            append_record(self.path, record)
+        except OSError as e:
+            logger.warning("Could not persist image hash index: %s", e)
+
+    def _sync(self, missing_only=False):
+        """
+        Index journal entries appended since the last sync (by any process)
+
+        Args:
+            missing_only: Skip hashes already indexed, keeping this process's
+                          doc id for them
+        """
+        try:
+            records, _ = self._journal.read()
+        except OSError as e:
+            logger.warning("Could not load image hash index %s: %s", self.path, e)
+            return
+        entries = []
+        for record in records:
+            try:
+                value, doc_id = record
+                entries.append((int(value, 16), doc_id))
+            except (TypeError, ValueError):
+                continue
+        if not entries:
+            return
+        with self._lock:
+            for value, doc_id in entries:
+                if not (missing_only and self.tree.search(value, 0)):
+                    self.tree.add(value, doc_id)
+
+    def _compact(self):
+        """
+        Rewrite the journal with one line per indexed hash
+
+        Under the exclusive journal lock, entries other workers appended since
+        the last sync are folded in first, so the rewrite drops none of them.
+        """
+        try:
+            with journal_lock(self.path, exclusive=True):
+                self._sync(missing_only=True)
+                with self._lock:
+                    records = [
+                        [hash_hex(value), doc_id]
+                        for value, doc_id in zip(self.tree.hashes, self.tree.doc_ids)
+                    ]
+                write_records(self.path, records)
+        except OSError as e:
+            logger.warning("Could not persist image hash index: %s", e)
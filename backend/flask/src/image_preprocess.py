@@ -0,0 +1,223 @@
+"""
+Image Preprocessing
+Bounded resize, EXIF orientation fix and re-encode before Storage upload and Gemini parsing
+"""
+
+import io
+import os
+import math
+import PIL.Image
+import PIL.ImageOps
+from src.image_source import read_image_bytes, open_image_stream, guess_content_type
+from src.image_hash import dhash_image
+
+EXIF_ORIENTATION = 0x0112
+
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+
+
+class NormalizedImage:
+    """Result of preprocessing one upload"""
+
+    __slots__ = (
+        "data",
+        "filename",
+        "content_type",
+        "width",
+        "height",
+        "original_bytes",
+        "thumbnail",
+        "thumbnail_filename",
+        "dhash",
+    )
+
+    def __init__(
+        self,
+        data,
+        filename,
+        content_type,
+        width=None,
+        height=None,
+        original_bytes=None,
+        thumbnail=None,
+        thumbnail_filename=None,
+        dhash=None,
+    ):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type
+        self.width = width
+        self.height = height
+        self.original_bytes = (
+            original_bytes if original_bytes is not None else len(data)
+        )
+        self.thumbnail = thumbnail
+        self.thumbnail_filename = thumbnail_filename
+        # Perceptual hash taken from the decoded image (None: not computed)
+        self.dhash = dhash
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - len(self.data)
+
+    def report(self):
+        """Summary stored in document metadata"""
+        return {
+            "original_bytes": self.original_bytes,
+            "processed_bytes": len(self.data),
+            "bytes_saved": self.bytes_saved,
+            "width": self.width,
+            "height": self.height,
+            "content_type": self.content_type,
+        }
+
+
+class ImagePreprocessor:
+    """Downscale, orient and re-encode images once for every consumer"""
+
+    def __init__(
+        self, max_edge=2048, output_format="jpeg", quality=85, thumbnail_edge=None
+    ):
+        """
+        Args:
+            max_edge: Longest allowed image edge in pixels
+            output_format: "jpeg" or "webp"
+            quality: Encoder quality (1-100)
+            thumbnail_edge: Longest thumbnail edge in pixels (None disables thumbnails)
+        """
+        if output_format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.max_edge = max_edge
+        self.output_format = output_format
+        self.quality = quality
+        self.thumbnail_edge = thumbnail_edge
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a preprocessor from environment variables
+
+        IMAGE_PREPROCESS_ENABLED : "0" disables preprocessing (returns None)
+        IMAGE_MAX_EDGE           : Longest edge in pixels (default 2048)
+        IMAGE_FORMAT             : "jpeg" (default) or "webp"
+        IMAGE_QUALITY            : Encoder quality (default 85)
+        IMAGE_THUMBNAIL_EDGE     : Thumbnail longest edge, 0 disables (default 0)
+        """
+        if os.getenv("IMAGE_PREPROCESS_ENABLED", "1") == "0":
+            return None
+        return cls(
+            max_edge=int(os.getenv("IMAGE_MAX_EDGE", 2048)),
+            output_format=os.getenv("IMAGE_FORMAT", "jpeg").lower(),
+            quality=int(os.getenv("IMAGE_QUALITY", 85)),
+            thumbnail_edge=int(os.getenv("IMAGE_THUMBNAIL_EDGE", 0)) or None,
+        )
+
+    def process(self, image, filename):
+        """
+        Normalize one image
+
+        Args:
+            image: Image bytes / memoryview / path / file-like object
+            filename: Original filename (used to name the outputs)
+
+        Returns:
+            NormalizedImage
+        """
+        pil_format, content_type, extension = FORMATS[self.output_format]
+        stem = os.path.splitext(filename)[0]
+
+        if is_spooled(image):
+            # Spooled upload: PIL pulls the file in blocks, so the original is
+            # never held in memory unless it is kept unchanged below
+            original = None
+            image.seek(0, os.SEEK_END)
+            original_size = image.tell()
+            image.seek(0)
+            source = image
+        else:
+            original = read_image_bytes(image)
+            original_size = memoryview(original).nbytes
+            source = open_image_stream(original)
+
+        img = PIL.Image.open(source)
+        source_format = img.format
+        if source_format == "JPEG" and max(img.size) > self.max_edge:
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the image is huge;
+            # draft() never goes below the requested size
+            scale = self.max_edge / max(img.size)
+            img.draft(
+                "RGB",
+                (math.ceil(img.width * scale), math.ceil(img.height * scale)),
+            )
+
+        # exif_transpose returns a copy even for upright images, so only the
+        # Orientation tag tells whether the pixels actually turn
+        rotated = img.getexif().get(EXIF_ORIENTATION, 1) in range(2, 9)
+        if rotated:
+            img = PIL.ImageOps.exif_transpose(img)
+
+        resized = max(img.size) > self.max_edge
+        if resized:
+            img.thumbnail((self.max_edge, self.max_edge), PIL.Image.LANCZOS)
+
+        encoded = self._encode(img, pil_format)
+
+        # Already small, upright and compact: keep the original bytes untouched
+        if not resized and not rotated and len(encoded) >= original_size:
+            if original is None:
+                original = read_image_bytes(image)
+            data = original if isinstance(original, bytes) else bytes(original)
+            out_filename = filename
+            content_type = guess_content_type(filename)
+        else:
+            data = encoded
+            out_filename = stem + extension
+
+        thumbnail = thumbnail_filename = None
+        if self.thumbnail_edge:
+            thumb = img.copy()
+            thumb.thumbnail((self.thumbnail_edge, self.thumbnail_edge), PIL.Image.LANCZOS)
+            thumbnail = self._encode(thumb, pil_format)
+            thumbnail_filename = f"{stem}_thumb{extension}"
+
+        return NormalizedImage(
+            data,
+            out_filename,
+            content_type,
+            width=img.width,
+            height=img.height,
+            original_bytes=original_size,
+            thumbnail=thumbnail,
+            thumbnail_filename=thumbnail_filename,
+            # The image is already decoded and small here; hashing costs well under 1ms
+            dhash=dhash_image(img),
+        )
+
+    def _encode(self, img, pil_format):
+        if pil_format == "JPEG" and img.mode != "RGB":
+            if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+                background = PIL.Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img.convert("RGBA"), mask=img.convert("RGBA").split()[-1])
+                img = background
+            else:
+                img = img.convert("RGB")
+        elif pil_format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+        out = io.BytesIO()
+        img.save(out, pil_format, quality=self.quality, optimize=pil_format == "JPEG")
+        return out.getvalue()
+
+
+def is_spooled(image):
+    """True for seekable upload streams (not in-memory buffers) that can be decoded in place"""
+    return hasattr(image, "read") and hasattr(image, "seek") and not hasattr(image, "getbuffer")
+
+
+def passthrough(image, filename):
+    """NormalizedImage wrapping the original bytes (preprocessing disabled)"""
+    data = read_image_bytes(image)
+    return NormalizedImage(data, filename, guess_content_type(filename))
@@ -0,0 +1,62 @@
+"""
+Image Source Helpers
+Normalize paths, bytes, memoryviews and file-like objects into one shared buffer
+"""
+
+import io
+import os
+import mimetypes
+
+
+def read_image_bytes(source):
+    """
+    Return the image contents as a bytes-like buffer
+
+    bytes are returned as-is so every pipeline stage shares the same object.
+    bytearray/memoryview are wrapped (not copied) in a memoryview.
+
+    Args:
+        source: File path, bytes, bytearray, memoryview or binary file-like object
+
+    Returns:
+        bytes or memoryview
+    """
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return memoryview(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getbuffer"):
+        # io.BytesIO: expose its internal buffer without copying
+        return source.getbuffer()
+    if hasattr(source, "read"):
+        # Whole contents, even if an earlier reader left the position elsewhere
+        if getattr(source, "seekable", lambda: False)():
+            source.seek(0)
+        return source.read()
+    raise TypeError(f"Unsupported image source: {type(source).__name__}")
+
+
+def open_image_stream(buffer):
+    """Wrap a buffer in a binary stream (no copy for bytes)"""
+    if isinstance(buffer, bytes):
+        return io.BytesIO(buffer)
+    return io.BytesIO(memoryview(buffer))
+
+
+def source_filename(source, default="upload.jpg"):
+    """Best-effort filename for a source, used for Storage blob names"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    name = getattr(source, "filename", None) or getattr(source, "name", None)
+    if isinstance(name, str) and name:
+        return os.path.basename(name)
+    return default
+
+
+def guess_content_type(filename, default="application/octet-stream"):
+    """Guess a MIME type from a filename"""
+    content_type, _ = mimetypes.guess_type(filename)
+    return content_type or default
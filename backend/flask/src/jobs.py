@@ -0,0 +1,188 @@
+"""
+Background Jobs
+Bounded in-process worker pool for long-running uploads, with pluggable job status storage
+"""
+
+import os
+import json
+import time
+import logging
+import uuid
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class InMemoryJobStore:
+    """Job records kept in a dict; finished jobs expire after ttl seconds"""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            self._expire()
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.get("finished_at") and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class RedisJobStore:
+    """Job records kept in Redis so any API process can answer GET /jobs/<id>"""
+
+    def __init__(self, url, ttl=3600, prefix="job:"):
+        import redis  # optional dependency, only needed for JOB_BACKEND=redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def put(self, job):
+        self._redis.set(self.prefix + job["id"], json.dumps(job), ex=self.ttl)
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is not None:
+            job.update(fields)
+            self.put(job)
+
+    def get(self, job_id):
+        raw = self._redis.get(self.prefix + job_id)
+        return json.loads(raw) if raw else None
+
+
+class JobQueue:
+    """Runs submitted callables on a fixed pool of daemon threads"""
+
+    def __init__(self, store=None, workers=4, max_queued=64):
+        """
+        Args:
+            store: Job status store (InMemoryJobStore by default)
+            workers: Number of worker threads
+            max_queued: Jobs allowed to wait before submit() raises JobQueueFull
+        """
+        self.store = store if store is not None else InMemoryJobStore()
+        self.workers = max(1, workers)
+        self._queue = queue.Queue(maxsize=max(1, max_queued))
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a job queue from environment variables
+
+        JOB_BACKEND    : "local" (default) or "redis"
+        REDIS_URL      : Redis URL for the redis backend (default redis://localhost:6379/0)
+        JOB_WORKERS    : Worker threads (default 4)
+        JOB_QUEUE_SIZE : Max queued jobs (default 64)
+        JOB_TTL        : Seconds to keep finished job records (default 3600)
+        """
+        ttl = int(os.getenv("JOB_TTL", 3600))
+        if os.getenv("JOB_BACKEND", "local") == "redis":
+            store = RedisJobStore(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl
+            )
+        else:
+            store = InMemoryJobStore(ttl=ttl)
+        return cls(
+            store=store,
+            workers=int(os.getenv("JOB_WORKERS", 4)),
+            max_queued=int(os.getenv("JOB_QUEUE_SIZE", 64)),
+        )
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f"job-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and return its job ID
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting
+        """
+        self._ensure_started()
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self.store.put(job)
+        try:
+            self._queue.put_nowait((job_id, fn, args, kwargs))
+        except queue.Full:
+            self.store.update(
+                job_id, status=FAILED, error="queue full", finished_at=time.time()
+            )
+            raise JobQueueFull("Job queue is full")
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            job_id, fn, args, kwargs = self._queue.get()
+            self.store.update(job_id, status=RUNNING, started_at=time.time())
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                logger.error("Job %s failed: %s", job_id, e)
+                self.store.update(
+                    job_id, status=FAILED, error=str(e), finished_at=time.time()
+                )
+            else:
+                self.store.update(
+                    job_id, status=SUCCEEDED, result=result, finished_at=time.time()
+                )
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,117 @@
+"""
+Shared Journals
+Append-only JSON-lines files shared by worker processes (image hash and venue indexes)
+"""
+
+import os
+import json
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, journals are per-process there
+    fcntl = None
+
+
+@contextlib.contextmanager
+def journal_lock(path, exclusive=False):
+    """
+    Advisory lock on a journal, held through a <path>.lock side file
+
+    Appends take it shared and compaction exclusively, so a compaction never
+    replaces the journal while another process is appending to it. The side
+    file keeps the lock valid across the rename that compaction does.
+
+    Raises:
+        OSError: The lock file cannot be opened
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def append_record(path, record):
+    """
+    Append one JSON line as a single O_APPEND write
+
+    Raises:
+        OSError
+    """
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+    with journal_lock(path):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def write_records(path, records):
+    """
+    Replace a journal with records (callers hold journal_lock exclusively)
+
+    Raises:
+        OSError
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+
+
+class JournalReader:
+    """
+    Incremental reader of a journal other processes append to
+
+    Remembers the file and offset it has read up to, so read() only parses
+    what was appended since; a replaced (compacted) or truncated journal is
+    read again from the start. A stat is all read() costs while nothing changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file_id = None  # (device, inode) of the file read so far
+        self._offset = 0
+        self._mtime = None
+
+    def read(self):
+        """
+        Returns:
+            tuple: (records, reset) - records added since the last read, and
+                   whether the file was replaced so all of it was read again
+
+        Raises:
+            OSError: The journal exists but cannot be read
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return [], False
+        file_id = (st.st_dev, st.st_ino)
+        reset = file_id != self._file_id or st.st_size < self._offset
+        if not reset and st.st_size == self._offset and st.st_mtime_ns == self._mtime:
+            return [], False
+
+        start = 0 if reset else self._offset
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(max(0, st.st_size - start))
+        # A line still being written is left for the next read
+        end = data.rfind(b"\n") + 1
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # torn line after a crash
+        self._file_id = file_id
+        self._offset = start + end
+        self._mtime = st.st_mtime_ns
+        return records, reset
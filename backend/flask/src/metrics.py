@@ -0,0 +1,196 @@
+"""
+Metrics
+In-process counters, histograms and timing spans rendered in Prometheus text format
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+PREFIX = "happymapper_"
+
+# Seconds; covers fast cache hits through slow Gemini calls
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        register(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        register(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[-1] if series else 0
+
+    def sum(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[-2] if series else 0.0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                le = f'le="{_format_value(float(bound))}"'
+                yield self.name + "_bucket", _format_labels(self.labelnames, key, le), cumulative
+            le = 'le="+Inf"'
+            yield self.name + "_bucket", _format_labels(self.labelnames, key, le), series[-1]
+            yield self.name + "_sum", _format_labels(self.labelnames, key), series[-2]
+            yield self.name + "_count", _format_labels(self.labelnames, key), series[-1]
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+
+
+def render():
+    """All registered metrics in Prometheus text exposition format (0.0.4)"""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Time spent per processing stage", ["stage"]
+)
+STAGE_ERRORS = Counter("stage_errors_total", "Stage failures", ["stage"])
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["endpoint", "method", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["endpoint"]
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups", ["cache", "result"])
+BYTES_IN = Counter("bytes_received_total", "Bytes received", ["source"])
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Work refused by Gemini admission control", ["reason"]
+)
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total", "Gemini tokens reported by usage_metadata", ["kind"]
+)
+GEMINI_CALL_SECONDS = Histogram(
+    "gemini_call_duration_seconds", "Gemini generate_content latency (excluding queueing)"
+)
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as one stage
+
+    The duration lands in stage_duration_seconds{stage=...} whether or not
+    the block raises; exceptions also bump stage_errors_total.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def configure_logging(level=None):
+    """
+    Root logging setup shared by the app and the CLIs
+
+    LOG_LEVEL : DEBUG, INFO (default), WARNING or ERROR. Payload dumps (raw
+                Gemini responses) are only formatted at DEBUG.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(
+        level=getattr(logging, level, logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
@@ -0,0 +1,229 @@
+"""
+Name Index
+Trigram inverted index for fuzzy venue-name lookup (Jaccard similarity)
+"""
+
+import io
+import re
+import unicodedata
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Above this many candidates score() switches from per-name set math to postings
+DIRECT_SCORE_LIMIT = 2048
+
+
+def normalize_name(name):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = text.encode("ascii", "ignore").decode("ascii").lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(name):
+    """
+    Set of character trigrams of a normalized name
+
+    Each word is padded ("  star ") so short words and word starts still
+    produce distinctive grams.
+    """
+    grams = set()
+    for word in normalize_name(name).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i : i + 3])
+    return grams
+
+
+def jaccard(query, grams):
+    """Jaccard similarity of two trigram sets (0 when either is empty)"""
+    if not query or not grams:
+        return 0.0
+    common = len(query & grams)
+    return common / (len(query) + len(grams) - common)
+
+
+class TrigramIndex:
+    """
+    Maps non-negative integer keys to names; finds keys whose names resemble a query
+
+    Each trigram's posting list is a NumPy array of keys, so lookups count
+    shared trigrams vectorized. Single add/remove calls patch the few posting
+    arrays involved, which is cheap for the one-document-at-a-time writes
+    coming from uploads.
+    """
+
+    def __init__(self):
+        self._names = {}  # key -> normalized name
+        self._postings = {}  # trigram -> np.ndarray of keys
+        self._sizes = np.zeros(0, dtype=np.int32)  # key -> number of trigrams
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, key):
+        return key in self._names
+
+    @classmethod
+    def from_names(cls, items):
+        """
+        Bulk-build from (key, name) pairs
+
+        Much faster than repeated add() because every posting array is
+        materialized once.
+        """
+        index = cls()
+        lists = {}
+        sizes = {}
+        for key, name in items:
+            normalized = normalize_name(name)
+            grams = trigrams(normalized)
+            index._names[key] = normalized
+            sizes[key] = len(grams)
+            for gram in grams:
+                lists.setdefault(gram, []).append(key)
+        index._postings = {g: np.array(keys, dtype=np.int64) for g, keys in lists.items()}
+        index._sizes = np.zeros(max(sizes, default=-1) + 1, dtype=np.int32)
+        for key, size in sizes.items():
+            index._sizes[key] = size
+        return index
+
+    def add(self, key, name):
+        """Insert or replace the name stored under key"""
+        if key in self._names:
+            self.remove(key)
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        self._names[key] = normalized
+        if key >= len(self._sizes):
+            grown = np.zeros(max(key + 1, 2 * len(self._sizes), 64), dtype=np.int32)
+            grown[: len(self._sizes)] = self._sizes
+            self._sizes = grown
+        self._sizes[key] = len(grams)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                self._postings[gram] = np.array([key], dtype=np.int64)
+            else:
+                self._postings[gram] = np.append(posting, key)
+
+    def remove(self, key):
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        self._sizes[key] = 0
+        for gram in trigrams(name):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            posting = posting[posting != key]
+            if len(posting):
+                self._postings[gram] = posting
+            else:
+                del self._postings[gram]
+
+    def cost(self, name):
+        """Number of posting entries a lookup of name would touch"""
+        return sum(len(self._postings.get(g, ())) for g in trigrams(name))
+
+    def match(self, name, threshold=0.3):
+        """
+        Lookup through the postings
+
+        Returns:
+            tuple: (keys, scores) NumPy arrays of keys with Jaccard >= threshold
+        """
+        query = trigrams(name)
+        arrays = [self._postings[g] for g in query if g in self._postings]
+        if not arrays:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        keys, common = np.unique(np.concatenate(arrays), return_counts=True)
+        scores = common / (len(query) + self._sizes[keys] - common)
+        keep = scores >= threshold
+        return keys[keep], scores[keep]
+
+    def search(self, name, threshold=0.3, limit=None):
+        """
+        Keys whose names have Jaccard similarity >= threshold with name
+
+        Returns:
+            list: (key, score) tuples, best match first
+        """
+        keys, scores = self.match(name, threshold)
+        order = np.argsort(-scores, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return list(zip(keys[order].tolist(), scores[order].tolist()))
+
+    def score(self, name, keys):
+        """
+        Jaccard similarity of name against each of keys
+
+        Used when another filter has already narrowed the candidates: cost
+        grows with the candidate count rather than with the posting lists.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        query = trigrams(name)
+        if not query or not len(keys):
+            return np.zeros(len(keys))
+
+        if len(keys) <= DIRECT_SCORE_LIMIT:
+            # Few candidates: comparing trigram sets beats scanning postings
+            return np.array(
+                [jaccard(query, trigrams(self._names.get(key, ""))) for key in keys.tolist()]
+            )
+
+        common = np.zeros(len(keys))
+        for gram in query:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                common += np.isin(keys, posting)
+        sizes = self._sizes[keys] if len(self._sizes) else np.zeros(len(keys))
+        return common / (len(query) + sizes - common)
+
+    def to_bytes(self):
+        """
+        Compact serialized form: a compressed .npz holding the trigram
+        vocabulary, the posting lists as one flat array plus offsets, and
+        the normalized names
+        """
+        vocab = sorted(self._postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, gram in enumerate(vocab):
+            offsets[i + 1] = offsets[i] + len(self._postings[gram])
+        flat = (
+            np.concatenate([self._postings[g] for g in vocab])
+            if vocab
+            else np.empty(0, dtype=np.int64)
+        )
+        keys = sorted(self._names)
+
+        out = io.BytesIO()
+        np.savez_compressed(
+            out,
+            vocab=np.array(vocab, dtype="U3"),
+            offsets=offsets,
+            postings=flat,
+            keys=np.array(keys, dtype=np.int64),
+            names=np.array([self._names[k] for k in keys], dtype=str),
+        )
+        return out.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of to_bytes; no trigram is recomputed"""
+        arrays = np.load(io.BytesIO(data))
+        vocab = arrays["vocab"].tolist()
+        flat = arrays["postings"]
+        keys = arrays["keys"]
+
+        index = cls()
+        index._postings = dict(zip(vocab, np.split(flat, arrays["offsets"][1:-1])))
+        index._names = dict(zip(keys.tolist(), arrays["names"].tolist()))
+        index._sizes = np.bincount(
+            flat, minlength=int(keys.max()) + 1 if len(keys) else 0
+        ).astype(np.int32)
+        return index
@@ -0,0 +1,55 @@
+"""
+NDJSON Export
+Newline-delimited JSON encoding and on-the-fly gzip for streamed venue exports
+"""
+
+import json
+import zlib
+
+# Records encoded before a chunk is handed to the WSGI server
+CHUNK_RECORDS = 200
+
+
+def ndjson_chunks(records, chunk_records=CHUNK_RECORDS):
+    """
+    Encode records as NDJSON, grouped into byte chunks
+
+    Args:
+        records: Iterable of JSON-serializable dicts (consumed lazily)
+        chunk_records: Records per yielded chunk
+
+    Yields:
+        bytes: One or more complete lines
+    """
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, default=str, separators=(",", ":")))
+        if len(lines) >= chunk_records:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Gzip a stream of byte chunks without buffering the whole body
+
+    Each input chunk is sync-flushed so clients can decode lines as they
+    arrive; memory use is bounded by the compressor window.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip header
+    for chunk in chunks:
+        out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """True when an Accept-Encoding header allows gzip"""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
@@ -0,0 +1,129 @@
+"""
+Field Projection
+fields= parsing, select()-style projection and ETags for read responses
+"""
+
+import json
+import hashlib
+
+# Bumped on every document write; projected reads also select it for the ETag
+UPDATED_AT = "metadata.updated_at"
+
+# Longest fields= list accepted (Firestore select() allows far more; this
+# only bounds the work per request)
+MAX_FIELDS = 32
+
+
+def parse_fields(value):
+    """
+    Field paths from a fields= query parameter ("venue_name,deals,address.city")
+
+    Returns:
+        list or None: Deduplicated paths in request order; None when absent or empty
+
+    Raises:
+        ValueError: Too many fields or a malformed path
+    """
+    if not value:
+        return None
+    fields = []
+    for path in value.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        if any(not part for part in path.split(".")) or path.startswith("__"):
+            raise ValueError(f"Invalid field path: {path!r}")
+        if path not in fields:
+            fields.append(path)
+    if len(fields) > MAX_FIELDS:
+        raise ValueError(f"At most {MAX_FIELDS} fields may be requested")
+    return fields or None
+
+
+def select_paths(fields):
+    """Paths to read from the store for a projection: fields plus the ETag source"""
+    if not fields:
+        return None
+    fields = [path for path in fields if path != "id"]
+    return fields if UPDATED_AT in fields else fields + [UPDATED_AT]
+
+
+def project(doc, fields):
+    """
+    Keep only the given (dotted) field paths, like Firestore select()
+
+    "id" is always kept; missing paths are left out.
+    """
+    if not fields:
+        return doc
+    projected = {"id": doc["id"]} if "id" in doc else {}
+    for path in fields:
+        value = doc
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is None:
+            continue
+        target = projected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+def apply_updates(doc, updates):
+    """
+    A copy of doc with an update() payload applied
+
+    Top-level keys replace the stored value; dotted paths ("metadata.updated_at")
+    set one nested field and keep its siblings, as Firestore does.
+    """
+    merged = dict(doc)
+    for path, value in updates.items():
+        parts = path.split(".")
+        target = merged
+        for part in parts[:-1]:
+            child = target.get(part)
+            target[part] = dict(child) if isinstance(child, dict) else {}
+            target = target[part]
+        target[parts[-1]] = value
+    return merged
+
+
+def _updated_at(doc):
+    metadata = doc.get("metadata")
+    return metadata.get("updated_at") if isinstance(metadata, dict) else None
+
+
+def document_etag(doc, fields=None):
+    """
+    Strong ETag for one document as served with a given projection
+
+    Derived from metadata.updated_at (bumped on every write); documents
+    without it fall back to a hash of their content.
+    """
+    digest = hashlib.sha1(str(doc.get("id")).encode("utf-8"))
+    version = _updated_at(doc)
+    if version is None:
+        version = json.dumps(doc, sort_keys=True, default=str)
+    digest.update(b"\0" + str(version).encode("utf-8"))
+    digest.update(b"\0" + ",".join(fields or ()).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def list_etag(docs, fields=None, key="id", extra=""):
+    """
+    Strong ETag for a list response: ids and versions of every item, in order
+
+    Args:
+        docs: The items served (before projection)
+        fields: The projection applied to them
+        key: Item id field ("id" for documents, "venue_id" for venues)
+        extra: Anything else the body depends on (e.g. the query string)
+    """
+    digest = hashlib.sha1(str(extra).encode("utf-8"))
+    digest.update(b"\0" + ",".join(fields or ()).encode("utf-8"))
+    for doc in docs:
+        version = _updated_at(doc)
+        digest.update(f"\0{doc.get(key)}\0{version}".encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,464 @@
+"""
+Venue Replica
+Local SQLite mirror of a Firestore collection, kept current from the metadata.updated_at watermark
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from src.geo_index import haversine_m, METERS_PER_DEG_LAT
+from src.name_index import normalize_name, trigrams, jaccard
+from src.active_deals import venue_deal_windows, minute_of_week
+from src.projection import project, apply_updates
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_PRECISION = 9  # ~5m cells; prefixes give every coarser level
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits *= 2
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cell_deg(precision):
+    """(lat degrees, lon degrees) covered by one cell at a precision"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def covering_prefixes(lat, lon, radius_m):
+    """
+    Geohash prefixes whose cells together cover a circle
+
+    Picks the finest precision whose cells are at least radius_m on each
+    side, then returns the cell holding the point and its 8 neighbours.
+    """
+    meters_per_deg_lon = METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6)
+    precision = 0
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = geohash_cell_deg(p)
+        if dlat * METERS_PER_DEG_LAT >= radius_m and dlon * meters_per_deg_lon >= radius_m:
+            precision = p
+            break
+    if precision == 0:
+        return [""]
+    return neighbour_cells(lat, lon, precision)
+
+
+def neighbour_cells(lat, lon, precision):
+    """Geohashes of the cell holding a point and its 8 neighbours (sorted, deduplicated)"""
+    dlat, dlon = geohash_cell_deg(precision)
+    prefixes = set()
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            cell_lat = min(max(lat + i * dlat, -90.0), 90.0)
+            cell_lon = (lon + j * dlon + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash(cell_lat, cell_lon, precision))
+    return sorted(prefixes)
+
+
+def _coordinates(doc):
+    try:
+        lat = float(doc.get("latitude"))
+        lon = float(doc.get("longitude"))
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+
+class VenueReplica:
+    """
+    SQLite copy of one collection with geohash and time-window indexes
+
+    sync() pulls documents changed since the stored watermark; reads are
+    local and only as stale as the last successful sync (see is_fresh).
+    """
+
+    def __init__(
+        self,
+        path,
+        collection="final_schema",
+        max_staleness=60.0,
+        overlap=5.0,
+        page_size=500,
+    ):
+        """
+        Args:
+            path: SQLite file (":memory:" for tests)
+            collection: Firestore collection mirrored
+            max_staleness: Seconds since the last sync after which reads
+                           should go back to Firestore
+            overlap: Seconds re-read before the watermark on every sync, so
+                     writes stamped by a slightly slow clock are not missed
+            page_size: Documents per Firestore query and per SQLite transaction
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.collection = collection
+        self.max_staleness = max_staleness
+        self.overlap = overlap
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS venues (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                lat REAL,
+                lon REAL,
+                geohash TEXT,
+                updated_at TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS venues_geohash ON venues (geohash, lat, lon);
+            CREATE TABLE IF NOT EXISTS windows (
+                venue_id TEXT NOT NULL,
+                deal_index INTEGER NOT NULL,
+                start INTEGER NOT NULL,
+                "end" INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS windows_time ON windows (start, "end");
+            CREATE INDEX IF NOT EXISTS windows_venue ON windows (venue_id);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                collection TEXT PRIMARY KEY,
+                watermark TEXT NOT NULL,
+                synced_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        self._thread = None
+        self._stop = threading.Event()
+        state = self.state()
+        self.synced_at = state[1] if state else 0.0
+
+    @classmethod
+    def from_env(cls, collection="final_schema"):
+        """
+        READ_MODE              : "replica" serves reads from the local copy;
+                                 anything else (default "firestore") returns None
+        REPLICA_PATH           : SQLite file (default /tmp/venue_replica.db)
+        REPLICA_MAX_STALENESS  : Seconds of sync lag tolerated before reads fall
+                                 back to Firestore (default 60)
+        """
+        if os.getenv("READ_MODE", "firestore") != "replica":
+            return None
+        return cls(
+            os.getenv("REPLICA_PATH", "/tmp/venue_replica.db"),
+            collection=collection,
+            max_staleness=float(os.getenv("REPLICA_MAX_STALENESS", 60)),
+        )
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def state(self):
+        """(watermark, synced_at) of the last successful sync, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT watermark, synced_at FROM sync_state WHERE collection = ?",
+                (self.collection,),
+            ).fetchone()
+
+    def age(self):
+        """Seconds since the last successful sync (inf before the first one)"""
+        return time.time() - self.synced_at if self.synced_at else float("inf")
+
+    def is_fresh(self):
+        return self.age() <= self.max_staleness
+
+    def sync(self, uploader, full=False):
+        """
+        Bring the replica up to date
+
+        The first sync (or full=True) copies the whole collection and drops
+        rows whose documents are gone; later ones only read documents whose
+        metadata.updated_at is past the watermark (minus overlap).
+
+        Returns:
+            int: Documents written
+        """
+        state = self.state()
+        full = full or state is None
+        started = datetime.utcnow()
+
+        since = None
+        if not full:
+            since = (
+                datetime.fromisoformat(state[0]) - timedelta(seconds=self.overlap)
+            ).isoformat()
+
+        written = 0
+        seen = set()
+        page = []
+        for doc in uploader.iter_restaurants(
+            self.collection, page_size=self.page_size, since=since, use_replica=False
+        ):
+            page.append(doc)
+            if full:
+                seen.add(doc["id"])
+            if len(page) >= self.page_size:
+                written += self.upsert_many(page)
+                page = []
+        if page:
+            written += self.upsert_many(page)
+
+        synced_at = time.time()
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM seen")
+                self._conn.executemany("INSERT INTO seen (id) VALUES (?)", ((i,) for i in seen))
+                self._conn.execute(
+                    "DELETE FROM windows WHERE venue_id NOT IN (SELECT id FROM seen)"
+                )
+                self._conn.execute("DELETE FROM venues WHERE id NOT IN (SELECT id FROM seen)")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (collection, watermark, synced_at)"
+                " VALUES (?, ?, ?)",
+                (self.collection, started.isoformat(), synced_at),
+            )
+        self.synced_at = synced_at
+
+        logger.info(
+            "Replica %s synced: %d documents (%s)",
+            self.collection,
+            written,
+            "full" if full else f"since {since}",
+        )
+        return written
+
+    def start(self, uploader, interval=5.0):
+        """Run sync() every interval seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.sync(uploader)
+                except Exception as e:
+                    logger.warning("Replica sync failed: %s", e)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="replica-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert_many(self, docs):
+        """Replace rows (and time windows) for full documents with an "id" key"""
+        venue_rows = []
+        window_rows = []
+        for doc in docs:
+            doc_id = str(doc["id"])
+            lat, lon = _coordinates(doc)
+            venue_rows.append(
+                (
+                    doc_id,
+                    normalize_name(doc.get("venue_name") or doc.get("restaurant_name")),
+                    lat,
+                    lon,
+                    geohash(lat, lon) if lat is not None else None,
+                    (doc.get("metadata") or {}).get("updated_at"),
+                    json.dumps(doc, default=str),
+                )
+            )
+            for deal_index, _, intervals in venue_deal_windows(doc):
+                for start, end in intervals:
+                    window_rows.append((doc_id, deal_index, start, end))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM windows WHERE venue_id = ?", ((row[0],) for row in venue_rows)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO venues (id, name, lat, lon, geohash, updated_at, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                venue_rows,
+            )
+            self._conn.executemany(
+                'INSERT INTO windows (venue_id, deal_index, start, "end") VALUES (?, ?, ?, ?)',
+                window_rows,
+            )
+        return len(venue_rows)
+
+    def apply_write(self, collection, doc_id, fields):
+        """
+        FirebaseUploader write listener: fold local writes in right away so
+        this process reads its own writes before the next sync
+        """
+        if collection != self.collection:
+            return
+        existing = self.get(doc_id) or {}
+        self.upsert_many([{**apply_updates(existing, fields), "id": doc_id}])
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM venues").fetchone()
+        return count
+
+    def get(self, doc_id):
+        """Stored document (with "id") or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM venues WHERE id = ?", (str(doc_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_documents(self, fields=None, limit=None):
+        """Documents in ID order (same order as Firestore's default)"""
+        sql = "SELECT data FROM venues ORDER BY id"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for (data,) in rows:
+            doc = json.loads(data)
+            yield project(doc, fields)
+
+    def within(self, lat, lon, radius_m, limit=20, name=None, threshold=0.3):
+        """
+        Documents within radius_m, nearest first, each with distance_meters
+
+        Candidates come from geohash prefix ranges, then are ranked by haversine.
+        With a name, candidates are also scored against the stored normalized
+        names (trigram Jaccard, as in TrigramIndex) and get a match_score.
+        """
+        clauses = []
+        params = []
+        for prefix in covering_prefixes(lat, lon, radius_m):
+            if prefix:
+                clauses.append("(geohash >= ? AND geohash < ?)")
+                params.extend((prefix, prefix + "{"))  # "{" sorts after every base32 char
+            else:
+                clauses.append("geohash IS NOT NULL")
+        with self._lock:
+            # Coordinates straight from the covering index; only the documents
+            # that make the cut are read and decoded
+            rows = self._conn.execute(
+                "SELECT rowid, lat, lon, name FROM venues WHERE " + " OR ".join(clauses), params
+            ).fetchall()
+            if not rows:
+                return []
+            distances = haversine_m(
+                lat, lon, np.array([r[1] for r in rows]), np.array([r[2] for r in rows])
+            )
+            keep = distances <= radius_m
+            scores = None
+            if name:
+                query = trigrams(name)
+                scores = np.array([jaccard(query, trigrams(r[3])) for r in rows])
+                keep &= scores >= threshold
+            candidates = np.flatnonzero(keep)
+            order = candidates[np.argsort(distances[candidates], kind="stable")][:limit].tolist()
+            data = dict(
+                self._conn.execute(
+                    f"SELECT rowid, data FROM venues WHERE rowid IN ({','.join('?' * len(order))})",
+                    [rows[i][0] for i in order],
+                ).fetchall()
+            ) if order else {}
+
+        results = []
+        for i in order:
+            doc = json.loads(data[rows[i][0]])
+            doc["distance_meters"] = round(float(distances[i]), 1)
+            if scores is not None:
+                doc["match_score"] = round(float(scores[i]), 3)
+            results.append(doc)
+        return results
+
+    def active_at(self, when=None):
+        """
+        Returns:
+            list: (doc_id, deal_index) pairs whose window covers the moment,
+                  in document and deal order
+        """
+        minute = minute_of_week(when)
+        with self._lock:
+            return self._conn.execute(
+                'SELECT DISTINCT venue_id, deal_index FROM windows WHERE start <= ? AND "end" > ?'
+                " ORDER BY venue_id, deal_index",
+                (minute, minute),
+            ).fetchall()
+
+
+def main():
+    """Sync the replica once (e.g. from cron) and print what changed"""
+    import argparse
+    from src.metrics import configure_logging
+    from src.firebase_uploader import FirebaseUploader
+
+    parser = argparse.ArgumentParser(description="Sync the local SQLite read replica")
+    parser.add_argument("--collection", default="final_schema", help="Collection to mirror")
+    parser.add_argument(
+        "--path",
+        default=os.getenv("REPLICA_PATH", "/tmp/venue_replica.db"),
+        help="SQLite file (default: REPLICA_PATH or /tmp/venue_replica.db)",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Re-copy everything and drop deleted documents"
+    )
+    args = parser.parse_args()
+    configure_logging()
+
+    replica = VenueReplica(args.path, collection=args.collection)
+    start = time.perf_counter()
+    written = replica.sync(FirebaseUploader(), full=args.full)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'=' * 70}")
+    print(f"Synced {written} documents in {elapsed:.2f}s; replica holds {len(replica)}")
+    print(f"{'=' * 70}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Parse Result Cache
+Content-addressed cache for Gemini extraction results (memory LRU + optional SQLite tier)
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(image_bytes, version=""):
+    """
+    Build a cache key from image bytes and a version tag
+
+    Args:
+        image_bytes: Raw image bytes (bytes, bytearray or memoryview)
+        version: Version string mixed into the key (e.g. prompt version)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(str(version).encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with TTL and size-based eviction"""
+
+    def __init__(self, max_entries=256, max_bytes=None, ttl=None):
+        """
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            max_bytes: Optional cap on the summed size of stored values
+            ttl: Optional time-to-live in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=1):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.time())
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """On-disk cache tier backed by a single SQLite file"""
+
+    def __init__(self, directory, max_entries=10000, ttl=None, filename="parse_cache.db"):
+        """
+        Args:
+            directory: Directory that holds the SQLite file (created if missing)
+            max_entries: Maximum number of rows kept on disk
+            ttl: Optional time-to-live in seconds
+            filename: SQLite file name inside the directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, filename)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            cur = self._conn.execute(
+                "DELETE FROM cache WHERE stored_at < ?", (now - self.ttl,)
+            )
+            self.evictions += max(cur.rowcount, 0)
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return count
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "path": self.path,
+        }
+
+
+class ParseResultCache:
+    """Two-tier cache for parsed menu data, keyed by image content + prompt version"""
+
+    def __init__(self, memory=None, disk=None):
+        """
+        Args:
+            memory: LRUCache instance (a default one is created if None)
+            disk: Optional SQLiteCache instance
+        """
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a cache from environment variables
+
+        PARSE_CACHE_ENABLED     : "0" disables caching entirely (returns None)
+        PARSE_CACHE_MAX_ENTRIES : In-memory entry limit (default 256)
+        PARSE_CACHE_MAX_BYTES   : In-memory size limit in bytes (default 32MB)
+        PARSE_CACHE_TTL         : TTL in seconds for both tiers (default 7 days)
+        PARSE_CACHE_DIR         : Directory for the SQLite tier (disabled if unset)
+        PARSE_CACHE_DISK_MAX_ENTRIES : On-disk row limit (default 10000)
+        """
+        if os.getenv("PARSE_CACHE_ENABLED", "1") == "0":
+            return None
+
+        ttl = float(os.getenv("PARSE_CACHE_TTL", 7 * 24 * 3600)) or None
+        memory = LRUCache(
+            max_entries=int(os.getenv("PARSE_CACHE_MAX_ENTRIES", 256)),
+            max_bytes=int(os.getenv("PARSE_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+            ttl=ttl,
+        )
+
+        disk = None
+        cache_dir = os.getenv("PARSE_CACHE_DIR")
+        if cache_dir:
+            try:
+                disk = SQLiteCache(
+                    cache_dir,
+                    max_entries=int(os.getenv("PARSE_CACHE_DISK_MAX_ENTRIES", 10000)),
+                    ttl=ttl,
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Disk parse cache disabled: %s", e)
+
+        return cls(memory=memory, disk=disk)
+
+    def get(self, key):
+        """Return a fresh copy of the cached result for key, or None"""
+        # The memory tier holds serialized JSON so callers can mutate what they get back
+        payload = self.memory.get(key)
+        if payload is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                # A locked or corrupt disk tier costs a Gemini call, not the upload
+                logger.warning("Failed to read disk parse cache: %s", e)
+                value = None
+            if value is not None:
+                payload = json.dumps(value)
+                self.memory.set(key, payload, size=len(payload))
+                self.hits += 1
+                return value
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        self.memory.set(key, payload, size=len(payload))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning("Failed to write disk parse cache: %s", e)
+
+    def stats(self):
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory": self.memory.stats(),
+        }
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
@@ -0,0 +1,173 @@
+"""
+Retry Helpers
+Jittered exponential backoff for transient Gemini / Firebase errors
+"""
+
+import re
+import time
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+try:
+    from google.api_core import exceptions as gexc
+
+    _TRANSIENT_GOOGLE_ERRORS = (
+        gexc.TooManyRequests,
+        gexc.ResourceExhausted,
+        gexc.ServiceUnavailable,
+        gexc.DeadlineExceeded,
+        gexc.InternalServerError,
+        gexc.GatewayTimeout,
+        gexc.Aborted,
+    )
+except ImportError:  # google-api-core ships with firebase-admin / google-generativeai
+    _TRANSIENT_GOOGLE_ERRORS = ()
+
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError) + _TRANSIENT_GOOGLE_ERRORS
+
+
+def is_transient(exc):
+    """Return True if exc looks like a retryable network / quota error"""
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+_RETRY_IN = re.compile(r"retry in ([0-9.]+)\s*(ms|s)\b", re.IGNORECASE)
+
+
+def retry_after_hint(exc):
+    """
+    Seconds the service asked us to wait before retrying, if it said
+
+    Looks at (in order) a retry_after attribute (src.admission.Overloaded),
+    an HTTP Retry-After header, a google.rpc.RetryInfo detail and a
+    "Please retry in 12.3s" message, as Gemini quota errors carry one of them.
+
+    Returns:
+        float or None
+    """
+    hint = getattr(exc, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass  # absent, or an HTTP date; fall through to the other hints
+
+    try:
+        details = getattr(exc, "details", None) or ()
+    except Exception:
+        details = ()
+    for detail in details if isinstance(details, (list, tuple)) else ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+
+    match = _RETRY_IN.search(str(exc))
+    if match:
+        value = float(match.group(1))
+        return value / 1000 if match.group(2).lower() == "ms" else value
+    return None
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    """
+    Full-jitter exponential backoff
+
+    Args:
+        attempt: Retry number starting at 1
+        base_delay: Delay scale in seconds
+        max_delay: Upper bound in seconds
+
+    Returns:
+        float: Seconds to sleep
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def retry_call(
+    fn,
+    *args,
+    attempts=4,
+    base_delay=0.5,
+    max_delay=30.0,
+    is_retryable=is_transient,
+    retry_after=retry_after_hint,
+    **kwargs,
+):
+    """
+    Call fn(*args, **kwargs), retrying transient failures with jittered backoff
+
+    Args:
+        fn: Callable to invoke
+        attempts: Total number of tries (including the first)
+        base_delay: Backoff scale in seconds
+        max_delay: Backoff cap in seconds
+        is_retryable: Predicate deciding whether an exception is retried
+        retry_after: Function returning the server's requested wait for an
+                     exception (or None); the sleep is never shorter, and a
+                     request to wait longer than max_delay ends the retries
+
+    Returns:
+        Whatever fn returns; the last exception is re-raised when tries run out
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            delay = _retry_delay(
+                fn, e, attempt, attempts, base_delay, max_delay, is_retryable, retry_after
+            )
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+
+async def retry_call_async(
+    fn,
+    *args,
+    attempts=4,
+    base_delay=0.5,
+    max_delay=30.0,
+    is_retryable=is_transient,
+    retry_after=retry_after_hint,
+    **kwargs,
+):
+    """retry_call for coroutine functions; backoff sleeps without blocking the loop"""
+    import asyncio
+
+    for attempt in range(1, attempts + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            delay = _retry_delay(
+                fn, e, attempt, attempts, base_delay, max_delay, is_retryable, retry_after
+            )
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+
+def _retry_delay(fn, exc, attempt, attempts, base_delay, max_delay, is_retryable, retry_after):
+    """Seconds to wait before the next try, or None when exc should be raised"""
+    if attempt >= attempts or not is_retryable(exc):
+        return None
+    delay = backoff_delay(attempt, base_delay, max_delay)
+    hint = retry_after(exc) if retry_after is not None else None
+    if hint is not None:
+        if hint > max_delay:
+            return None
+        delay = max(delay, hint)
+    logger.warning(
+        "%s failed (%s); retry %d/%d in %.2fs",
+        getattr(fn, "__name__", "call"),
+        exc,
+        attempt,
+        attempts - 1,
+        delay,
+    )
+    return delay
@@ -0,0 +1,143 @@
+"""
+Upload Streams
+Chunked, size-capped and content-sniffed ingestion of multipart image uploads
+"""
+
+import os
+import hashlib
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Leading bytes of every format ALLOWED_EXTENSIONS admits (WebP is checked separately)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(head):
+    """
+    MIME type from an image's first bytes, whatever its filename says
+
+    Returns:
+        str or None: None when the bytes are not a supported image format
+    """
+    head = bytes(head[:SNIFF_BYTES])
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class IngestStream:
+    """
+    Writable spool that one multipart file part is streamed into
+
+    Werkzeug hands over the part a chunk at a time. Each chunk is hashed,
+    counted against max_bytes and checked for an image signature as soon as
+    the first bytes arrive, so an oversized or non-image part is refused
+    without buffering the rest of the body. Data stays in memory up to
+    spool_bytes and spills to a temporary file beyond that.
+    """
+
+    def __init__(self, max_bytes, spool_bytes=512 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.content_type = None
+        self._sha256 = hashlib.sha256()
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+
+    @property
+    def sha256(self):
+        """Hex digest of everything written so far"""
+        return self._sha256.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self._file.close()
+            raise RequestEntityTooLarge(f"Images are limited to {self.max_bytes} bytes each")
+        if self.content_type is None and len(self.head) < SNIFF_BYTES:
+            self.head += bytes(data[: SNIFF_BYTES - len(self.head)])
+            if len(self.head) >= SNIFF_BYTES:
+                self.content_type = sniff_image_type(self.head)
+                if self.content_type is None:
+                    self._file.close()
+                    raise UnsupportedMediaType("Upload is not a PNG, JPEG, GIF or WebP image")
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def verify(self):
+        """
+        Final type check for parts shorter than the sniffing window
+
+        Returns:
+            str: The sniffed MIME type
+
+        Raises:
+            UnsupportedMediaType
+        """
+        if self.content_type is None:
+            self.content_type = sniff_image_type(self.head)
+            if self.content_type is None:
+                raise UnsupportedMediaType("Upload is not a PNG, JPEG, GIF or WebP image")
+        return self.content_type
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class StreamingUploadRequest(Request):
+    """
+    Flask request whose file parts are ingested through IngestStream
+
+    UPLOAD_MAX_IMAGE_BYTES : Largest single image in bytes (default 16 MB, the body limit)
+    UPLOAD_SPOOL_BYTES     : Bytes kept in memory per image before spilling to disk
+                             (default 512 KB)
+    """
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        return IngestStream(
+            max_bytes=int(os.getenv("UPLOAD_MAX_IMAGE_BYTES", 16 * 1024 * 1024)),
+            spool_bytes=int(os.getenv("UPLOAD_SPOOL_BYTES", 512 * 1024)),
+        )
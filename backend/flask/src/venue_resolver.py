@@ -0,0 +1,378 @@
+"""
+Venue Resolver
+Match an upload's venue (name, address, coordinates) to an existing venue document
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from src.name_index import normalize_name
+from src.geo_index import METERS_PER_DEG_LAT
+from src.replica import geohash, geohash_cell_deg, neighbour_cells
+from src.journal import JournalReader, append_record, journal_lock, write_records
+
+logger = logging.getLogger(__name__)
+
+# Street words written several ways by different uploaders
+STREET_ABBREVIATIONS = {
+    "street": "st",
+    "avenue": "ave",
+    "av": "ave",
+    "boulevard": "blvd",
+    "road": "rd",
+    "drive": "dr",
+    "lane": "ln",
+    "place": "pl",
+    "court": "ct",
+    "circle": "cir",
+    "highway": "hwy",
+    "parkway": "pkwy",
+    "terrace": "ter",
+    "square": "sq",
+    "north": "n",
+    "south": "s",
+    "east": "e",
+    "west": "w",
+    "northeast": "ne",
+    "northwest": "nw",
+    "southeast": "se",
+    "southwest": "sw",
+}
+# Everything from one of these on is a unit number, not part of the street
+UNIT_WORDS = {"suite", "ste", "unit", "apt", "apartment", "fl", "floor", "rm", "room"}
+
+US_STATES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar",
+    "california": "ca", "colorado": "co", "connecticut": "ct", "delaware": "de",
+    "district of columbia": "dc", "florida": "fl", "georgia": "ga", "hawaii": "hi",
+    "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia", "kansas": "ks",
+    "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms",
+    "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok",
+    "oregon": "or", "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc",
+    "south dakota": "sd", "tennessee": "tn", "texas": "tx", "utah": "ut",
+    "vermont": "vt", "virginia": "va", "washington": "wa", "west virginia": "wv",
+    "wisconsin": "wi", "wyoming": "wy",
+}
+
+_ZIP = re.compile(r"\d{5}")
+_NAME_STOPWORDS = {"the", "and"}
+# Document fields the index is built from
+VENUE_FIELDS = {"venue_name", "restaurant_name", "address", "latitude", "longitude"}
+
+
+def normalize_street(street):
+    """'4001 East Anaheim Street, Suite 5' -> '4001 e anaheim st'"""
+    words = []
+    for word in normalize_name(str(street).replace("#", " unit ")).split():
+        if word in UNIT_WORDS:
+            break
+        words.append(STREET_ABBREVIATIONS.get(word, word))
+    return " ".join(words)
+
+
+def address_key(address):
+    """
+    Comparable key of a venue_address ({street, city, state, zip})
+
+    The ZIP code stands in for city and state when present, so "LA" vs
+    "Los Angeles" spellings still match.
+
+    Returns:
+        str or None: None without a street, or without both a ZIP and a city
+    """
+    if isinstance(address, str):
+        address = {"street": address}
+    if not isinstance(address, dict):
+        return None
+    street = normalize_street(address.get("street") or "")
+    if not street:
+        return None
+    match = _ZIP.search(str(address.get("zip") or ""))
+    if match:
+        return f"{street}|{match.group()}"
+    city = normalize_name(address.get("city"))
+    if not city:
+        return None
+    state = normalize_name(address.get("state"))
+    return f"{street}|{city}|{US_STATES.get(state, state)}"
+
+
+def name_key(name):
+    """Venue name for matching: normalize_name without 'the' / 'and'"""
+    return " ".join(w for w in normalize_name(name).split() if w not in _NAME_STOPWORDS)
+
+
+def venue_coordinates(venue):
+    """(lat, lon) of a document or form fields, or None"""
+    try:
+        lat = float(venue.get("latitude"))
+        lon = float(venue.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    )
+    return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+
+class VenueResolver:
+    """
+    Thread-safe (address, name) and geohash-cell -> venue doc id index
+
+    Both lookups are hash-map probes: an address key is one probe, and a
+    coordinate checks the cell it falls in plus its 8 neighbours. Cells are
+    sized so any venue within match_radius_m is in one of those nine.
+
+    Persistence is an append-only journal (one JSON line per indexed venue),
+    replayed on load, so indexing an upload never rewrites the whole file.
+    Workers sharing the journal pick up each other's lines before every
+    resolve(), the same way DuplicateIndex does (see src.journal).
+    """
+
+    def __init__(self, match_radius_m=75.0, path=None):
+        """
+        Args:
+            match_radius_m: Same-named venues closer than this are the same venue
+            path: Optional journal file loaded now and appended to on every add
+        """
+        self.match_radius_m = match_radius_m
+        self.path = path
+        # Finest precision whose cells are at least match_radius_m across up to
+        # 60 degrees latitude (where a degree of longitude is half as long)
+        self.precision = 1
+        for p in range(9, 0, -1):
+            dlat, dlon = geohash_cell_deg(p)
+            if min(dlat, dlon * 0.5) * METERS_PER_DEG_LAT >= match_radius_m:
+                self.precision = p
+                break
+        self._by_address = {}  # (collection, address_key) -> {name_key: doc_id}
+        self._by_cell = {}  # (collection, cell) -> {doc_id: (lat, lon, name_key)}
+        self._entries = {}  # (collection, doc_id) -> (name_key, address_key, lat, lon)
+        self._lock = threading.Lock()
+        self._journal = JournalReader(path) if path else None
+        if self._journal is not None:
+            self._sync()
+            if self._entries:
+                logger.info("Venue index loaded: %d venues from %s", len(self._entries), path)
+
+    @classmethod
+    def from_env(cls):
+        """
+        VENUE_RESOLVE_ENABLED  : "0" always creates a new document per upload (returns None)
+        VENUE_MATCH_RADIUS_M   : Same-named venues this close (meters) are merged (default 75)
+        VENUE_RESOLVER_PATH    : Journal file the index is persisted to (memory only if unset)
+        """
+        if os.getenv("VENUE_RESOLVE_ENABLED", "1") == "0":
+            return None
+        return cls(
+            match_radius_m=float(os.getenv("VENUE_MATCH_RADIUS_M", 75)),
+            path=os.getenv("VENUE_RESOLVER_PATH") or None,
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, venue, collection="final_schema"):
+        """
+        Existing venue document an upload belongs to
+
+        Matches on the normalized address first; an address with one venue
+        also matches an upload without a name. Otherwise the nearest venue with
+        the same name within match_radius_m of the upload's coordinates wins.
+
+        Args:
+            venue: Dict with venue_name / restaurant_name, address, latitude, longitude
+
+        Returns:
+            str or None: Document ID, or None for a venue not seen before
+        """
+        name = name_key(venue.get("venue_name") or venue.get("restaurant_name"))
+        key = address_key(venue.get("address"))
+        point = venue_coordinates(venue)
+
+        if self._journal is not None:
+            self._sync()
+        with self._lock:
+            if key is not None:
+                names = self._by_address.get((collection, key))
+                if names:
+                    if name and name in names:
+                        return names[name]
+                    if not name and len(names) == 1:
+                        return next(iter(names.values()))
+
+            if point is None or not name:
+                return None
+            best = None
+            for cell in neighbour_cells(point[0], point[1], self.precision):
+                for doc_id, (lat, lon, other) in self._by_cell.get((collection, cell), {}).items():
+                    if other != name:
+                        continue
+                    distance = _distance_m(point[0], point[1], lat, lon)
+                    if distance <= self.match_radius_m and (best is None or distance < best[0]):
+                        best = (distance, doc_id)
+            return best[1] if best else None
+
+    def add(self, doc_id, venue, collection="final_schema", save=True):
+        """
+        Index (or re-index) a venue document
+
+        Returns:
+            bool: False when the document has neither an address key nor coordinates
+        """
+        return self._add(collection, doc_id, self._entry(venue), save)
+
+    def apply_write(self, collection, doc_id, fields):
+        """
+        FirebaseUploader write listener: index new documents and follow
+        renames / moves from updates
+        """
+        with self._lock:
+            previous = self._entries.get((collection, doc_id))
+        if previous is None:
+            if not fields.get("error"):
+                self._add(collection, doc_id, self._entry(fields), save=True)
+            return
+        if not VENUE_FIELDS & set(fields):
+            return
+        # Update payload: whatever it does not touch stays as indexed
+        name, key, lat, lon = previous
+        venue = {"venue_name": name, "latitude": lat, "longitude": lon, **fields}
+        entry = self._entry(venue, key if "address" not in fields else None)
+        self._add(collection, doc_id, entry, save=True)
+
+    def _entry(self, venue, key=None):
+        point = venue_coordinates(venue)
+        return (
+            name_key(venue.get("venue_name") or venue.get("restaurant_name")),
+            key if key is not None else address_key(venue.get("address")),
+            point[0] if point else None,
+            point[1] if point else None,
+        )
+
+    def _add(self, collection, doc_id, entry, save):
+        if entry[1] is None and entry[2] is None:
+            return False
+        with self._lock:
+            if self._entries.get((collection, doc_id)) == entry:
+                return True
+            self._index(collection, doc_id, entry)
+        if save and self.path:
+            self._append([collection, doc_id, *entry])
+        return True
+
+    def backfill(self, documents, collection="final_schema"):
+        """
+        Index stored documents (e.g. on startup without a journal)
+
+        Returns:
+            int: Number of documents indexed
+        """
+        added = 0
+        for doc in documents:
+            if doc.get("error"):
+                continue  # failed parses never absorb later uploads
+            if self.add(doc["id"], doc, collection, save=False):
+                added += 1
+        if self.path:
+            self._compact()
+        return added
+
+    # ------------------------------------------------------------------
+    # Index maintenance (callers hold self._lock)
+    # ------------------------------------------------------------------
+
+    def _index(self, collection, doc_id, entry):
+        self._unindex(collection, doc_id)
+        name, key, lat, lon = entry
+        self._entries[(collection, doc_id)] = entry
+        if key is not None:
+            self._by_address.setdefault((collection, key), {})[name] = doc_id
+        if lat is not None:
+            cell = geohash(lat, lon, self.precision)
+            self._by_cell.setdefault((collection, cell), {})[doc_id] = (lat, lon, name)
+
+    def _unindex(self, collection, doc_id):
+        previous = self._entries.pop((collection, doc_id), None)
+        if previous is None:
+            return
+        name, key, lat, lon = previous
+        if key is not None:
+            names = self._by_address.get((collection, key), {})
+            if names.get(name) == doc_id:
+                del names[name]
+            if not names:
+                self._by_address.pop((collection, key), None)
+        if lat is not None:
+            cell = (collection, geohash(lat, lon, self.precision))
+            members = self._by_cell.get(cell, {})
+            members.pop(doc_id, None)
+            if not members:
+                self._by_cell.pop(cell, None)
+
+    def _append(self, record):
+        try:
+            append_record(self.path, record)
+        except OSError as e:
+            logger.warning("Could not persist venue index: %s", e)
+
+    def _sync(self, missing_only=False):
+        """
+        Index journal lines appended since the last sync (by any process)
+
+        Args:
+            missing_only: Skip documents already indexed, keeping this
+                          process's entry for them
+        """
+        try:
+            records, _ = self._journal.read()
+        except OSError as e:
+            logger.warning("Could not load venue index %s: %s", self.path, e)
+            return
+        entries = []
+        for record in records:
+            try:
+                collection, doc_id, *entry = record
+            except (TypeError, ValueError):
+                continue
+            if len(entry) == 4:
+                entries.append((collection, doc_id, tuple(entry)))
+        if not entries:
+            return
+        with self._lock:
+            for collection, doc_id, entry in entries:
+                if not (missing_only and (collection, doc_id) in self._entries):
+                    self._index(collection, doc_id, entry)
+
+    def _compact(self):
+        """
+        Rewrite the journal with one line per indexed venue
+
+        Under the exclusive journal lock, lines other workers appended since
+        the last sync are folded in first, so the rewrite drops none of them.
+        """
+        try:
+            with journal_lock(self.path, exclusive=True):
+                self._sync(missing_only=True)
+                with self._lock:
+                    records = [
+                        [collection, doc_id, *entry]
+                        for (collection, doc_id), entry in self._entries.items()
+                    ]
+                write_records(self.path, records)
+        except OSError as e:
+            logger.warning("Could not persist venue index: %s", e)
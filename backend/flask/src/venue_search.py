@@ -0,0 +1,506 @@
+"""
+Venue Search
+In-memory venue catalogue (venues.json + Firestore) with radius / nearest queries
+"""
+
+import os
+import json
+import time
+import logging
+import zlib
+import threading
+import numpy as np
+from src.geo_index import GeoIndex, top_k
+from src.name_index import TrigramIndex
+from src.active_deals import ActiveDealIndex
+from src.projection import apply_updates
+
+logger = logging.getLogger(__name__)
+
+# upsert() compacts once this many entries, and a quarter of all entries, are dead
+COMPACT_MIN_DEAD = 256
+
+DEFAULT_VENUES_JSON = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "venues.json"
+)
+
+
+def normalize_venue(record, venue_id=None):
+    """
+    Map a venues.json entry or Firestore document onto the frontend venue shape
+
+    Returns:
+        dict or None: None when the record has no usable name
+    """
+    name = record.get("venue_name") or record.get("restaurant_name")
+    if not name:
+        return None
+    venue = dict(record)
+    venue["venue_id"] = str(record.get("venue_id") or venue_id or record.get("id"))
+    venue["venue_name"] = name
+    venue.setdefault("address", None)
+    venue.setdefault("deals", [])
+    return venue
+
+
+def _coordinates(venue):
+    try:
+        lat = float(venue.get("latitude"))
+        lon = float(venue.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def load_venues_json(path):
+    """Read a venues.json-shaped file into normalized venue dicts"""
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    venues = []
+    for record in records:
+        venue = normalize_venue(record)
+        if venue is not None:
+            venues.append(venue)
+    return venues
+
+
+class VenueSearch:
+    """
+    Venue records plus geo, name and active-deal indexes over them
+
+    Queries and upserts share one lock: upserts patch the indexes in place,
+    and a query must not see the geo tail ahead of the row mapping.
+    """
+
+    def __init__(self, venues=None, cell_deg=0.01, collection="final_schema"):
+        self.cell_deg = cell_deg
+        self.collection = collection
+        self.venues = []
+        self.geo = GeoIndex(cell_deg)
+        self.names = TrigramIndex()
+        self.active = ActiveDealIndex()
+        self._geo_rows = np.empty(0, dtype=np.int64)  # GeoIndex point -> venue position
+        self._row_points = np.empty(0, dtype=np.int64)  # venue position -> point or -1
+        self._by_id = {}  # venue_id -> position in self.venues
+        self._dead = set()  # positions superseded by upsert()
+        self._lock = threading.Lock()
+        self.built_at = 0.0
+        if venues is not None:
+            self.build(venues)
+
+    def build(self, venues, names=None):
+        """
+        Replace the catalogue with venues and rebuild the indexes
+
+        Args:
+            venues: Normalized venue dicts
+            names: Optional prebuilt TrigramIndex keyed by venue position
+        """
+        state = self._indexes(venues, names)
+        with self._lock:
+            self._install(*state)
+            self.built_at = time.time()
+        return self
+
+    def _indexes(self, venues, names=None):
+        venues = list(venues)
+        rows, lats, lons = [], [], []
+        by_id = {}
+        for i, venue in enumerate(venues):
+            by_id[venue["venue_id"]] = i
+            coords = _coordinates(venue)
+            if coords is not None:
+                rows.append(i)
+                lats.append(coords[0])
+                lons.append(coords[1])
+
+        if names is None:
+            names = TrigramIndex.from_names(
+                (i, venue["venue_name"]) for i, venue in enumerate(venues)
+            )
+
+        geo = GeoIndex(self.cell_deg).build(lats, lons)
+        active = ActiveDealIndex.from_venues(venues)
+        geo_rows = np.array(rows, dtype=np.int64)
+        row_points = np.full(len(venues), -1, dtype=np.int64)
+        row_points[geo_rows] = np.arange(len(geo_rows))
+        return venues, geo, names, active, geo_rows, row_points, by_id
+
+    def _install(self, venues, geo, names, active, geo_rows, row_points, by_id):
+        self.venues, self.geo, self.names = venues, geo, names
+        self.active = active
+        self._geo_rows, self._row_points = geo_rows, row_points
+        self._by_id, self._dead = by_id, set()
+
+    def get(self, venue_id):
+        with self._lock:
+            return self._get(venue_id)
+
+    def _get(self, venue_id):
+        row = self._by_id.get(str(venue_id))
+        return self.venues[row] if row is not None else None
+
+    def upsert(self, venue):
+        """
+        Add or replace one normalized venue without rebuilding
+
+        The old entry (if any) is tombstoned and the new one appended, so the
+        geo tail and trigram postings stay consistent. Once tombstones make up
+        a quarter of the entries (and at least COMPACT_MIN_DEAD), the indexes
+        are rebuilt from the live venues.
+        """
+        with self._lock:
+            row = len(self.venues)
+            old = self._by_id.get(venue["venue_id"])
+            if old is not None:
+                self._dead.add(old)
+                self.names.remove(old)
+            self.venues.append(venue)
+            self._by_id[venue["venue_id"]] = row
+            self.names.add(row, venue["venue_name"])
+            point = -1
+            coords = _coordinates(venue)
+            if coords is not None:
+                point = self.geo.add(*coords)
+                self._geo_rows = np.append(self._geo_rows, row)
+            self._row_points = np.append(self._row_points, point)
+            self.active.add_venue(venue)
+
+            dead = len(self._dead)
+            if dead >= COMPACT_MIN_DEAD and dead * 4 >= len(self.venues):
+                self._compact()
+
+    def _compact(self):
+        """Rebuild the indexes without tombstoned entries (caller holds the lock)"""
+        live = [v for i, v in enumerate(self.venues) if i not in self._dead]
+        logger.info("Compacting venue index: %d dead of %d", len(self._dead), len(self.venues))
+        self._install(*self._indexes(live))
+
+    def search(self, lat, lon, radius_m, limit=20, name=None, threshold=0.3):
+        """
+        Venues within radius_m of (lat, lon), nearest first
+
+        With a name, whichever filter touches fewer entries runs first: the
+        geo cells around the point or the trigram postings for the name.
+
+        Args:
+            lat, lon: Search origin in degrees
+            radius_m: Search radius in meters
+            limit: Maximum number of results
+            name: Optional fuzzy venue name filter
+            threshold: Minimum trigram Jaccard similarity for name matches
+
+        Returns:
+            list: Venue dicts with distance_meters (and match_score for name queries)
+        """
+        with self._lock:
+            return self._search(lat, lon, radius_m, limit, name, threshold)
+
+    def _search(self, lat, lon, radius_m, limit, name, threshold):
+        geo_rows = self._geo_rows
+        scores = None
+
+        if not name:
+            points, distances = self.geo.within(lat, lon, radius_m)
+            rows = geo_rows[points]
+        elif self.geo.estimate(lat, lon, radius_m) <= self.names.cost(name):
+            points, distances = self.geo.within(lat, lon, radius_m)
+            rows = geo_rows[points]
+            scores = self.names.score(name, rows)
+            keep = scores >= threshold
+            rows, distances, scores = rows[keep], distances[keep], scores[keep]
+        else:
+            rows, scores = self.names.match(name, threshold)
+            points = self._row_points[rows]
+            located = points >= 0
+            rows, scores, points = rows[located], scores[located], points[located]
+            distances = self.geo.distances(lat, lon, points)
+            keep = distances <= radius_m
+            rows, distances, scores = rows[keep], distances[keep], scores[keep]
+
+        if self._dead and len(rows):
+            keep = ~np.isin(rows, list(self._dead))
+            rows, distances = rows[keep], distances[keep]
+            if scores is not None:
+                scores = scores[keep]
+
+        positions, distances = top_k(np.arange(len(rows)), distances, limit)
+        results = []
+        for pos, distance in zip(positions.tolist(), distances.tolist()):
+            venue = dict(self.venues[rows[pos]])
+            venue["distance_meters"] = round(distance, 1)
+            if scores is not None:
+                venue["match_score"] = round(float(scores[pos]), 3)
+            results.append(venue)
+        return results
+
+    def active_deals(self, when=None, venue_ids=None):
+        """
+        Deals running at a moment, joined with their venue
+
+        Args:
+            when: datetime, epoch seconds, or None for now
+            venue_ids: Optional iterable of venue IDs to restrict to
+
+        Returns:
+            list: Deal dicts with deal_id, venue_id and venue_name
+        """
+        results = []
+        with self._lock:
+            for deal_id, venue_id, deal in self.active.active(when, venue_ids):
+                venue = self._get(venue_id) or {}
+                results.append(
+                    {
+                        **deal,
+                        "deal_id": deal_id,
+                        "venue_id": venue_id,
+                        "venue_name": venue.get("venue_name"),
+                    }
+                )
+        return results
+
+    def dump(self, path):
+        """Write venues and the trigram index to a compressed snapshot file"""
+        with self._lock:
+            venues = [v for i, v in enumerate(self.venues) if i not in self._dead]
+            names = TrigramIndex.from_names(
+                (i, venue["venue_name"]) for i, venue in enumerate(venues)
+            )
+        payload = zlib.compress(json.dumps(venues).encode("utf-8"))
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                venues=np.frombuffer(payload, dtype=np.uint8),
+                names=np.frombuffer(names.to_bytes(), dtype=np.uint8),
+                collection=np.array(self.collection),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, cell_deg=0.01):
+        """Inverse of dump(); the trigram postings are loaded, not recomputed"""
+        arrays = np.load(path)
+        venues = json.loads(zlib.decompress(arrays["venues"].tobytes()))
+        names = TrigramIndex.from_bytes(arrays["names"].tobytes())
+        search = cls(cell_deg=cell_deg, collection=str(arrays["collection"]))
+        return search.build(venues, names=names)
+
+
+class ReplicaVenueSearch:
+    """
+    VenueSearch's query interface answered by a VenueReplica's SQLite indexes
+
+    Used while READ_MODE=replica and the replica is fresh; it only holds
+    Firestore documents, not the venues.json seed.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.collection = replica.collection
+
+    def get(self, venue_id):
+        doc = self.replica.get(venue_id)
+        return normalize_venue(doc, venue_id=venue_id) if doc is not None else None
+
+    def search(self, lat, lon, radius_m, limit=20, name=None, threshold=0.3):
+        """See VenueSearch.search"""
+        results = []
+        for doc in self.replica.within(
+            lat, lon, radius_m, limit=limit, name=name, threshold=threshold
+        ):
+            venue = normalize_venue(doc)
+            if venue is not None:
+                results.append(venue)
+        return results
+
+    def active_deals(self, when=None, venue_ids=None):
+        """See VenueSearch.active_deals"""
+        if venue_ids is not None:
+            venue_ids = {str(v) for v in venue_ids}
+        venues = {}
+        results = []
+        for venue_id, deal_index in self.replica.active_at(when):
+            if venue_ids is not None and venue_id not in venue_ids:
+                continue
+            if venue_id not in venues:
+                venues[venue_id] = self.replica.get(venue_id) or {}
+            venue = venues[venue_id]
+            deals = venue.get("deals") or []
+            if deal_index >= len(deals):
+                continue  # the document changed since the windows were read
+            results.append(
+                {
+                    **deals[deal_index],
+                    "deal_id": f"{venue_id}:{deal_index}",
+                    "venue_id": venue_id,
+                    "venue_name": venue.get("venue_name") or venue.get("restaurant_name"),
+                }
+            )
+        return results
+
+
+_searches = {}  # collection -> VenueSearch
+_search_lock = threading.Lock()  # serializes first builds
+_writes_lock = threading.Lock()  # guards _searches swaps and _rebuilding
+_rebuilding = {}  # collection -> writes seen while its index is being built
+
+
+def get_venue_search(uploader=None, collection="final_schema"):
+    """
+    Shared VenueSearch of a collection, built from venues.json and Firestore
+
+    Only the first call for a collection waits for the build. Once the index
+    is older than VENUE_INDEX_TTL it keeps being served while a background
+    thread rebuilds it; writes in the meantime are replayed onto the new one.
+
+    With READ_MODE=replica and a fresh replica of the collection, queries go
+    to the replica instead (ReplicaVenueSearch) and nothing is built.
+
+    VENUES_JSON_PATH : venues.json-shaped seed file (default: repo venues.json)
+    VENUE_INDEX_TTL  : Seconds before the index is rebuilt (default 300)
+    VENUE_INDEX_PATH : Optional snapshot file; a fresh snapshot is loaded
+                       instead of rebuilding, and rebuilt indexes are saved to it
+                       (other collections get <name>.<collection><ext>)
+    """
+    replica = uploader.replica_for(collection) if uploader is not None else None
+    if replica is not None:
+        return ReplicaVenueSearch(replica)
+
+    ttl = float(os.getenv("VENUE_INDEX_TTL", 300))
+    current = _searches.get(collection)
+    if current is None:
+        with _search_lock:
+            current = _searches.get(collection)
+            if current is None:
+                current = _load_snapshot(collection, ttl)
+            if current is None:
+                with _writes_lock:
+                    _rebuilding.setdefault(collection, [])
+                current = _refresh(uploader, collection)
+        return current
+
+    if time.time() - current.built_at >= ttl:
+        with _writes_lock:
+            start = collection not in _rebuilding
+            if start:
+                _rebuilding[collection] = []
+        if start:
+            threading.Thread(
+                target=_rebuild_in_background,
+                args=(uploader, collection),
+                name=f"venue-index-{collection}",
+                daemon=True,
+            ).start()
+    return current
+
+
+def _snapshot_path(collection):
+    path = os.getenv("VENUE_INDEX_PATH")
+    if not path or collection == "final_schema":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{collection}{ext}"
+
+
+def _load_snapshot(collection, ttl):
+    """Install a snapshot younger than ttl, if there is one"""
+    snapshot = _snapshot_path(collection)
+    if not snapshot or not os.path.exists(snapshot):
+        return None
+    age = time.time() - os.path.getmtime(snapshot)
+    if age >= ttl:
+        return None
+    try:
+        loaded = VenueSearch.load(snapshot)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Could not load venue index snapshot: %s", e)
+        return None
+    if loaded.collection != collection:
+        return None
+    loaded.built_at = time.time() - age
+    with _writes_lock:
+        _searches[collection] = loaded
+    logger.info("Venue index loaded from %s", snapshot)
+    return loaded
+
+
+def _build(uploader, collection):
+    """New VenueSearch from venues.json and a full scan of the collection"""
+    venues = []
+    path = os.getenv("VENUES_JSON_PATH", DEFAULT_VENUES_JSON)
+    if os.path.exists(path):
+        try:
+            venues.extend(load_venues_json(path))
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load venues from %s: %s", path, e)
+
+    if uploader is not None:
+        try:
+            for doc in uploader.iter_restaurants(collection=collection):
+                venue = normalize_venue(doc, venue_id=doc.get("id"))
+                if venue is not None:
+                    venues.append(venue)
+        except Exception as e:
+            logger.warning("Could not load venues from Firestore: %s", e)
+
+    search = VenueSearch(venues, collection=collection)
+    logger.info(
+        "Venue index built for %s: %d venues, %d located", collection, len(venues), len(search.geo)
+    )
+
+    snapshot = _snapshot_path(collection)
+    if snapshot:
+        try:
+            search.dump(snapshot)
+        except OSError as e:
+            logger.warning("Could not write venue index snapshot: %s", e)
+    return search
+
+
+def _refresh(uploader, collection):
+    """
+    Build and install a collection's index (the caller registered it in
+    _rebuilding); writes that arrived during the scan are replayed first
+    """
+    search = None
+    try:
+        search = _build(uploader, collection)
+    finally:
+        with _writes_lock:
+            writes = _rebuilding.pop(collection, [])
+            if search is not None:
+                for doc_id, fields in writes:
+                    _apply_write(search, doc_id, fields)
+                _searches[collection] = search
+    return search
+
+
+def _rebuild_in_background(uploader, collection):
+    try:
+        _refresh(uploader, collection)
+    except Exception as e:
+        logger.warning("Venue index rebuild for %s failed: %s", collection, e)
+
+
+def _apply_write(search, doc_id, fields):
+    existing = search.get(doc_id) or {}
+    venue = normalize_venue(apply_updates(existing, fields), venue_id=doc_id)
+    if venue is not None:
+        search.upsert(venue)
+
+
+def apply_venue_write(collection, doc_id, fields):
+    """
+    FirebaseUploader write listener: fold a created/updated document into the
+    collection's index (if one has been built) without waiting for the next rebuild
+    """
+    with _writes_lock:
+        pending = _rebuilding.get(collection)
+        if pending is not None:
+            pending.append((doc_id, fields))
+        search = _searches.get(collection)
+    if search is not None:
+        _apply_write(search, doc_id, fields)
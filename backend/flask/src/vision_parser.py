@@ -5,24 +5,168 @@ Pure Gemini AI vision-based menu extraction without OCR
 
 import os
 import json
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+from datetime import timedelta
+from contextlib import contextmanager
 from dotenv import load_dotenv
-import google.generativeai as genai
-import PIL.Image
+from src.metrics import (
+    span,
+    configure_logging,
+    CACHE_LOOKUPS,
+    GEMINI_TOKENS,
+    GEMINI_CALL_SECONDS,
+)
+from src.deal_models import MenuParsing, DealValidationError
+from src.result_cache import ParseResultCache, content_key
+from src.admission import Overloaded, shared_admission
+from src.retry import retry_call
+from src.image_source import read_image_bytes, open_image_stream, source_filename
+from src.gemini_usage import (
+    IMAGE_TILE_TOKENS,
+    UsageTracker,
+    fit_image,
+    usage_from_response,
+)
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "models/gemini-2.5-flash"
+
+# Bump PROMPT_VERSION whenever SYSTEM_INSTRUCTION or EXTRACTION_PROMPT changes
+# so cached results are not reused
+PROMPT_VERSION = "2"
+RESPONSE_FORMAT = """Extract the information in this EXACT JSON structure:
+{
+    "restaurant_name": "name if visible, otherwise null",
+    "deals": [
+        {
+            "name": "item name",
+            "price": "price as string (e.g., '$19.99', 'Free')",
+            "description": "details about the deal or null"
+        }
+    ],
+    "time_frame": [
+        {
+            "start_time": "e.g., '4:00 PM'",
+            "end_time": "e.g., '7:00 PM'",
+            "days": ["Monday", "Tuesday"] or null if not shown
+        }
+    ],
+    "special_conditions": ["condition 1", "condition 2"] or null
+}
+
+Important:
+- Extract ALL deals/items visible
+- Use full day names (Monday, not Mon)
+- Correct any OCR-like errors in text
+- Include all restrictions/conditions
+- Return ONLY valid JSON, no markdown formatting"""
+
+# The fixed instructions: the model's system instruction (or an explicit
+# context cache), so each request only carries its images and one line of text
+SYSTEM_INSTRUCTION = (
+    "You extract restaurant menu and happy hour deals from photos.\n\n" + RESPONSE_FORMAT
+)
+
+EXTRACTION_PROMPT = "Analyze this restaurant menu/happy hour deal image."
+
+# Several photos of one menu in a single request; versioned separately from
+# EXTRACTION_PROMPT because its cache keys cover a different set of inputs
+MULTI_PROMPT_VERSION = "2"
+MULTI_IMAGE_PROMPT = (
+    "These images are separate photos of ONE restaurant's menu/happy hour deals "
+    "(different pages, sections or angles of the same menu).\n\n"
+    "Combine them into a single result: list each deal once even if it appears in "
+    "several photos, and merge the time frames and conditions from all images."
+)
+
+# Per-image token cap by default: a 2048x1536 photo (the preprocessor's
+# largest 4:3 output) is 6 tiles and passes unchanged
+DEFAULT_IMAGE_TOKENS = 6 * IMAGE_TILE_TOKENS
+
+# UsageTracker collecting the calls of the current track_usage() block
+_request_usage = contextvars.ContextVar("gemini_request_usage", default=None)
+
+
+def parse_response_text(response_text):
+    """
+    Decode a Gemini reply, stripping a surrounding markdown code fence if present
+
+    Raises:
+        json.JSONDecodeError: When the reply is not valid JSON
+    """
+    # Clean response (remove markdown if present)
+    if response_text.startswith("```"):
+        json_text = response_text.split("```")[1]
+        if json_text.startswith("json"):
+            json_text = json_text[4:]
+        response_text = json_text.strip()
+
+    return json.loads(response_text)
+
 
 class VisionMenuParser:
     """Gemini Vision-only menu parser"""
 
-    def __init__(self, api_key=None):
+    def __init__(
+        self,
+        api_key=None,
+        cache=None,
+        model=None,
+        batch_size=None,
+        admission=None,
+        image_tokens=None,
+    ):
         """
         Initialize Gemini Vision parser
 
         Args:
             api_key: Gemini API key (optional, reads from GEMINI_API_KEY env var)
+            cache: ParseResultCache (optional, built from PARSE_CACHE_* env vars)
+            model: Object with generate_content() to use instead of Gemini
+                   (e.g. src.fakes.FakeGenerativeModel); skips API key setup
+            batch_size: Max images sent in one parse_deals() request
+                        (default: GEMINI_IMAGES_PER_REQUEST env var, or 4)
+            admission: AdmissionController every model call goes through
+                       (default: the process-wide one, see src.admission)
+            image_tokens: Estimated tokens allowed per image; larger images are
+                          downscaled before the call (default: GEMINI_IMAGE_TOKENS
+                          env var, or 1548; 0 sends images as they are)
         """
+        self.cache = cache if cache is not None else ParseResultCache.from_env()
+        self.batch_size = max(
+            1, int(batch_size or os.getenv("GEMINI_IMAGES_PER_REQUEST", 4))
+        )
+        self.admission = admission if admission is not None else shared_admission()
+        # Tries per model call for quota / transient errors (honoring retry-after hints)
+        self.max_attempts = max(1, int(os.getenv("GEMINI_MAX_ATTEMPTS", 3)))
+        self.image_tokens = (
+            image_tokens
+            if image_tokens is not None
+            else int(os.getenv("GEMINI_IMAGE_TOKENS", DEFAULT_IMAGE_TOKENS))
+        )
+        # Token counts and model latency of every call this parser makes
+        self.usage = UsageTracker()
+        # Explicit context cache of SYSTEM_INSTRUCTION (seconds it lives, 0 = off)
+        self.context_cache_ttl = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 0))
+        self._cached_model = None
+        self._cached_until = 0.0
+        self._cache_lock = threading.Lock()
+
+        if model is not None:
+            self.model = model
+            # An injected model has no system instruction: send it with each call
+            self._inline_instructions = True
+            self.context_cache_ttl = 0
+            return
+
         # Get API key
         if api_key is None:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -32,137 +176,338 @@ class VisionMenuParser:
                 "Gemini API key required. Set GEMINI_API_KEY in .env or pass api_key parameter"
             )
 
+        # Imported here: google.generativeai is slow to import and only needed
+        # once a parser is actually built
+        import google.generativeai as genai
+
         # Configure Gemini
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("models/gemini-2.5-flash")
-        print("[OK] Gemini Vision initialized")
+        self.model = genai.GenerativeModel(MODEL_NAME, system_instruction=SYSTEM_INSTRUCTION)
+        self._inline_instructions = False
+        logger.info("Gemini Vision initialized")
 
-    def parse_deal(self, image_path):
+    def parse_deal(self, image, raise_errors=False, token_budget=None):
         """
         Parse menu image and extract structured data
 
         Args:
-            image_path: Path to menu image
+            image: Path to menu image, or image bytes / memoryview / file-like object
+            raise_errors: Re-raise model/transport errors instead of returning an
+                          error dict (lets callers retry transient failures)
+            token_budget: Estimated image tokens this request may spend; the image
+                          is downscaled to fit (default: image_tokens, 0 = no limit)
 
         Returns:
-            dict: Structured menu data with restaurant_name, deals, time_frame, special_conditions
+            dict: Structured menu data with restaurant_name, deals, time_frame,
+                  special_conditions and time_windows (see deal_models.MenuParsing)
+
+        Raises:
+            src.admission.Overloaded: When admission control refuses the Gemini
+                                      call (regardless of raise_errors)
         """
-        print(f"\n{'=' * 70}")
-        print(f"Processing: {image_path}")
-        print(f"{'=' * 70}\n")
+        name = source_filename(image, default="<in-memory image>")
+        logger.info("Processing: %s", name)
+        return self._extract([image], raise_errors, self.image_budget(1, token_budget))
 
-        try:
-            # Load image
-            print(f"Loading image: {image_path}")
-            img = PIL.Image.open(image_path)
-            img.load()  # Load into memory
-            print(
-                f"[OK] Image loaded - Size: {img.size}, Mode: {img.mode}, Format: {img.format}"
-            )
+    def parse_deals(self, images, raise_errors=False, token_budget=None):
+        """
+        Parse several photos of the same menu into one combined result
 
-            # Create prompt
-            prompt = """Analyze this restaurant menu/happy hour deal image.
+        Up to batch_size images go to Gemini in a single request with a prompt
+        that merges them; larger sets are split into batches whose results are
+        merged here (see MenuParsing.merge).
 
-Extract the information in this EXACT JSON structure:
-{
-    "restaurant_name": "name if visible, otherwise null",
-    "deals": [
-        {
-            "name": "item name",
-            "price": "price as string (e.g., '$19.99', 'Free')",
-            "description": "details about the deal or null"
-        }
-    ],
-    "time_frame": [
-        {
-            "start_time": "e.g., '4:00 PM'",
-            "end_time": "e.g., '7:00 PM'",
-            "days": ["Monday", "Tuesday"] or null if not shown
-        }
-    ],
-    "special_conditions": ["condition 1", "condition 2"] or null
-}
+        Args:
+            images: List of paths / bytes / file-like objects
+            raise_errors: Same as parse_deal
+            token_budget: Estimated image tokens for all images together, split
+                          evenly between them (default: image_tokens per image)
 
-Important:
-- Extract ALL deals/items visible
-- Use full day names (Monday, not Mon)
-- Correct any OCR-like errors in text
-- Include all restrictions/conditions
-- Return ONLY valid JSON, no markdown formatting"""
+        Returns:
+            dict: Same shape as parse_deal; an error in any batch is returned as is
+        """
+        images = list(images)
+        if len(images) == 1:
+            return self.parse_deal(
+                images[0], raise_errors=raise_errors, token_budget=token_budget
+            )
+        max_tokens = self.image_budget(len(images), token_budget)
+
+        batches = [
+            images[i : i + self.batch_size]
+            for i in range(0, len(images), self.batch_size)
+        ]
+        logger.info(
+            "Processing %d images of one menu in %d request(s)", len(images), len(batches)
+        )
+
+        results = []
+        for batch in batches:
+            data = self._extract(batch, raise_errors, max_tokens)
+            if data.get("error"):
+                return data
+            results.append(data)
+
+        if len(results) == 1:
+            return results[0]
+        return MenuParsing.merge(
+            [MenuParsing.from_gemini(data) for data in results]
+        ).to_document()
+
+    def image_budget(self, count, token_budget=None):
+        """
+        Estimated tokens each of count images may cost
 
-            # Call Gemini Vision
-            print("Analyzing image with Gemini Vision...")
-            response = self.model.generate_content([prompt, img])
-            response_text = response.text.strip()
+        Returns:
+            int: Per-image cap (never below one tile), or 0 for no limit
+        """
+        if token_budget is None:
+            return self.image_tokens
+        if not token_budget:
+            return 0
+        return max(IMAGE_TILE_TOKENS, int(token_budget) // max(1, count))
+
+    @contextmanager
+    def track_usage(self):
+        """
+        Collect the usage of the calls made inside the block (this thread or task)
+
+        Usage:
+            with parser.track_usage() as usage:
+                parser.parse_deal(image)
+            usage.snapshot()  # {"calls": 1, "prompt_tokens": ..., ...}
+        """
+        tracker = UsageTracker()
+        token = _request_usage.set(tracker)
+        try:
+            yield tracker
+        finally:
+            _request_usage.reset(token)
+
+    def record_usage(self, response, seconds, image_tokens):
+        """Account one successful call: parser totals, the open track_usage() and metrics"""
+        usage = usage_from_response(response)
+        usage["image_tokens"] = image_tokens
+        usage["model_seconds"] = seconds
+        self.usage.record(usage)
+        request_usage = _request_usage.get()
+        if request_usage is not None:
+            request_usage.record(usage)
+
+        for kind in ("prompt", "output", "cached"):
+            if usage[f"{kind}_tokens"]:
+                GEMINI_TOKENS.inc(usage[f"{kind}_tokens"], kind=kind)
+        GEMINI_CALL_SECONDS.observe(seconds)
+        logger.debug(
+            "Gemini usage: prompt=%d (images ~%d, cached %d) output=%d in %.2fs",
+            usage["prompt_tokens"],
+            image_tokens,
+            usage["cached_tokens"],
+            usage["output_tokens"],
+            seconds,
+        )
+
+    def current_model(self):
+        """
+        The model to call: one reading SYSTEM_INSTRUCTION from an explicit
+        context cache when GEMINI_CONTEXT_CACHE_TTL is set, otherwise self.model
+        """
+        if not self.context_cache_ttl:
+            return self.model
+        with self._cache_lock:
+            if self._cached_model is None or time.monotonic() >= self._cached_until:
+                self._cached_model = self._create_cached_model()
+            return self._cached_model
+
+    def _create_cached_model(self):
+        import google.generativeai as genai
 
-            print(
-                f"[DEBUG] Raw Gemini response length: {len(response_text)} characters"
+        ttl = self.context_cache_ttl
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=MODEL_NAME,
+                display_name=f"menu-extraction-v{PROMPT_VERSION}",
+                system_instruction=SYSTEM_INSTRUCTION,
+                ttl=timedelta(seconds=ttl),
             )
-            print(f"[DEBUG] First 200 chars: {response_text[:200]}")
-            print(f"[DEBUG] Full response:\n{response_text}\n")
-
-            # Clean response (remove markdown if present)
-            if response_text.startswith("```"):
-                print("[DEBUG] Response has markdown formatting, cleaning...")
-                json_text = response_text.split("```")[1]
-                if json_text.startswith("json"):
-                    json_text = json_text[4:]
-                response_text = json_text.strip()
-                print(f"[DEBUG] Cleaned response:\n{response_text}\n")
-
-            # Parse JSON
-            print("[DEBUG] Attempting to parse JSON...")
-            data = json.loads(response_text)
-            print(f"[DEBUG] JSON parsed successfully!")
-            print(f"[DEBUG] Parsed data type: {type(data)}")
-            print(
-                f"[DEBUG] Parsed data keys: {data.keys() if isinstance(data, dict) else 'Not a dict'}"
+        except Exception as e:
+            # e.g. the instructions are under the model's minimum cacheable size
+            logger.warning(
+                "Gemini context cache unavailable, using the system instruction: %s", e
             )
+            self.context_cache_ttl = 0
+            return self.model
+        # Replace it a little before it expires so no call hits a dead cache
+        self._cached_until = time.monotonic() + max(ttl - 60, ttl / 2)
+        logger.info("Gemini context cache created: %s (ttl %ds)", cached.name, ttl)
+        return genai.GenerativeModel.from_cached_content(cached)
+
+    def _generate(self, contents, image_tokens=0):
+        """generate_content behind admission control, retrying transient failures"""
+
+        def timed(model):
+            start = time.perf_counter()
+            response = model.generate_content(contents)
+            self.record_usage(response, time.perf_counter() - start, image_tokens)
+            return response
+
+        def call():
+            model = self.current_model()
+            if self.admission is None:
+                return timed(model)
+            with self.admission.slot():
+                return timed(model)
+
+        # Overloaded is not transient: a refused call fails fast instead of queueing
+        return retry_call(call, attempts=self.max_attempts, max_delay=10.0)
+
+    def _cache_key(self, images_bytes, max_tokens=0):
+        # A different token budget sends a different image
+        budget = f"-t{max_tokens}" if max_tokens else ""
+        if len(images_bytes) == 1:
+            return content_key(images_bytes[0], PROMPT_VERSION + budget)
+        digests = b"".join(hashlib.sha256(data).digest() for data in images_bytes)
+        return content_key(digests, f"multi-{MULTI_PROMPT_VERSION}{budget}")
+
+    def _extract(self, images, raise_errors, max_tokens=0):
+        """One generate_content call for one or more images of the same menu"""
+        response_text = None
+        try:
+            images_bytes = [read_image_bytes(image) for image in images]
+            cache_key, cached = self._lookup_cached(images_bytes, max_tokens)
+            if cached is not None:
+                return cached
 
-            print(f"[OK] Extracted data:")
-            print(f"  Restaurant: {data.get('restaurant_name')}")
-            deals = data.get("deals", [])
-            print(f"  Deals: {len(deals) if deals else 0} items")
-            time_frame = data.get("time_frame", [])
-            print(f"  Time Frames: {len(time_frame) if time_frame else 0} slots")
-            conditions = data.get("special_conditions", [])
-            print(f"  Conditions: {len(conditions) if conditions else 0} items")
-
-            return data
-
-        except json.JSONDecodeError as e:
-            print(f"[ERROR] Failed to parse JSON response: {e}")
-            print(f"Response was: {response_text}")
-            return {
-                "restaurant_name": None,
-                "deals": None,
-                "time_frame": None,
-                "special_conditions": None,
-                "error": f"JSON parsing error: {str(e)}",
-            }
+            imgs, image_tokens = self._load_images(images_bytes, max_tokens)
+
+            # Call Gemini Vision
+            with span("gemini_call"):
+                response = self._generate(self._contents(imgs), image_tokens)
+            response_text = response.text.strip()
+            return self._finish(response_text, cache_key, len(imgs))
 
         except Exception as e:
-            print(f"[ERROR] Vision parsing failed: {e}")
-            return {
-                "restaurant_name": None,
-                "deals": None,
-                "time_frame": None,
-                "special_conditions": None,
-                "error": str(e),
-            }
+            return self._failure(e, response_text, raise_errors)
+
+    def _lookup_cached(self, images_bytes, max_tokens=0):
+        """
+        Returns:
+            tuple: (cache_key, cached result or None); cache_key is None without a cache
+        """
+        # Same images + same prompt version -> same result, skip the model call
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(images_bytes, max_tokens)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            CACHE_LOOKUPS.inc(cache="parse", result="hit")
+            logger.info("Parse cache hit: %s", cache_key[:12])
+            return cache_key, cached
+        CACHE_LOOKUPS.inc(cache="parse", result="miss")
+        return cache_key, None
+
+    def _load_images(self, images_bytes, max_tokens=0):
+        """
+        Decode images, downscaling any that would cost more than max_tokens
+
+        Returns:
+            tuple: (PIL images, estimated image tokens for all of them)
+        """
+        import PIL.Image
+
+        imgs = []
+        total_tokens = 0
+        for image_bytes in images_bytes:
+            img = PIL.Image.open(open_image_stream(image_bytes))
+            img.load()  # Load into memory
+            logger.debug(
+                "Image loaded - Size: %s, Mode: %s, Format: %s",
+                img.size,
+                img.mode,
+                img.format,
+            )
+            fitted, tokens = fit_image(img, max_tokens)
+            if fitted is not img:
+                logger.debug(
+                    "Image downscaled %s -> %s for a %d token budget",
+                    img.size,
+                    fitted.size,
+                    max_tokens,
+                )
+            imgs.append(fitted)
+            total_tokens += tokens
+        return imgs, total_tokens
+
+    def _contents(self, imgs):
+        # Fixed text first and images last, so repeated requests share a prefix
+        prompt = EXTRACTION_PROMPT if len(imgs) == 1 else MULTI_IMAGE_PROMPT
+        if self._inline_instructions:
+            return [SYSTEM_INSTRUCTION, prompt, *imgs]
+        return [prompt, *imgs]
+
+    def _finish(self, response_text, cache_key, image_count):
+        """Validate a Gemini reply, cache it and return the stored shape"""
+        logger.debug("Raw Gemini response (%d chars):\n%s", len(response_text), response_text)
+
+        with span("json_parse"):
+            # Validated once here; everything downstream trusts this shape
+            menu = MenuParsing.from_gemini(parse_response_text(response_text))
+            data = menu.to_document()
+
+        logger.info(
+            "Extracted: restaurant=%s deals=%d time_frames=%d conditions=%d images=%d",
+            menu.restaurant_name,
+            len(menu.deals),
+            len(menu.time_frame),
+            len(menu.special_conditions or ()),
+            image_count,
+        )
+
+        if cache_key is not None:
+            self.cache.set(cache_key, data)
+
+        return data
+
+    def _failure(self, exc, response_text, raise_errors):
+        """Error dict for a failed extraction (or re-raise, see parse_deal)"""
+        if isinstance(exc, Overloaded):
+            # Not a problem with the image: always surfaced so callers can shed / retry
+            raise exc
+
+        if isinstance(exc, json.JSONDecodeError):
+            logger.error("Failed to parse JSON response: %s", exc)
+            logger.debug("Response was: %s", response_text)
+            error = f"JSON parsing error: {str(exc)}"
+        elif isinstance(exc, DealValidationError):
+            logger.error("Gemini response does not match the deal schema: %s", exc)
+            logger.debug("Response was: %s", response_text)
+            error = f"Schema validation error: {str(exc)}"
+        else:
+            logger.error("Vision parsing failed: %s", exc)
+            if raise_errors:
+                raise exc
+            error = str(exc)
+
+        return {
+            "restaurant_name": None,
+            "deals": None,
+            "time_frame": None,
+            "special_conditions": None,
+            "error": error,
+        }
 
-    def parse_to_json(self, image_path, pretty=True):
+    def parse_to_json(self, image, pretty=True):
         """
         Parse menu and return as JSON string
 
         Args:
-            image_path: Path to menu image
+            image: Path to menu image, or image bytes / file-like object
             pretty: Pretty print JSON (default: True)
 
         Returns:
             str: JSON string
         """
-        data = self.parse_deal(image_path)
+        data = self.parse_deal(image)
         return json.dumps(data, indent=2 if pretty else None)
 
 
@@ -175,6 +520,7 @@ def main():
     parser.add_argument("--output", "-o", help="Output JSON file (optional)")
 
     args = parser.parse_args()
+    configure_logging()
 
     # Initialize parser
     parser = VisionMenuParser()
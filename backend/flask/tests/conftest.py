@@ -0,0 +1,45 @@
+"""
+Shared pytest setup: import path and environment
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests build their own caches and indexes; nothing is read from or written to disk
+os.environ.setdefault("PARSE_CACHE_ENABLED", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def make_uploader(monkeypatch):
+    """FirebaseUploader over src.fakes; pass response_text to script Gemini's reply"""
+    from src.fakes import FakeBucket, FakeFirestore, FakeGenerativeModel
+    from src.vision_parser import VisionMenuParser
+    from src.firebase_uploader import FirebaseUploader
+
+    def build(response_text=None, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        model = FakeGenerativeModel() if response_text is None else FakeGenerativeModel(response_text)
+        parser = VisionMenuParser(model=model, cache=None, admission=None)
+        return FirebaseUploader(db=FakeFirestore(), bucket=FakeBucket(), parser=parser)
+
+    return build
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    """Flask test client whose routes use the given uploader"""
+    import endpoints.routes as routes
+    from src.app import app
+
+    def build(uploader):
+        monkeypatch.setattr(routes, "_uploader", uploader)
+        return app.test_client()
+
+    return build
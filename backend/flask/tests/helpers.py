@@ -0,0 +1,20 @@
+"""
+Test helpers: small generated images
+"""
+
+import io
+
+import PIL.Image
+
+
+def encode_image(size=(64, 48), color=(200, 40, 40), fmt="JPEG", exif=None, **params):
+    """Bytes of a solid image with a little structure (so hashes are not all zero)"""
+    img = PIL.Image.new("RGB", size, color)
+    for x in range(0, size[0], 8):
+        for y in range(size[1]):
+            img.putpixel((x, y), (x % 256, y % 256, 90))
+    out = io.BytesIO()
+    if exif is not None:
+        params["exif"] = exif
+    img.save(out, fmt, **params)
+    return out.getvalue()
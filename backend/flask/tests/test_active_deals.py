@@ -0,0 +1,172 @@
+from datetime import datetime, timezone
+
+import pytest
+from src.active_deals import (
+    MINUTES_PER_DAY,
+    MINUTES_PER_WEEK,
+    ActiveDealIndex,
+    document_windows,
+    minute_of_week,
+    parse_days,
+    parse_end_minutes,
+    parse_time_minutes,
+    window_intervals,
+)
+
+# 2026-10-12 is a Monday; naive datetimes are local time
+MONDAY = datetime(2026, 10, 12)
+
+
+def at(day, hour, minute=0):
+    return MONDAY.replace(day=12 + day, hour=hour, minute=minute)
+
+
+def deal(name, start_time, end_time, *days):
+    return {"name": name, "start_time": start_time, "end_time": end_time, "days": list(days)}
+
+
+def venue(venue_id, *deals, **fields):
+    return {"venue_id": venue_id, "venue_name": venue_id.title(), "deals": list(deals), **fields}
+
+
+@pytest.mark.parametrize(
+    "text, minutes",
+    [
+        ("4:00 PM", 16 * 60),
+        ("4pm", 16 * 60),
+        ("16:30", 16 * 60 + 30),
+        ("12 am", 0),
+        ("12:15 p.m.", 12 * 60 + 15),
+        ("noon", 12 * 60),
+        ("midnight", 0),
+        ("24:00", MINUTES_PER_DAY),
+        ("13 pm", None),
+        ("late", None),
+    ],
+)
+def test_parse_time_minutes(text, minutes):
+    assert parse_time_minutes(text) == minutes
+
+
+def test_close_and_late_end_at_closing_time(monkeypatch):
+    assert parse_end_minutes("7:00 PM") == 19 * 60
+    for text in ("close", "Close", "'til close", "until closing", "late", "Late night"):
+        assert parse_end_minutes(text) == 2 * 60
+    monkeypatch.setenv("DEAL_CLOSING_TIME", "midnight")
+    assert parse_end_minutes("close") == 0
+    assert parse_end_minutes("whenever") is None
+    assert parse_time_minutes("close") is None
+
+
+@pytest.mark.parametrize(
+    "days, indexes",
+    [
+        (["Monday-Friday"], {0, 1, 2, 3, 4}),
+        (["Mon - Thu", "Sat"], {0, 1, 2, 3, 5}),
+        (["Friday through Sunday"], {4, 5, 6}),
+        (["Sat-Mon"], {5, 6, 0}),
+        (["Weekdays"], {0, 1, 2, 3, 4}),
+        (["weekends"], {5, 6}),
+        (["Daily"], set(range(7))),
+        ("Mon, Wed & Fri", {0, 2, 4}),
+        (["Tues.", "Thurs"], {1, 3}),
+        (["Game days"], set()),
+        (None, set()),
+    ],
+)
+def test_parse_days_expands_ranges_and_aliases(days, indexes):
+    assert parse_days(days) == indexes
+
+
+def test_weekday_range_is_not_monday_only_or_all_week():
+    index = ActiveDealIndex.from_venues(
+        [venue("bar", deal("Wings", "4 PM", "7 PM", "Monday-Friday"))]
+    )
+    assert index.active_ids(at(3, 17)) == ["bar:0"]  # Thursday
+    assert index.active_ids(at(5, 17)) == []  # Saturday
+
+
+def test_window_past_midnight_runs_into_the_next_day():
+    assert window_intervals("10 PM", "2 AM", ["Friday"]) == [
+        (4 * MINUTES_PER_DAY + 22 * 60, 5 * MINUTES_PER_DAY + 2 * 60)
+    ]
+
+
+def test_sunday_night_window_wraps_to_monday():
+    assert window_intervals("10 PM", "2 AM", ["Sun"]) == [
+        (6 * MINUTES_PER_DAY + 22 * 60, MINUTES_PER_WEEK),
+        (0, 2 * 60),
+    ]
+
+
+def test_no_days_means_every_day():
+    assert len(window_intervals("4 PM", "6 PM", [])) == 7
+    assert window_intervals("4 PM", "soon") == []
+
+
+def test_index_answers_midnight_and_week_wrap():
+    index = ActiveDealIndex.from_venues(
+        [
+            venue("late", deal("Late Night", "10 PM", "2 AM", "Sunday")),
+            venue("happy", deal("Happy Hour", "4:00 PM", "6:30 PM", "Mon", "Tue")),
+        ]
+    )
+
+    assert index.active_ids(at(6, 23)) == ["late:0"]  # Sunday 23:00
+    assert index.active_ids(at(0, 1, 59)) == ["late:0"]  # Monday 01:59, wrapped
+    assert index.active_ids(at(0, 2)) == []  # end is exclusive
+    assert index.active_ids(at(5, 23)) == []  # Saturday night
+    assert index.active_ids(at(1, 18, 29)) == ["happy:0"]  # partial slot 18:15-18:30
+    assert index.active_ids(at(1, 18, 30)) == []
+    assert index.active_ids(at(0, 17), venue_ids=["late"]) == []
+
+
+def test_document_time_frames_apply_to_every_deal():
+    time_frame = [{"start_time": "4:00 PM", "end_time": "7:00 PM", "days": ["Monday"]}]
+    windows = document_windows(time_frame)
+    doc = venue("doc", {"name": "Beer"}, {"name": "Wings"}, time_windows=windows)
+    index = ActiveDealIndex.from_venues([doc])
+
+    assert index.active_ids(at(0, 17)) == ["doc:0", "doc:1"]
+    assert index.active_ids(at(1, 17)) == []
+
+
+def test_replacing_a_venue_drops_its_old_deals():
+    index = ActiveDealIndex()
+    index.add_venue(venue("v", deal("Old", "4 PM", "6 PM")))
+    index.add_venue(venue("v", deal("New", "8 PM", "9 PM")))
+
+    assert index.active(at(2, 17)) == []
+    assert [deal["name"] for _, _, deal in index.active(at(2, 20, 30))] == ["New"]
+    assert len(index) == 1
+
+
+def test_minute_of_week_converts_aware_and_epoch_times():
+    assert minute_of_week(at(2, 17, 5)) == 2 * MINUTES_PER_DAY + 17 * 60 + 5
+    utc_noon = datetime(2026, 10, 12, 12, tzinfo=timezone.utc)
+    assert minute_of_week(utc_noon, tz=timezone.utc) == 12 * 60
+    assert minute_of_week(utc_noon.timestamp(), tz=timezone.utc) == 12 * 60
+
+
+def test_active_deals_endpoint(make_uploader, api_client, monkeypatch):
+    import src.venue_search as venue_search
+
+    search = venue_search.VenueSearch(
+        [
+            venue("late", deal("Late Night", "10 PM", "2 AM", "Sunday"),
+                  latitude=33.77, longitude=-118.19),
+            venue("far", deal("Far Late", "10 PM", "2 AM", "Sunday"),
+                  latitude=34.5, longitude=-118.19),
+        ]
+    )
+    search.built_at = float("inf")  # never due for a rebuild
+    monkeypatch.setitem(venue_search._searches, "final_schema", search)
+    client = api_client(make_uploader())
+
+    body = client.get("/active-deals?at=2026-10-12T01:00:00").get_json()
+    assert sorted(d["deal_id"] for d in body["data"]) == ["far:0", "late:0"]
+    nearby = client.get(
+        "/active-deals?at=2026-10-12T01:00:00&lat=33.77&lon=-118.19&radius=1000&fields=name"
+    ).get_json()
+    assert nearby["data"] == [{"name": "Late Night"}]
+    assert client.get("/active-deals?at=someday").status_code == 400
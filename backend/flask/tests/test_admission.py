@@ -0,0 +1,125 @@
+import io
+import time
+
+import pytest
+from helpers import encode_image
+from src.admission import (
+    AdmissionController,
+    CircuitBreaker,
+    CircuitOpen,
+    Overloaded,
+    RateLimited,
+    TokenBucket,
+)
+from src.fakes import FakeGenerativeModel, Faults
+from src.vision_parser import VisionMenuParser
+
+
+def test_token_bucket_spends_its_burst_then_refuses():
+    bucket = TokenBucket(rate=0.01, burst=2)
+
+    assert bucket.reserve(timeout=0) == 0
+    assert bucket.reserve(timeout=0) == 0
+    assert bucket.reserve(timeout=0) is None
+    assert bucket.wait_time() > 90
+    # A long enough timeout takes a reservation due in the future
+    assert bucket.reserve(timeout=1000) > 90
+
+
+def test_in_flight_cap_sheds_when_nobody_may_wait():
+    admission = AdmissionController(max_concurrent=1, max_waiting=0)
+
+    with admission.slot():
+        assert admission.in_flight == 1
+        with pytest.raises(Overloaded) as refused:
+            admission.check()
+        assert refused.value.status == 503
+        with pytest.raises(Overloaded):
+            with admission.slot():
+                pass
+    assert admission.in_flight == 0
+    admission.check()
+
+
+def test_waiting_for_a_slot_times_out():
+    admission = AdmissionController(max_concurrent=1, max_waiting=1, queue_timeout=0.05)
+
+    with admission.slot():
+        started = time.monotonic()
+        with pytest.raises(Overloaded, match="Timed out"):
+            with admission.slot():
+                pass
+        assert time.monotonic() - started >= 0.05
+    assert admission.waiting == 0
+
+
+def test_rate_limit_is_a_429_with_the_wait():
+    admission = AdmissionController(rate=0.01, burst=1, queue_timeout=0.1)
+
+    with admission.slot():
+        pass
+    with pytest.raises(RateLimited) as limited:
+        admission.check()
+    assert limited.value.status == 429
+    assert limited.value.retry_after > 90
+    with pytest.raises(RateLimited):
+        with admission.slot():
+            pass
+
+
+def test_breaker_opens_on_transient_failures_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    admission = AdmissionController(breaker=breaker)
+
+    # Errors that are not the service's fault do not count
+    with pytest.raises(ValueError):
+        with admission.slot():
+            raise ValueError("bad input")
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with admission.slot():
+                raise ConnectionError("unavailable")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        admission.check()
+
+    time.sleep(0.06)
+    with admission.slot():
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpen):
+            with admission.slot():
+                pass
+    assert breaker.state == "closed"
+
+
+def test_parser_fails_fast_once_the_circuit_opens(monkeypatch):
+    monkeypatch.setenv("GEMINI_MAX_ATTEMPTS", "2")
+    faults = Faults(failure_rate=1.0)
+    admission = AdmissionController(breaker=CircuitBreaker(failure_threshold=2))
+    parser = VisionMenuParser(
+        model=FakeGenerativeModel(faults=faults), cache=None, admission=admission
+    )
+
+    assert parser.parse_deal(encode_image())["error"]
+    assert faults.calls == 2
+    with pytest.raises(CircuitOpen):
+        parser.parse_deal(encode_image(color=(0, 0, 200)))
+    assert faults.calls == 2
+
+
+def test_upload_is_shed_with_retry_after(make_uploader, api_client):
+    uploader = make_uploader()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    uploader.parser.admission = AdmissionController(breaker=breaker)
+    client = api_client(uploader)
+
+    response = client.post(
+        "/upload-deal",
+        data={"image": (io.BytesIO(encode_image()), "menu.jpg")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) == 30
+    assert response.get_json()["retry_after"] > 29
+    assert list(uploader.db.collection("final_schema").stream()) == []
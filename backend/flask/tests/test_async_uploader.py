@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from helpers import encode_image
+from src.async_uploader import AsyncFirebaseUploader
+from src.fakes import FakeAsyncFirestore
+from src.firebase_uploader import DuplicateImage
+
+
+def async_pair(make_uploader, **env):
+    uploader = make_uploader(**env)
+    return uploader, AsyncFirebaseUploader(uploader, db=FakeAsyncFirestore(uploader.db))
+
+
+def test_async_upload_matches_the_sync_document(make_uploader):
+    uploader, async_uploader = async_pair(make_uploader, VENUE_RESOLVE_ENABLED=0)
+    image = encode_image()
+
+    doc_id, data = asyncio.run(async_uploader.create_deal(image, filename="menu.jpg"))
+
+    stored = uploader.get_restaurant(doc_id)
+    assert stored == {"id": doc_id, **data}
+    assert stored["metadata"]["image_hashes"]
+    with pytest.raises(DuplicateImage) as duplicate:
+        uploader.create_deal(image, filename="menu.jpg", reject_duplicates=True)
+    assert duplicate.value.doc_id == doc_id
+
+
+def test_async_reads_share_the_sync_document_cache(make_uploader):
+    uploader, async_uploader = async_pair(make_uploader)
+    uploader.db.collection("final_schema").document("v1").set({"venue_name": "Taproom"})
+
+    first = asyncio.run(async_uploader.get_restaurant("v1"))
+    # Cached by the async read: the sync path no longer needs Firestore
+    uploader.db.collection("final_schema").document("v1").delete()
+    assert uploader.local_restaurant("v1") == first == {"id": "v1", "venue_name": "Taproom"}
+
+
+def test_async_update_stamps_updated_at(make_uploader):
+    uploader, async_uploader = async_pair(make_uploader)
+    uploader.db.collection("final_schema").document("v1").set(
+        {"venue_name": "Taproom", "metadata": {"uploaded_at": "2026-01-01T00:00:00"}}
+    )
+
+    asyncio.run(async_uploader.update_deal("v1", {"venue_name": "The Taproom"}))
+
+    stored = uploader.db.collection("final_schema").document("v1").get().to_dict()
+    assert stored["venue_name"] == "The Taproom"
+    assert stored["metadata"]["uploaded_at"] == "2026-01-01T00:00:00"
+    assert stored["metadata"]["updated_at"]
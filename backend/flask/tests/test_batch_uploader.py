@@ -0,0 +1,101 @@
+from helpers import encode_image
+from src.fakes import Faults
+
+
+def write_images(tmp_path, colors):
+    paths = []
+    for i, color in enumerate(colors):
+        path = tmp_path / f"menu_{i}.jpg"
+        path.write_bytes(encode_image(size=(96, 64), color=color))
+        paths.append(str(path))
+    return paths
+
+
+def test_failed_parse_leaves_nothing_in_storage(make_uploader, tmp_path):
+    uploader = make_uploader(GEMINI_MAX_ATTEMPTS=2)
+    faults = uploader.parser.model.faults = Faults(failure_rate=1.0)
+    paths = write_images(tmp_path, [(200, 40, 40)])
+
+    results = uploader.batch_upload(paths, base_delay=0.01, progress=lambda *args: None)
+
+    assert [r["status"] for r in results] == ["failed"]
+    assert uploader.bucket.objects == {}
+    # Transient Gemini errors are retried by the parser only, not again per engine attempt
+    assert faults.calls == 2
+
+
+def test_reupload_is_reported_as_duplicate(make_uploader, tmp_path):
+    uploader = make_uploader(VENUE_RESOLVE_ENABLED=0)
+    paths = write_images(tmp_path, [(200, 40, 40)])
+    first = uploader.batch_upload(paths, progress=lambda *args: None)
+    assert first[0]["status"] == "success"
+
+    uploader.parser.model.faults = faults = Faults()
+    again = uploader.batch_upload(paths, progress=lambda *args: None)
+
+    assert again == [{"image": paths[0], "id": first[0]["id"], "status": "duplicate"}]
+    assert faults.calls == 0
+    stored = uploader.db.collection("final_schema").document(first[0]["id"]).get().to_dict()
+    assert stored["metadata"]["image_hashes"]
+
+
+def test_menu_of_a_known_venue_merges_into_it(make_uploader, monkeypatch, tmp_path):
+    uploader = make_uploader(IMAGE_DEDUP_ENABLED=0)
+    first = uploader.batch_upload(
+        write_images(tmp_path, [(200, 40, 40)]), progress=lambda *args: None
+    )
+    # Parsed menus carry no address here; resolve every upload to the first venue
+    monkeypatch.setattr(uploader, "match_venue", lambda data, collection: first[0]["id"])
+    second = uploader.batch_upload(
+        write_images(tmp_path, [(40, 40, 200)]), progress=lambda *args: None
+    )
+
+    assert second[0]["id"] == first[0]["id"]
+    docs = list(uploader.db.collection("final_schema").stream())
+    assert len(docs) == 1
+    assert docs[0].to_dict()["metadata"]["upload_count"] == 2
+
+
+def test_checkpoint_resumes_without_reuploading(make_uploader, tmp_path):
+    uploader = make_uploader(IMAGE_DEDUP_ENABLED=0, VENUE_RESOLVE_ENABLED=0)
+    paths = write_images(tmp_path, [(200, 40, 40), (40, 200, 40)])
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    first = uploader.batch_upload(
+        paths[:1], checkpoint_path=checkpoint, progress=lambda *args: None
+    )
+
+    uploader.parser.model.faults = faults = Faults()
+    results = uploader.batch_upload(paths, checkpoint_path=checkpoint, progress=lambda *args: None)
+
+    by_image = {r["image"]: r for r in results}
+    assert by_image[paths[0]] == {"image": paths[0], "id": first[0]["id"], "status": "skipped"}
+    assert by_image[paths[1]]["status"] == "success"
+    assert faults.calls == 1
+    assert len(list(uploader.db.collection("final_schema").stream())) == 2
+
+
+def test_documents_are_committed_in_batches(make_uploader, monkeypatch, tmp_path):
+    uploader = make_uploader(IMAGE_DEDUP_ENABLED=0, VENUE_RESOLVE_ENABLED=0)
+    paths = write_images(tmp_path, [(i * 40, 40, 40) for i in range(5)])
+    commits = []
+    new_batch = uploader.db.batch
+
+    def counted_batch():
+        batch = new_batch()
+        commit = batch.commit
+
+        def counted_commit():
+            commits.append(len(batch._writes))
+            commit()
+
+        batch.commit = counted_commit
+        return batch
+
+    monkeypatch.setattr(uploader.db, "batch", counted_batch)
+
+    results = uploader.batch_upload(paths, batch_size=2, progress=lambda *args: None)
+
+    assert sorted(r["image"] for r in results) == paths
+    assert {r["status"] for r in results} == {"success"}
+    assert len({r["id"] for r in results}) == 5
+    assert sorted(commits) == [1, 2, 2]
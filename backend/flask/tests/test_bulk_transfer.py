@@ -0,0 +1,84 @@
+import json
+import math
+
+import numpy as np
+from src.bulk_transfer import export_snapshot, import_records, load_snapshot, read_records
+from src.fakes import FakeFirestore, Faults
+
+
+def records(count):
+    return [
+        {
+            "venue_id": f"v{i:02d}",
+            "venue_name": f"Venue {i}",
+            "latitude": 33.77 + i * 1e-3,
+            "longitude": -118.19,
+            "deals": [
+                {"name": "Wings", "start_time": "4:00 PM", "end_time": "7:00 PM", "days": ["Mon"]},
+                {"name": "Oysters"},
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def test_import_keeps_record_ids_and_overwrites_on_reseed():
+    db = FakeFirestore()
+    commits = []
+
+    report = import_records(db, records(5), batch_size=2, progress=commits.append)
+    assert (report.documents, report.failed) == (5, 0)
+    assert len(commits) == 3
+
+    import_records(db, records(5))
+    docs = {doc.id: doc.to_dict() for doc in db.collection("final_schema").stream()}
+    assert sorted(docs) == [f"v{i:02d}" for i in range(5)]
+    assert docs["v00"]["metadata"]["extraction_method"] == "bulk_import"
+    assert docs["v00"]["metadata"]["updated_at"]
+
+
+def test_failed_commits_are_counted_not_raised():
+    db = FakeFirestore(faults=Faults(failure_rate=1.0))
+
+    report = import_records(db, records(3), batch_size=2, max_attempts=2, base_delay=0)
+    assert (report.documents, report.failed) == (0, 3)
+    assert db.faults.calls == 4
+
+
+def test_snapshot_holds_columns_and_deal_windows(make_uploader, tmp_path):
+    uploader = make_uploader()
+    venues = records(3)
+    venues[2].pop("latitude")
+    import_records(uploader.db, venues)
+    path = str(tmp_path / "venues.npz")
+
+    report = export_snapshot(uploader, path, page_size=2)
+    assert report.documents == 3 and report.bytes > 0
+
+    snapshot = load_snapshot(path)
+    assert list(snapshot["ids"]) == ["v00", "v01", "v02"]
+    assert math.isnan(snapshot["lat"][2])
+    assert list(snapshot["deal_counts"]) == [2, 2, 2]
+    assert not np.isnat(snapshot["updated_at"]).any()
+    # One Monday 4-7 PM interval per venue; the untimed deal has none
+    assert list(snapshot["window_offsets"]) == [0, 1, 2, 3]
+    assert (snapshot["window_start"][0], snapshot["window_end"][0]) == (960, 1140)
+    assert list(snapshot["window_deal"]) == [0, 0, 0]
+    assert snapshot["documents"][0]["venue_name"] == "Venue 0"
+    assert snapshot["collection"] == "final_schema"
+
+
+def test_snapshot_reimports_under_the_same_ids(make_uploader, tmp_path):
+    uploader = make_uploader()
+    import_records(uploader.db, records(2))
+    path = str(tmp_path / "venues.npz")
+    export_snapshot(uploader, path)
+
+    db = FakeFirestore()
+    # Snapshot documents keep their ID in "id"; no venue_id field is needed
+    import_records(db, read_records(path), id_field=None)
+    assert [doc.id for doc in db.collection("final_schema").stream()] == ["v00", "v01"]
+
+    source = tmp_path / "venues.json"
+    source.write_text(json.dumps(records(1)))
+    assert read_records(str(source))[0]["venue_id"] == "v00"
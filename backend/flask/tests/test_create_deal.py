@@ -0,0 +1,39 @@
+import pytest
+from helpers import encode_image
+
+
+def test_upload_stores_the_image_and_writes_one_document(make_uploader):
+    uploader = make_uploader(VENUE_RESOLVE_ENABLED=0)
+
+    doc_id, data = uploader.create_deal(encode_image(), filename="menu.jpg")
+
+    stored = uploader.db.collection("final_schema").document(doc_id).get().to_dict()
+    assert stored == data
+    assert data["restaurant_name"] == "Fake Taproom"
+    assert data["image_url"].startswith("https://")
+    (name,) = uploader.bucket.objects  # small enough to need no thumbnail
+    assert name.startswith("menu_images/") and name.endswith("_menu.jpg")
+    assert name in data["image_url"]
+
+
+def test_parse_failure_removes_the_stored_image(make_uploader, monkeypatch):
+    uploader = make_uploader()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(uploader.parser, "parse_deal", fail)
+    with pytest.raises(RuntimeError):
+        uploader.create_deal(encode_image(), filename="menu.jpg")
+
+    assert uploader.bucket.objects == {}
+    assert list(uploader.db.collection("final_schema").stream()) == []
+
+
+def test_unreadable_reply_is_stored_as_an_error_document(make_uploader):
+    uploader = make_uploader("no menu here", VENUE_RESOLVE_ENABLED=0)
+
+    doc_id, data = uploader.create_deal(encode_image(), filename="menu.jpg")
+
+    assert data["error"]
+    assert uploader.get_restaurant(doc_id)["error"] == data["error"]
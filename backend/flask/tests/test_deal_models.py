@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from helpers import encode_image
+from src.deal_models import DealValidationError, MenuParsing, frontend_venue
+from src.fakes import SAMPLE_RESULT, FakeGenerativeModel
+from src.vision_parser import VisionMenuParser
+
+
+def test_from_gemini_normalizes_the_ai_shape():
+    menu = MenuParsing.from_gemini(
+        {
+            "restaurant_name": "  Fake Taproom ",
+            "deals": [{"name": "Wings", "price": 8}],
+            "time_frame": [
+                {"start_time": "4 PM", "end_time": "7:00 PM", "days": ["fri", "Monday"]},
+                {"start_time": "9:00 PM", "end_time": "close"},
+            ],
+            "special_conditions": "Dine-in only",
+        }
+    )
+
+    assert menu.restaurant_name == "Fake Taproom"
+    assert menu.deals[0].to_dict() == {"name": "Wings", "price": "8", "description": None}
+    assert menu.time_frame[0].day_names() == ["Monday", "Friday"]
+    assert menu.special_conditions == ["Dine-in only"]
+
+
+def test_every_window_is_kept_with_its_original_strings(monkeypatch):
+    monkeypatch.setenv("DEAL_CLOSING_TIME", "1:00 AM")
+    document = MenuParsing.from_gemini(
+        {
+            "deals": [{"name": "Wings", "price": "$8"}],
+            "time_frame": [
+                {"start_time": "4 PM", "end_time": "7pm", "days": ["Monday-Friday"]},
+                {"start_time": "9:00 PM", "end_time": "close", "days": ["Weekends"]},
+                {"start_time": "after the game", "end_time": "?", "days": ["Game days"]},
+            ],
+        }
+    ).to_document()
+
+    happy, late, unreadable = document["time_frame"]
+    assert happy == {
+        "start_time": "4 PM",
+        "end_time": "7pm",
+        "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+        "start_minute": 960,
+        "end_minute": 1140,
+    }
+    assert (late["end_time"], late["end_minute"], late["days"]) == (
+        "close",
+        60,
+        ["Saturday", "Sunday"],
+    )
+    assert unreadable == {
+        "start_time": "after the game",
+        "end_time": "?",
+        "days": ["Game days"],
+        "start_minute": None,
+        "end_minute": None,
+    }
+    # 5 weekday windows, Saturday night and Sunday night split at the week
+    # boundary; the unreadable one has no interval
+    assert len(document["time_windows"]) == 8
+    # Stored documents read back unchanged, unreadable windows included
+    assert MenuParsing.from_gemini(document).to_document() == document
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"deals": {"name": "Wings"}},
+        {"deals": [{"price": "$8"}]},
+        {"deals": ["Wings"]},
+        {"restaurant_name": ["Fake Taproom"]},
+    ],
+)
+def test_from_gemini_rejects_off_schema_output(data):
+    with pytest.raises(DealValidationError):
+        MenuParsing.from_gemini(data)
+
+
+def test_to_document_stores_minutes_and_week_windows():
+    document = MenuParsing.from_gemini(SAMPLE_RESULT).to_document()
+
+    window = document["time_frame"][0]
+    assert (window["start_time"], window["end_time"]) == ("4:00 PM", "7:00 PM")
+    assert (window["start_minute"], window["end_minute"]) == (960, 1140)
+    assert document["time_windows"][0] == {"start": 960, "end": 1140}
+    assert len(document["time_windows"]) == 5
+    # A stored document reads back to the same document
+    assert MenuParsing.from_gemini(document).to_document() == document
+
+
+def test_merge_keeps_first_name_and_drops_repeats():
+    first = MenuParsing.from_gemini(
+        {"deals": [{"name": "Wings", "price": "$8"}], "special_conditions": ["Dine-in only"]}
+    )
+    second = MenuParsing.from_gemini(
+        {
+            "restaurant_name": "Fake Taproom",
+            "deals": [{"name": "wings", "price": "$8"}, {"name": "Nachos", "price": "$6"}],
+            "time_frame": [{"start_time": "4:00 PM", "end_time": "7:00 PM"}],
+            "special_conditions": ["dine-in only"],
+        }
+    )
+
+    merged = MenuParsing.merge([first, second])
+    assert merged.restaurant_name == "Fake Taproom"
+    assert [deal.name for deal in merged.deals] == ["Wings", "Nachos"]
+    assert len(merged.time_frame) == 1
+    assert merged.special_conditions == ["Dine-in only"]
+
+
+def test_frontend_deals_are_flattened_per_window():
+    menu = MenuParsing.from_gemini(SAMPLE_RESULT)
+    deals = menu.to_frontend_deals()
+
+    assert len(deals) == len(menu.deals) * len(menu.time_frame)
+    assert deals[0]["start_time"] == "4:00 PM"
+    assert deals[0]["days"] == ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+    venue = frontend_venue({**SAMPLE_RESULT, "latitude": 33.77}, venue_id="v1")
+    assert venue["venue_id"] == "v1"
+    assert venue["venue_name"] == "Fake Taproom"
+    assert venue["deals"] == deals
+
+
+def test_parser_reports_schema_errors():
+    model = FakeGenerativeModel(json.dumps({"deals": "Wings"}))
+    parser = VisionMenuParser(model=model, cache=None, admission=None)
+
+    result = parser.parse_deal(encode_image())
+    assert result["error"].startswith("Schema validation error")
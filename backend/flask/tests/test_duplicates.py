@@ -0,0 +1,112 @@
+import pytest
+
+from src.firebase_uploader import DuplicateImage
+from src.image_hash import BKTree, DuplicateIndex, dhash, hamming
+from src.fakes import SAMPLE_RESPONSE_TEXT
+from helpers import encode_image
+
+
+def test_bk_tree_search_matches_brute_force():
+    import random
+
+    rng = random.Random(7)
+    tree = BKTree()
+    values = [rng.getrandbits(64) for _ in range(500)]
+    for i, value in enumerate(values):
+        tree.add(value, f"doc{i}")
+    probe = values[42] ^ 0b1011  # 3 bits off
+    expected = sorted(
+        (hamming(probe, value), f"doc{i}")
+        for i, value in enumerate(values)
+        if hamming(probe, value) <= 6
+    )
+    assert tree.search(probe, 6) == expected
+    assert tree.search(probe, 6)[0] == (3, "doc42")
+
+
+def test_recompressed_copy_is_within_threshold():
+    original = encode_image(size=(320, 240), quality=95)
+    recompressed = encode_image(size=(320, 240), quality=30)
+    assert hamming(dhash(original), dhash(recompressed)) <= DuplicateIndex().max_distance
+
+
+def test_reupload_returns_existing_document(make_uploader):
+    uploader = make_uploader(VENUE_RESOLVE_ENABLED=0)
+    image = encode_image(size=(320, 240))
+    doc_id, _ = uploader.create_deal(image, filename="menu.jpg")
+
+    with pytest.raises(DuplicateImage) as found:
+        uploader.create_deal(image, filename="again.jpg", reject_duplicates=True)
+    assert found.value.doc_id == doc_id
+
+
+def test_failed_parse_is_not_a_duplicate_target(make_uploader):
+    uploader = make_uploader("this is not json", VENUE_RESOLVE_ENABLED=0)
+    image = encode_image(size=(320, 240))
+    failed_id, failed = uploader.create_deal(image, filename="menu.jpg")
+    assert failed["error"]
+    assert len(uploader.dedupe) == 0
+
+    # The retry reaches Gemini again instead of being answered with the broken document
+    uploader.parser.model.response_text = SAMPLE_RESPONSE_TEXT
+    doc_id, data = uploader.create_deal(image, filename="menu.jpg", reject_duplicates=True)
+    assert doc_id != failed_id
+    assert not data.get("error")
+
+
+def test_failed_parse_is_not_indexed_on_the_async_path(make_uploader):
+    import asyncio
+
+    from src.fakes import FakeAsyncFirestore
+    from src.async_uploader import AsyncFirebaseUploader
+
+    uploader = make_uploader("this is not json", VENUE_RESOLVE_ENABLED=0)
+    async_uploader = AsyncFirebaseUploader(uploader, db=FakeAsyncFirestore(uploader.db))
+    _, failed = asyncio.run(async_uploader.create_deal(encode_image(), filename="menu.jpg"))
+    assert failed["error"]
+    assert len(uploader.dedupe) == 0
+
+
+def test_index_journal_survives_restart_and_shared_writers(tmp_path):
+    path = str(tmp_path / "hashes.jsonl")
+    first = DuplicateIndex(path=path)
+    second = DuplicateIndex(path=path)  # another worker on the same file
+    first.add(0xFF00FF00FF00FF00, "doc-a")
+    second.add(0x0123456789ABCDEF, "doc-b")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["00ff')  # torn write from a crash
+
+    reloaded = DuplicateIndex(path=path)
+    assert len(reloaded) == 2
+    assert reloaded.find(0xFF00FF00FF00FF01) == [(1, "doc-a")]
+    assert reloaded.find(0x0123456789ABCDEF) == [(0, "doc-b")]
+
+
+def test_backfill_compacts_the_journal(tmp_path):
+    path = tmp_path / "hashes.jsonl"
+    index = DuplicateIndex(path=str(path))
+    index.add(0x1, "doc-a")
+    index.add(0x1, "doc-b")  # same hash re-pointed
+    added = index.backfill([{"id": "doc-c", "metadata": {"image_hashes": ["ffffffffffffff00"]}}])
+
+    assert added == 1
+    assert len(path.read_text().splitlines()) == 2
+    assert DuplicateIndex(path=str(path)).find(0x1) == [(0, "doc-b")]
+
+
+def test_compaction_keeps_other_workers_appends(tmp_path):
+    path = str(tmp_path / "hashes.jsonl")
+    first = DuplicateIndex(path=path)
+    second = DuplicateIndex(path=path)
+    second.add(0x0123456789ABCDEF, "doc-b")
+    # Picked up from the journal without a restart
+    assert first.find(0x0123456789ABCDEF) == [(0, "doc-b")]
+
+    second.add(0xFF00FF00FF00FF00, "doc-c")  # not yet seen by first
+    first.backfill([{"id": "doc-a", "metadata": {"image_hashes": ["ffffffffffffff00"]}}])
+
+    reloaded = DuplicateIndex(path=path)
+    assert len(reloaded) == 3
+    assert reloaded.find(0xFF00FF00FF00FF00) == [(0, "doc-c")]
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
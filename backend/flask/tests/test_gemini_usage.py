@@ -0,0 +1,77 @@
+import PIL.Image
+from helpers import encode_image
+from src.fakes import FakeGenerativeModel, FakeResponse
+from src.gemini_usage import (
+    IMAGE_TILE_TOKENS,
+    SMALL_IMAGE_EDGE,
+    UsageTracker,
+    budget_scale,
+    fit_image,
+    image_tokens,
+    usage_from_response,
+)
+from src.vision_parser import VisionMenuParser
+
+
+def test_image_tokens_follow_the_tile_rule():
+    assert image_tokens(384, 384) == IMAGE_TILE_TOKENS
+    assert image_tokens(385, 100) == IMAGE_TILE_TOKENS
+    assert image_tokens(1536, 1000) == 4 * IMAGE_TILE_TOKENS
+    assert image_tokens(3000, 4000) == 4 * 6 * IMAGE_TILE_TOKENS
+
+
+def test_budget_scale_keeps_the_largest_grid_that_fits():
+    assert budget_scale(1000, 1000, 4 * IMAGE_TILE_TOKENS) == 1.0
+    scale = budget_scale(3000, 4000, 6 * IMAGE_TILE_TOKENS)
+    assert image_tokens(int(3000 * scale), int(4000 * scale)) <= 6 * IMAGE_TILE_TOKENS
+    # 2 x 3 tiles of a 3:4 photo: the short edge is the limit
+    assert scale == 2 * 768 / 3000
+    # One tile: a single 768 px tile; under one tile, the small-image size
+    assert budget_scale(3000, 4000, IMAGE_TILE_TOKENS) == 768 / 4000
+    assert budget_scale(3000, 4000, 0) == SMALL_IMAGE_EDGE / 4000
+
+
+def test_fit_image_downscales_only_over_budget():
+    img = PIL.Image.new("RGB", (3000, 4000))
+
+    fitted, tokens = fit_image(img, 6 * IMAGE_TILE_TOKENS)
+    assert tokens <= 6 * IMAGE_TILE_TOKENS
+    assert fitted.size == (1536, 2048)
+    assert fit_image(fitted, 6 * IMAGE_TILE_TOKENS)[0] is fitted
+    same, tokens = fit_image(img, 0)
+    assert same is img and tokens == image_tokens(3000, 4000)
+
+
+def test_usage_tracker_totals_and_means():
+    tracker = UsageTracker()
+    assert tracker.snapshot()["calls"] == 0
+
+    usage = usage_from_response(FakeResponse("x" * 40, prompt_tokens=600))
+    assert usage["prompt_tokens"] == 600
+    assert usage["total_tokens"] == 600 + usage["output_tokens"]
+    for seconds in (0.5, 1.5):
+        tracker.record({**usage, "image_tokens": 258, "model_seconds": seconds})
+
+    snapshot = tracker.snapshot()
+    assert snapshot["calls"] == 2
+    assert snapshot["prompt_tokens"] == 1200
+    assert snapshot["mean_model_seconds"] == 1.0
+    assert snapshot["prompt_overhead_tokens"] == 600 - 258
+    assert usage_from_response(object())["total_tokens"] == 0
+
+
+def test_parser_sends_budgeted_images_and_tracks_each_request():
+    parser = VisionMenuParser(model=FakeGenerativeModel(), cache=None, admission=None)
+    photo = encode_image(size=(1500, 2000))
+
+    with parser.track_usage() as usage:
+        parser.parse_deal(photo, token_budget=2 * IMAGE_TILE_TOKENS)
+    request = usage.snapshot()
+    assert request["calls"] == 1
+    assert request["image_tokens"] <= 2 * IMAGE_TILE_TOKENS
+    # The fake counts the image actually sent: the downscaled one
+    assert request["prompt_tokens"] < image_tokens(1500, 2000)
+
+    parser.parse_deal(encode_image(color=(0, 0, 200)))
+    assert parser.usage.snapshot()["calls"] == 2
+    assert usage.snapshot()["calls"] == 1
@@ -0,0 +1,78 @@
+import numpy as np
+from src.geo_index import GeoIndex, haversine_m, top_k
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 33.7 + rng.random(n) * 0.2, -118.3 + rng.random(n) * 0.2
+
+
+def brute_force(lats, lons, lat, lon, radius_m):
+    distances = haversine_m(lat, lon, np.asarray(lats), np.asarray(lons))
+    return set(np.flatnonzero(distances <= radius_m).tolist())
+
+
+def test_haversine_matches_a_known_distance():
+    # One degree of latitude is about 111.2 km
+    (meters,) = haversine_m(0.0, 0.0, np.array([1.0]), np.array([0.0]))
+    assert abs(meters - 111195) < 10
+
+
+def test_within_matches_brute_force_across_cells():
+    lats, lons = random_points(2000)
+    index = GeoIndex(cell_deg=0.01).build(lats, lons)
+    for lat, lon, radius in [(33.8, -118.2, 500), (33.75, -118.25, 3000), (33.8, -118.2, 50000)]:
+        found, distances = index.within(lat, lon, radius)
+        assert set(found.tolist()) == brute_force(lats, lons, lat, lon, radius)
+        assert (distances <= radius).all()
+
+
+def test_added_points_are_found_before_and_after_the_tail_is_folded():
+    lats, lons = random_points(100)
+    index = GeoIndex(cell_deg=0.01, rebuild_threshold=8).build(lats[:50], lons[:50])
+    for i in range(50, 100):
+        assert index.add(lats[i], lons[i]) == i
+        if i in (53, 99):  # tail in use, then folded in
+            found, _ = index.within(33.8, -118.2, 8000)
+            expected = brute_force(lats[: i + 1], lons[: i + 1], 33.8, -118.2, 8000)
+            assert set(found.tolist()) == expected
+    assert len(index) == 100
+
+
+def test_nearest_is_ordered_and_capped():
+    lats, lons = random_points(500, seed=1)
+    index = GeoIndex().build(lats, lons)
+    found, distances = index.nearest(33.8, -118.2, 10000, k=5)
+    assert len(found) == 5
+    assert (np.diff(distances) >= 0).all()
+    everything = np.sort(haversine_m(33.8, -118.2, lats, lons))
+    assert np.allclose(distances, everything[:5])
+
+
+def test_top_k_and_empty_index():
+    indices, distances = top_k(np.array([7, 8, 9]), np.array([3.0, 1.0, 2.0]), 2)
+    assert indices.tolist() == [8, 9] and distances.tolist() == [1.0, 2.0]
+    found, _ = GeoIndex().within(0, 0, 1000)
+    assert len(found) == 0
+
+
+def test_search_endpoint_validates_and_ranks(make_uploader, api_client, monkeypatch):
+    import src.venue_search as venue_search
+
+    search = venue_search.VenueSearch(
+        [
+            {"venue_id": "far", "venue_name": "Far Bar", "latitude": 33.78, "longitude": -118.19},
+            {"venue_id": "near", "venue_name": "Near", "latitude": 33.7701, "longitude": -118.19},
+        ]
+    )
+    search.built_at = float("inf")  # never due for a rebuild
+    monkeypatch.setitem(venue_search._searches, "final_schema", search)
+    client = api_client(make_uploader())
+
+    assert client.get("/search-restaurants-by-name?lat=33.77").status_code == 400
+    bad_radius = client.get("/search-restaurants-by-name?lat=33.77&lon=-118.19&radius=-1")
+    assert bad_radius.status_code == 400
+
+    body = client.get("/search-restaurants-by-name?lat=33.77&lon=-118.19&radius=2000").get_json()
+    assert [v["venue_id"] for v in body["data"]] == ["near", "far"]
+    assert body["data"][0]["distance_meters"] < body["data"][1]["distance_meters"]
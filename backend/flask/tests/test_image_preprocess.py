@@ -0,0 +1,34 @@
+import io
+
+import PIL.Image
+
+from src.image_preprocess import EXIF_ORIENTATION, ImagePreprocessor
+from helpers import encode_image
+
+
+def test_compact_upright_jpeg_is_kept_byte_for_byte():
+    original = encode_image(size=(640, 480), quality=20)
+    result = ImagePreprocessor(max_edge=2048, quality=85).process(original, "menu.jpg")
+
+    assert result.data == original
+    assert result.filename == "menu.jpg"
+    assert result.bytes_saved == 0
+
+
+def test_oversized_image_is_downscaled_and_reencoded():
+    original = encode_image(size=(3000, 1000), quality=95)
+    result = ImagePreprocessor(max_edge=1024).process(original, "menu.png")
+
+    assert (result.width, result.height) == (1024, 341)
+    assert result.filename == "menu.jpg"
+    assert result.content_type == "image/jpeg"
+
+
+def test_exif_orientation_is_applied():
+    exif = PIL.Image.Exif()
+    exif[EXIF_ORIENTATION] = 6  # rotate 90 degrees clockwise
+    original = encode_image(size=(80, 40), quality=20, exif=exif.tobytes())
+    result = ImagePreprocessor().process(original, "sideways.jpg")
+
+    assert (result.width, result.height) == (40, 80)
+    assert PIL.Image.open(io.BytesIO(result.data)).size == (40, 80)
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from src.image_source import (
+    guess_content_type,
+    open_image_stream,
+    read_image_bytes,
+    source_filename,
+)
+
+
+def test_buffers_are_shared_not_copied(tmp_path):
+    data = b"\xff\xd8menu"
+    assert read_image_bytes(data) is data
+
+    buffer = bytearray(data)
+    view = read_image_bytes(buffer)
+    buffer[0] = 0
+    assert view[0] == 0
+
+    stream = io.BytesIO(data)
+    assert bytes(read_image_bytes(stream)) == data
+
+    path = tmp_path / "menu.jpg"
+    path.write_bytes(data)
+    assert read_image_bytes(str(path)) == data
+
+
+def test_file_objects_are_read_from_the_start():
+    class Upload(io.BufferedReader):
+        pass
+
+    upload = Upload(io.BytesIO(b"whole image"))
+    upload.read(5)
+    assert read_image_bytes(upload) == b"whole image"
+    assert open_image_stream(memoryview(b"abc")).read() == b"abc"
+
+
+def test_unsupported_sources_are_rejected():
+    with pytest.raises(TypeError):
+        read_image_bytes(42)
+
+
+def test_filenames_and_content_types():
+    assert source_filename("/tmp/uploads/menu.png") == "menu.png"
+    assert source_filename(b"raw") == "upload.jpg"
+    assert source_filename(io.BytesIO(), default="x.jpg") == "x.jpg"
+    assert guess_content_type("menu.png") == "image/png"
+    assert guess_content_type("menu") == "application/octet-stream"
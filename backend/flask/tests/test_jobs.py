@@ -0,0 +1,103 @@
+import io
+import threading
+import time
+
+import pytest
+from helpers import encode_image
+from src.jobs import FAILED, SUCCEEDED, InMemoryJobStore, JobQueue, JobQueueFull
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_record_results_and_errors():
+    queue = JobQueue(workers=2)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    done = wait_for(queue, queue.submit(lambda x: x * 2, 21))
+    failed = wait_for(queue, queue.submit(fail))
+
+    assert (done["status"], done["result"]) == (SUCCEEDED, 42)
+    assert done["started_at"] <= done["finished_at"]
+    assert (failed["status"], failed["error"]) == (FAILED, "boom")
+
+
+def test_submit_refuses_when_the_queue_is_full():
+    queue = JobQueue(workers=1, max_queued=1)
+    release = threading.Event()
+    running = queue.submit(release.wait)
+    while queue.get(running)["status"] != "running":
+        time.sleep(0.01)
+    queue.submit(lambda: None)  # waits in the queue
+
+    with pytest.raises(JobQueueFull):
+        queue.submit(lambda: None)
+    release.set()
+    assert wait_for(queue, running)["status"] == SUCCEEDED
+
+
+def test_finished_jobs_expire():
+    store = InMemoryJobStore(ttl=0)
+    store.put({"id": "old", "finished_at": time.time() - 1})
+    store.put({"id": "new", "finished_at": None})
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+
+def test_async_upload_returns_a_job_to_poll(make_uploader, api_client):
+    client = api_client(make_uploader())
+
+    response = client.post(
+        "/upload-deal",
+        data={"image": (io.BytesIO(encode_image()), "menu.jpg"), "async": "1"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+    assert response.headers["Location"].endswith(status_url)
+
+    deadline = time.monotonic() + 5
+    while True:
+        job = client.get(status_url).get_json()["job"]
+        if job["status"] == SUCCEEDED or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert job["status"] == SUCCEEDED
+    assert job["result"]["data"]["restaurant_name"] == "Fake Taproom"
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_async_upload_waits_out_overload(make_uploader, api_client, monkeypatch):
+    import endpoints.routes as routes
+    from src.admission import Overloaded
+
+    uploader = make_uploader()
+    refusals = []
+
+    def check_admission():
+        if len(refusals) < 2:
+            refusals.append(1)
+            raise Overloaded("Gemini is busy", retry_after=0)
+
+    monkeypatch.setattr(uploader, "check_admission", check_admission)
+    client = api_client(uploader)
+
+    response = client.post(
+        "/upload-deal?async=1",
+        data={"image": (io.BytesIO(encode_image()), "menu.jpg")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 202
+
+    job = wait_for(routes.job_queue, response.get_json()["job_id"])
+    assert job["status"] == SUCCEEDED
+    assert len(refusals) == 2
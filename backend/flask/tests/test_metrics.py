@@ -0,0 +1,61 @@
+import pytest
+from src import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty metric registry, so test metrics never reach /metrics"""
+    monkeypatch.setattr(metrics, "_registry", [])
+
+
+def test_counter_splits_by_labels(registry):
+    counter = metrics.Counter("things_total", "Things", ["kind"])
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    counter.inc(kind='b"\n')
+
+    assert counter.value(kind="a") == 3
+    assert counter.value(kind="missing") == 0
+    text = metrics.render()
+    assert "# TYPE happymapper_things_total counter" in text
+    assert 'happymapper_things_total{kind="a"} 3' in text
+    assert 'happymapper_things_total{kind="b\\"\\n"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.count() == 4
+    assert histogram.sum() == pytest.approx(6.05)
+    lines = metrics.render().splitlines()
+    assert 'happymapper_wait_seconds_bucket{le="0.1"} 1' in lines
+    assert 'happymapper_wait_seconds_bucket{le="1"} 3' in lines
+    assert 'happymapper_wait_seconds_bucket{le="+Inf"} 4' in lines
+    assert "happymapper_wait_seconds_count 4" in lines
+
+
+def test_span_times_the_block_and_counts_failures():
+    before = metrics.STAGE_SECONDS.count(stage="test_span")
+    errors = metrics.STAGE_ERRORS.value(stage="test_span")
+    with metrics.span("test_span"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("test_span"):
+            raise ValueError("boom")
+
+    assert metrics.STAGE_SECONDS.count(stage="test_span") == before + 2
+    assert metrics.STAGE_ERRORS.value(stage="test_span") == errors + 1
+
+
+def test_metrics_endpoint_counts_requests_by_route(make_uploader, api_client):
+    client = api_client(make_uploader())
+    before = metrics.REQUESTS.value(endpoint="/health", method="GET", status="200")
+    client.get("/health")
+
+    response = client.get("/metrics")
+    assert response.content_type == metrics.CONTENT_TYPE
+    assert metrics.REQUESTS.value(endpoint="/health", method="GET", status="200") == before + 1
+    line = 'happymapper_http_requests_total{endpoint="/health",method="GET",status="200"} '
+    assert line + str(before + 1) in response.get_data(as_text=True)
@@ -0,0 +1,83 @@
+import io
+import itertools
+import json
+
+from helpers import encode_image
+from src.fakes import FakeGenerativeModel, Faults
+from src.vision_parser import VisionMenuParser
+
+COLORS = [(200, 40, 40), (40, 200, 40), (40, 40, 200)]
+
+_specials = itertools.count()
+
+
+def reply_per_batch(contents):
+    """One distinct deal per image in the request, plus one shared by every batch"""
+    images = [part for part in contents if not isinstance(part, str)]
+    deals = [{"name": "Wings", "price": "$8"}]
+    deals += [{"name": f"Special {next(_specials)}", "price": "$5"} for _ in images]
+    return json.dumps({"restaurant_name": "Fake Taproom", "deals": deals})
+
+
+def test_one_request_covers_a_batch_of_images():
+    faults = Faults()
+    parser = VisionMenuParser(
+        model=FakeGenerativeModel(reply_per_batch, faults), cache=None, admission=None
+    )
+
+    data = parser.parse_deals([encode_image(color=c) for c in COLORS])
+    assert faults.calls == 1
+    assert len(data["deals"]) == 4
+
+
+def test_larger_sets_are_split_and_merged():
+    faults = Faults()
+    parser = VisionMenuParser(
+        model=FakeGenerativeModel(reply_per_batch, faults),
+        cache=None,
+        admission=None,
+        batch_size=2,
+    )
+
+    data = parser.parse_deals([encode_image(color=c) for c in COLORS])
+    assert faults.calls == 2
+    # The deal both batches report is kept once
+    assert [deal["name"] for deal in data["deals"]].count("Wings") == 1
+    assert len(data["deals"]) == 4
+
+
+def test_combined_deal_is_one_document_with_every_photo(make_uploader):
+    uploader = make_uploader(VENUE_RESOLVE_ENABLED=0)
+    images = [encode_image(color=c) for c in COLORS]
+
+    doc_id, data = uploader.create_combined_deal(
+        images, filenames=["a.jpg", "b.jpg", "c.jpg"]
+    )
+
+    assert [doc.id for doc in uploader.db.collection("final_schema").stream()] == [doc_id]
+    assert len(data["image_urls"]) == 3
+    assert data["image_url"] == data["image_urls"][0]
+    assert data["metadata"]["image_filenames"] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert len(data["metadata"]["image_hashes"]) == 3
+    assert len(uploader.bucket.objects) == 3
+
+
+def test_upload_endpoint_combines_repeated_image_parts(make_uploader, api_client):
+    uploader = make_uploader(VENUE_RESOLVE_ENABLED=0, UPLOAD_MAX_IMAGES=2)
+    client = api_client(uploader)
+
+    def form(count):
+        return {
+            "image": [
+                (io.BytesIO(encode_image(color=c)), f"menu{i}.jpg")
+                for i, c in enumerate(COLORS[:count])
+            ]
+        }
+
+    response = client.post("/upload-deal", data=form(2), content_type="multipart/form-data")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["data"]["image_urls"]) == 2
+
+    too_many = client.post("/upload-deal", data=form(3), content_type="multipart/form-data")
+    assert too_many.status_code == 400
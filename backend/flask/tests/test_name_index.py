@@ -0,0 +1,72 @@
+import numpy as np
+import src.name_index as name_index
+from src.name_index import TrigramIndex, normalize_name, trigrams
+from src.venue_search import VenueSearch
+
+NAMES = ["Starbucks Coffee", "Star Bar", "Café Olé", "The Blue Whale", "Bluewater Grill"]
+
+
+def test_names_are_normalized_before_trigrams():
+    assert normalize_name("  Café  Olé!! ") == "cafe ole"
+    assert normalize_name(None) == ""
+    assert trigrams("Bar") == {"  b", " ba", "bar", "ar "}
+
+
+def test_search_ranks_exact_and_misspelled_names():
+    index = TrigramIndex.from_names(enumerate(NAMES))
+    assert index.search("starbucks")[0][0] == 0
+    assert index.search("starbuks coffee")[0][0] == 0
+    assert index.search("cafe ole") == [(2, 1.0)]
+    assert index.search("zzz") == []
+
+
+def test_score_paths_agree(monkeypatch):
+    index = TrigramIndex.from_names(enumerate(NAMES))
+    keys = np.arange(len(NAMES))
+    direct = index.score("blue whale", keys)
+    monkeypatch.setattr(name_index, "DIRECT_SCORE_LIMIT", 0)
+    assert np.allclose(index.score("blue whale", keys), direct)
+    keys_found, scores = index.match("blue whale", threshold=0.0)
+    assert np.allclose(scores, direct[keys_found])
+
+
+def test_add_and_remove_match_a_bulk_build():
+    index = TrigramIndex()
+    for key, name in enumerate(NAMES):
+        index.add(key, name)
+    index.add(1, "Moon Bar")
+    index.remove(4)
+
+    rebuilt = TrigramIndex.from_names(
+        [(0, NAMES[0]), (1, "Moon Bar"), (2, NAMES[2]), (3, NAMES[3])]
+    )
+    for query in ("star", "moon bar", "bluewater", "blue whale"):
+        assert index.search(query, threshold=0.1) == rebuilt.search(query, threshold=0.1)
+    assert 4 not in index and len(index) == 4
+
+
+def test_serialized_index_answers_the_same():
+    index = TrigramIndex.from_names(enumerate(NAMES))
+    loaded = TrigramIndex.from_bytes(index.to_bytes())
+    for query in ("star bar", "cafe", "blue"):
+        assert loaded.search(query, threshold=0.1) == index.search(query, threshold=0.1)
+
+
+def test_venue_search_snapshot_round_trip(tmp_path):
+    venues = [
+        {"venue_id": str(i), "venue_name": name, "latitude": 33.77, "longitude": -118.19 + i / 1000}
+        for i, name in enumerate(NAMES)
+    ]
+    search = VenueSearch(venues)
+    search.upsert({**venues[1], "venue_name": "Moon Bar"})
+    path = str(tmp_path / "venues.npz")
+    search.dump(path)
+
+    loaded = VenueSearch.load(path)
+    assert len(loaded.venues) == len(NAMES)
+
+    def ids(index, name):
+        return [v["venue_id"] for v in index.search(33.77, -118.19, 2000, name=name)]
+
+    assert ids(loaded, "moon bar") == ids(search, "moon bar") == ["1"]
+    assert ids(loaded, "starbucks") == ids(search, "starbucks") == ["0"]
@@ -0,0 +1,86 @@
+import gzip
+import json
+import zlib
+
+from src.ndjson_export import accepts_gzip, gzip_chunks, ndjson_chunks
+
+
+def lines(body):
+    return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+
+def seed(uploader, count):
+    for i in range(count):
+        uploader.db.collection("final_schema").document(f"v{i:02d}").set(
+            {
+                "venue_name": f"Venue {i}",
+                "metadata": {"updated_at": f"2026-10-12T00:00:{i:02d}"},
+            }
+        )
+
+
+def test_ndjson_chunks_group_complete_lines():
+    records = ({"n": i} for i in range(5))
+    chunks = list(ndjson_chunks(records, chunk_records=2))
+
+    assert len(chunks) == 3
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert lines(b"".join(chunks)) == [{"n": i} for i in range(5)]
+    assert list(ndjson_chunks([])) == []
+
+
+def test_gzip_chunks_decode_line_by_line():
+    chunks = [b'{"n":0}\n', b'{"n":1}\n']
+    compressed = list(gzip_chunks(iter(chunks)))
+
+    assert gzip.decompress(b"".join(compressed)) == b"".join(chunks)
+    # Each input chunk is flushed, so its lines decode before the stream ends
+    partial = zlib.decompressobj(31).decompress(compressed[0])
+    assert partial == chunks[0]
+
+
+def test_accepts_gzip():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip(None)
+
+
+def test_export_streams_every_venue(make_uploader, api_client):
+    uploader = make_uploader()
+    seed(uploader, 5)
+    client = api_client(uploader)
+
+    response = client.get("/export/venues?page_size=2", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "application/x-ndjson"
+    venues = lines(gzip.decompress(response.data))
+    assert [venue["venue_id"] for venue in venues] == [f"v{i:02d}" for i in range(5)]
+
+    plain = client.get("/export/venues?gzip=0&fields=venue_name")
+    assert "Content-Encoding" not in plain.headers
+    assert lines(plain.data)[0] == {"id": "v00", "venue_name": "Venue 0"}
+
+
+def test_export_resumes_after_a_cursor_and_watermark(make_uploader, api_client):
+    uploader = make_uploader()
+    seed(uploader, 5)
+    client = api_client(uploader)
+
+    after_cursor = lines(client.get("/export/venues?gzip=0&cursor=v02").data)
+    assert [venue["venue_id"] for venue in after_cursor] == ["v03", "v04"]
+
+    since = client.get("/export/venues?gzip=0&since=2026-10-12T00:00:01&fields=venue_name")
+    changed = lines(since.data)
+    assert [venue["venue_name"] for venue in changed] == ["Venue 2", "Venue 3", "Venue 4"]
+    # Lines keep updated_at so a client can resume with since
+    assert changed[0]["metadata"]["updated_at"] == "2026-10-12T00:00:02"
+
+
+def test_export_rejects_bad_parameters(make_uploader, api_client):
+    client = api_client(make_uploader())
+
+    assert client.get("/export/venues?page_size=0").status_code == 400
+    assert client.get("/export/venues?page_size=x").status_code == 400
+    assert client.get("/export/venues?shape=csv").status_code == 400
@@ -0,0 +1,106 @@
+import pytest
+from src.projection import (
+    MAX_FIELDS,
+    UPDATED_AT,
+    apply_updates,
+    document_etag,
+    list_etag,
+    parse_fields,
+    project,
+    select_paths,
+)
+
+DOC = {
+    "id": "v1",
+    "venue_name": "Fake Taproom",
+    "address": {"city": "Long Beach", "street": "12 Main St"},
+    "metadata": {"updated_at": "2026-10-12T18:00:00", "uploaded_at": "2026-10-01T00:00:00"},
+}
+
+
+def test_parse_fields_dedupes_and_validates():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("venue_name, address.city,venue_name") == ["venue_name", "address.city"]
+    for bad in ("address..city", ".venue_name", "__name__"):
+        with pytest.raises(ValueError):
+            parse_fields(bad)
+    with pytest.raises(ValueError):
+        parse_fields(",".join(f"f{i}" for i in range(MAX_FIELDS + 1)))
+
+
+def test_select_paths_add_the_etag_source():
+    assert select_paths(None) is None
+    assert select_paths(["id", "venue_name"]) == ["venue_name", UPDATED_AT]
+    assert select_paths([UPDATED_AT]) == [UPDATED_AT]
+
+
+def test_project_keeps_nested_paths_and_the_id():
+    assert project(DOC, None) is DOC
+    assert project(DOC, ["address.city", "missing", "venue_name.x"]) == {
+        "id": "v1",
+        "address": {"city": "Long Beach"},
+    }
+
+
+def test_apply_updates_sets_dotted_paths_like_firestore():
+    merged = apply_updates(DOC, {"venue_name": "Renamed", UPDATED_AT: "2026-10-13T00:00:00"})
+
+    assert merged["venue_name"] == "Renamed"
+    assert merged["metadata"] == {
+        "updated_at": "2026-10-13T00:00:00",
+        "uploaded_at": "2026-10-01T00:00:00",
+    }
+    assert DOC["metadata"]["updated_at"] == "2026-10-12T18:00:00"
+
+
+def test_etags_follow_version_and_projection():
+    tag = document_etag(DOC)
+    assert document_etag(dict(DOC, venue_name="Same version")) == tag
+    assert document_etag(apply_updates(DOC, {UPDATED_AT: "2026-10-13T00:00:00"})) != tag
+    assert document_etag(DOC, ["venue_name"]) != tag
+
+    unversioned = {"id": "v2", "venue_name": "A"}
+    assert document_etag(unversioned) != document_etag(dict(unversioned, venue_name="B"))
+
+    assert list_etag([DOC]) != list_etag([DOC, unversioned])
+    assert list_etag([DOC], extra="?lat=1") != list_etag([DOC], extra="?lat=2")
+
+
+def test_get_menu_answers_304_until_the_document_changes(make_uploader, api_client):
+    uploader = make_uploader()
+    uploader.db.collection("final_schema").document("v1").set(
+        {key: value for key, value in DOC.items() if key != "id"}
+    )
+    client = api_client(uploader)
+
+    first = client.get("/get-menu/v1?fields=venue_name")
+    assert first.get_json()["data"] == {"id": "v1", "venue_name": "Fake Taproom"}
+    etag = first.headers["ETag"]
+    again = client.get("/get-menu/v1?fields=venue_name", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    # Another projection of the same version is another representation
+    assert client.get("/get-menu/v1", headers={"If-None-Match": etag}).status_code == 200
+
+    uploader.update_deal("v1", {"venue_name": "Renamed"})
+    changed = client.get("/get-menu/v1?fields=venue_name", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.get_json()["data"]["venue_name"] == "Renamed"
+
+    assert client.get("/get-menu/missing").status_code == 404
+    assert client.get("/get-menu/v1?fields=a..b").status_code == 400
+
+
+def test_get_all_menus_etag_covers_every_document(make_uploader, api_client):
+    uploader = make_uploader()
+    for doc_id in ("v1", "v2"):
+        uploader.db.collection("final_schema").document(doc_id).set(
+            {"venue_name": doc_id, "metadata": {"updated_at": "2026-10-12T18:00:00"}}
+        )
+    client = api_client(uploader)
+
+    etag = client.get("/get-all-menus").headers["ETag"]
+    assert client.get("/get-all-menus", headers={"If-None-Match": etag}).status_code == 304
+
+    uploader.update_deal("v2", {"venue_name": "Renamed"})
+    assert client.get("/get-all-menus", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,97 @@
+def seed(uploader, count, collection="final_schema"):
+    for i in range(count):
+        uploader.db.collection(collection).document(f"v{i:02d}").set(
+            {"venue_name": f"Venue {i}", "deals": [{"title": f"Deal {i}"}]}
+        )
+
+
+def test_get_restaurant_is_read_through_cached(make_uploader):
+    uploader = make_uploader()
+    seed(uploader, 1)
+    calls = uploader.db.faults.calls
+
+    first = uploader.get_restaurant("v00")
+    assert uploader.db.faults.calls == calls + 1
+    first["venue_name"] = "mutated"
+    assert uploader.get_restaurant("v00")["venue_name"] == "Venue 0"
+    assert uploader.get_restaurant("v00", fields=["venue_name"]) == {
+        "id": "v00",
+        "venue_name": "Venue 0",
+    }
+    assert uploader.db.faults.calls == calls + 1
+
+
+def test_update_deal_invalidates_the_cached_document(make_uploader):
+    uploader = make_uploader()
+    seed(uploader, 1)
+    uploader.get_restaurant("v00")
+
+    uploader.update_deal("v00", {"venue_name": "Renamed"})
+    assert uploader.get_restaurant("v00")["venue_name"] == "Renamed"
+
+
+def test_upload_merged_into_a_venue_invalidates_it(make_uploader, monkeypatch):
+    from helpers import encode_image
+
+    uploader = make_uploader(IMAGE_DEDUP_ENABLED=0)
+    doc_id = uploader.upload_deal(encode_image())
+    assert "upload_count" not in uploader.get_restaurant(doc_id)["metadata"]
+
+    # Parsed menus carry no address here; resolve the second upload to the first venue
+    monkeypatch.setattr(uploader, "match_venue", lambda data, collection: doc_id)
+    assert uploader.upload_deal(encode_image(color=(0, 0, 200))) == doc_id
+    assert uploader.get_restaurant(doc_id)["metadata"]["upload_count"] == 2
+
+
+def test_cache_disabled_reads_firestore_every_time(make_uploader):
+    uploader = make_uploader(DOC_CACHE_TTL=0)
+    seed(uploader, 1)
+    calls = uploader.db.faults.calls
+
+    uploader.get_restaurant("v00")
+    uploader.get_restaurant("v00")
+    assert uploader.doc_cache is None
+    assert uploader.db.faults.calls == calls + 2
+    assert uploader.get_restaurant("missing") is None
+
+
+def test_iter_restaurants_pages_in_id_order(make_uploader):
+    uploader = make_uploader()
+    seed(uploader, 7)
+    calls = uploader.db.faults.calls
+
+    ids = [doc["id"] for doc in uploader.iter_restaurants(page_size=3)]
+    assert ids == [f"v{i:02d}" for i in range(7)]
+    # Pages of 3, 3 and a short 1 ends the scan
+    assert uploader.db.faults.calls == calls + 3
+
+
+def test_iter_restaurants_resumes_after_a_cursor_with_a_limit(make_uploader):
+    uploader = make_uploader()
+    seed(uploader, 7)
+
+    docs = list(uploader.iter_restaurants(page_size=2, start_after="v02", limit=3))
+    assert [doc["id"] for doc in docs] == ["v03", "v04", "v05"]
+
+
+def test_iter_restaurants_projects_fields(make_uploader):
+    uploader = make_uploader()
+    seed(uploader, 2)
+
+    docs = list(uploader.iter_restaurants(fields=["venue_name"]))
+    assert docs == [{"id": "v00", "venue_name": "Venue 0"}, {"id": "v01", "venue_name": "Venue 1"}]
+
+
+def test_get_all_menus_limits_and_projects(make_uploader, api_client):
+    uploader = make_uploader()
+    seed(uploader, 4)
+    client = api_client(uploader)
+
+    body = client.get("/get-all-menus?limit=2&fields=venue_name").get_json()
+    assert body["count"] == 2
+    assert body["data"] == [
+        {"id": "v00", "venue_name": "Venue 0"},
+        {"id": "v01", "venue_name": "Venue 1"},
+    ]
+    assert client.get("/get-all-menus?limit=0").status_code == 400
+    assert client.get("/get-all-menus?limit=x").status_code == 400
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from src.fakes import SAMPLE_RESULT
+from src.replica import VenueReplica
+
+# Monday 17:30, local time: inside SAMPLE_RESULT's 4-7 PM weekday window
+HAPPY_HOUR = datetime(2026, 10, 12, 17, 30)
+SUNDAY = datetime(2026, 10, 11, 17, 30)
+
+
+def venue(doc_id, name, lat, lon):
+    return {**SAMPLE_RESULT, "id": doc_id, "venue_name": name, "latitude": lat, "longitude": lon}
+
+
+def filled_replica():
+    replica = VenueReplica(":memory:")
+    replica.upsert_many(
+        [
+            venue("near", "Fake Taproom", 33.7700, -118.1900),
+            venue("far", "Fake Taproom", 33.7900, -118.1900),
+            venue("other", "Harbor Grill", 33.7701, -118.1901),
+        ]
+    )
+    return replica
+
+
+def test_within_ranks_by_distance_and_filters_names():
+    replica = filled_replica()
+
+    assert [d["id"] for d in replica.within(33.77, -118.19, 500)] == ["near", "other"]
+    assert [d["id"] for d in replica.within(33.77, -118.19, 5000)] == ["near", "other", "far"]
+
+    named = replica.within(33.77, -118.19, 5000, name="taproom")
+    assert [d["id"] for d in named] == ["near", "far"]
+    assert all(0.3 <= d["match_score"] <= 1 for d in named)
+
+
+def test_active_at_follows_the_time_windows():
+    replica = filled_replica()
+
+    assert replica.active_at(HAPPY_HOUR) == [
+        ("far", 0), ("far", 1), ("near", 0), ("near", 1), ("other", 0), ("other", 1)
+    ]
+    assert replica.active_at(SUNDAY) == []
+
+
+def test_routes_read_from_a_fresh_replica(make_uploader, api_client):
+    from src.venue_search import ReplicaVenueSearch, get_venue_search
+
+    uploader = make_uploader(READ_MODE="replica", REPLICA_PATH=":memory:")
+    collection = uploader.db.collection("final_schema")
+    for doc in (
+        venue("near", "Fake Taproom", 33.77, -118.19),
+        venue("other", "Harbor Grill", 33.7701, -118.1901),
+    ):
+        collection.document(doc.pop("id")).set(doc)
+    uploader.replica.sync(uploader)
+    assert isinstance(get_venue_search(uploader), ReplicaVenueSearch)
+    client = api_client(uploader)
+
+    found = client.get(
+        "/search-restaurants-by-name?lat=33.77&lon=-118.19&radius=1000&name=fake taproom"
+    ).get_json()
+    assert [v["venue_id"] for v in found["data"]] == ["near"]
+    assert found["data"][0]["match_score"] == 1.0
+
+    deals = client.get(
+        f"/active-deals?at={HAPPY_HOUR.isoformat()}&venue_ids=other"
+    ).get_json()
+    assert [d["deal_id"] for d in deals["data"]] == ["other:0", "other:1"]
+    assert deals["data"][0]["venue_name"] == "Harbor Grill"
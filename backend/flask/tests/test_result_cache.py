@@ -0,0 +1,90 @@
+from helpers import encode_image
+from src.fakes import FakeGenerativeModel, Faults
+from src.result_cache import LRUCache, ParseResultCache, SQLiteCache, content_key
+from src.vision_parser import VisionMenuParser
+
+
+def test_content_key_covers_bytes_and_version():
+    assert content_key(b"menu", "v1") == content_key(memoryview(b"menu"), "v1")
+    assert content_key(b"menu", "v1") != content_key(b"menu", "v2")
+    assert content_key(b"menu", "v1") != content_key(b"menu2", "v1")
+
+
+def test_lru_evicts_least_recently_used_by_count_and_size():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    sized = LRUCache(max_entries=10, max_bytes=10)
+    sized.set("a", "x", size=6)
+    sized.set("b", "y", size=6)
+    assert sized.get("a") is None and sized.get("b") == "y"
+    assert sized.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = LRUCache(ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    ParseResultCache(disk=SQLiteCache(str(tmp_path))).set("k", {"deals": []})
+
+    cache = ParseResultCache(disk=SQLiteCache(str(tmp_path)))
+    first = cache.get("k")
+    assert first == {"deals": []}
+    assert len(cache.memory) == 1
+    first["deals"].append("mutated")
+    assert cache.get("k") == {"deals": []}
+
+
+def test_disk_tier_keeps_most_recently_read_rows(tmp_path):
+    disk = SQLiteCache(str(tmp_path), max_entries=2)
+    disk.set("a", 1)
+    disk.set("b", 2)
+    disk.get("a")
+    disk.set("c", 3)
+    assert len(disk) == 2
+    assert disk.get("b") is None
+
+
+
+def test_broken_disk_tier_is_a_miss(tmp_path):
+    cache = ParseResultCache(disk=SQLiteCache(str(tmp_path)))
+    cache.disk._conn.close()  # every query now raises sqlite3.ProgrammingError
+
+    assert cache.get("k") is None
+    cache.set("k", {"deals": []})
+    assert cache.get("k") == {"deals": []}  # still served from memory
+    assert cache.misses == 1
+
+def test_parser_answers_repeated_images_from_the_cache():
+    faults = Faults()
+    parser = VisionMenuParser(
+        model=FakeGenerativeModel(faults=faults), cache=ParseResultCache(), admission=None
+    )
+    image = encode_image()
+
+    first = parser.parse_deal(image)
+    second = parser.parse_deal(image)
+    assert first == second
+    assert faults.calls == 1
+
+    parser.parse_deal(encode_image(color=(0, 0, 200)))
+    assert faults.calls == 2
+
+
+def test_failed_parses_are_not_cached():
+    model = FakeGenerativeModel("not json")
+    parser = VisionMenuParser(model=model, cache=ParseResultCache(), admission=None)
+    image = encode_image()
+
+    assert parser.parse_deal(image)["error"]
+    model.response_text = FakeGenerativeModel().response_text
+    assert parser.parse_deal(image)["restaurant_name"] == "Fake Taproom"
@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import src.retry
+from src.admission import Overloaded
+from src.retry import (
+    backoff_delay,
+    is_transient,
+    retry_after_hint,
+    retry_call,
+    retry_call_async,
+)
+
+
+class Flaky:
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("flaky")
+        return "ok"
+
+
+def test_transient_errors_are_retried_until_success():
+    fn = Flaky(2)
+    assert retry_call(fn, attempts=3, base_delay=0) == "ok"
+    assert fn.calls == 3
+
+
+def test_last_error_is_raised_when_attempts_run_out():
+    fn = Flaky(5)
+    with pytest.raises(ConnectionError):
+        retry_call(fn, attempts=3, base_delay=0)
+    assert fn.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    fn = Flaky(1, error=ValueError)
+    with pytest.raises(ValueError):
+        retry_call(fn, attempts=3, base_delay=0)
+    assert fn.calls == 1
+    assert is_transient(TimeoutError()) and not is_transient(ValueError())
+
+
+def test_async_retries_the_same_way():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 2:
+            raise ConnectionError("flaky")
+        return "ok"
+
+    assert asyncio.run(retry_call_async(flaky, attempts=3, base_delay=0)) == "ok"
+    assert len(calls) == 2
+
+
+def test_backoff_is_capped_full_jitter():
+    for attempt in range(1, 10):
+        delay = backoff_delay(attempt, base_delay=0.5, max_delay=2.0)
+        assert 0 <= delay <= min(2.0, 0.5 * 2 ** (attempt - 1))
+
+
+class QuotaError(ConnectionError):
+    def __init__(self, message="quota", response=None, details=None):
+        super().__init__(message)
+        self.response = response
+        self.details = details
+
+
+def test_retry_after_hint_reads_every_form():
+    assert retry_after_hint(Overloaded("busy", retry_after=2.5)) == 2.5
+    assert retry_after_hint(QuotaError(response=SimpleNamespace(headers={"Retry-After": "7"}))) == 7
+    delay = SimpleNamespace(seconds=3, nanos=500_000_000)
+    assert retry_after_hint(QuotaError(details=[SimpleNamespace(retry_delay=delay)])) == 3.5
+    assert retry_after_hint(QuotaError("Quota exceeded. Please retry in 12.3s.")) == 12.3
+    assert retry_after_hint(QuotaError("Please retry in 250ms")) == 0.25
+    assert retry_after_hint(QuotaError("quota", SimpleNamespace(headers={}))) is None
+    assert retry_after_hint(ValueError("nothing to go on")) is None
+
+
+def test_hinted_wait_is_never_shortened(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(src.retry.time, "sleep", sleeps.append)
+    fn = Flaky(1, error=lambda message: QuotaError("Please retry in 2s"))
+
+    assert retry_call(fn, attempts=2, base_delay=0.01) == "ok"
+    assert sleeps == [2.0]
+
+
+def test_hint_beyond_max_delay_stops_retrying():
+    fn = Flaky(1, error=lambda message: QuotaError("Please retry in 60s"))
+
+    with pytest.raises(QuotaError):
+        retry_call(fn, attempts=3, base_delay=0, max_delay=10.0)
+    assert fn.calls == 1
@@ -0,0 +1,79 @@
+import hashlib
+import io
+
+import pytest
+from helpers import encode_image
+from src.upload_stream import IngestStream, sniff_image_type
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+
+def test_sniff_recognizes_every_allowed_format():
+    assert sniff_image_type(encode_image(fmt="JPEG")) == "image/jpeg"
+    assert sniff_image_type(encode_image(fmt="PNG")) == "image/png"
+    assert sniff_image_type(encode_image(fmt="GIF")) == "image/gif"
+    assert sniff_image_type(encode_image(fmt="WEBP")) == "image/webp"
+    assert sniff_image_type(b"%PDF-1.7 not an image") is None
+
+
+def test_stream_hashes_and_spills_chunk_by_chunk():
+    data = encode_image(size=(400, 300), fmt="PNG")
+    stream = IngestStream(max_bytes=len(data), spool_bytes=64)
+    for i in range(0, len(data), 100):
+        stream.write(data[i : i + 100])
+
+    assert stream.size == len(data)
+    assert stream.sha256 == hashlib.sha256(data).hexdigest()
+    assert stream.content_type == "image/png"
+    assert stream._file._rolled  # past spool_bytes: on disk, not in memory
+    stream.seek(0)
+    assert stream.read() == data
+
+
+def test_oversized_part_is_refused_mid_stream():
+    stream = IngestStream(max_bytes=20)
+    stream.write(b"\xff\xd8\xff" + b"\0" * 9)
+
+    with pytest.raises(RequestEntityTooLarge):
+        stream.write(b"\0" * 9)
+    assert stream.closed
+
+
+def test_non_image_is_refused_once_the_signature_is_in():
+    stream = IngestStream(max_bytes=1000)
+    stream.write(b"%PDF")
+
+    with pytest.raises(UnsupportedMediaType):
+        stream.write(b"-1.7 rest of the file")
+    assert stream.closed
+
+
+def test_short_parts_are_checked_by_verify():
+    stream = IngestStream(max_bytes=1000)
+    stream.write(b"GIF89a")
+    assert stream.content_type is None
+    assert stream.verify() == "image/gif"
+
+    tiny = IngestStream(max_bytes=1000)
+    tiny.write(b"hello")
+    with pytest.raises(UnsupportedMediaType):
+        tiny.verify()
+
+
+def post(client, data, filename="menu.jpg"):
+    return client.post(
+        "/upload-deal",
+        data={"image": (io.BytesIO(data), filename)},
+        content_type="multipart/form-data",
+    )
+
+
+def test_upload_endpoint_applies_the_limits(make_uploader, api_client):
+    uploader = make_uploader(UPLOAD_MAX_IMAGE_BYTES=4096)
+    client = api_client(uploader)
+
+    too_big = post(client, encode_image(fmt="PNG") + b"\0" * 4096, "menu.png")
+    assert too_big.status_code == 413
+    assert post(client, b"%PDF-1.7 dressed up as a photo").status_code == 415
+    assert post(client, b"hello").status_code == 415
+    assert list(uploader.db.collection("final_schema").stream()) == []
+    assert post(client, encode_image()).status_code == 200
@@ -0,0 +1,46 @@
+import threading
+
+from src.fakes import FakeBucket, FakeFirestore, FakeGenerativeModel, Faults
+from src.firebase_uploader import FirebaseUploader
+from src.vision_parser import VisionMenuParser
+
+
+def test_concurrent_merges_from_separate_workers_keep_every_deal(monkeypatch):
+    monkeypatch.setenv("IMAGE_DEDUP_ENABLED", "0")
+    monkeypatch.setenv("DOC_CACHE_TTL", "0")
+    # Reads and writes take long enough that the two read-modify-writes overlap
+    db = FakeFirestore(Faults(latency=0.01))
+    ref = db.collection("final_schema").document("venue1")
+    ref.set({"venue_name": "Taproom", "deals": [], "metadata": {"upload_count": 1}})
+
+    # Two "workers": separate uploaders (and locks) over the same database
+    workers = [
+        FirebaseUploader(
+            db=db,
+            bucket=FakeBucket(),
+            parser=VisionMenuParser(model=FakeGenerativeModel(), cache=None, admission=None),
+        )
+        for _ in range(2)
+    ]
+    uploads = [
+        {"deals": [{"name": f"Deal {i}", "price": "$5"}], "metadata": {}} for i in range(8)
+    ]
+
+    def merge(i):
+        workers[i % 2].append_to_venue("venue1", uploads[i])
+
+    threads = [threading.Thread(target=merge, args=(i,)) for i in range(len(uploads))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = ref.get().to_dict()
+    assert sorted(deal["name"] for deal in stored["deals"]) == [f"Deal {i}" for i in range(8)]
+    assert stored["metadata"]["upload_count"] == 9
+    assert stored["metadata"]["updated_at"]
+
+
+def test_merge_into_deleted_venue_returns_none(make_uploader):
+    uploader = make_uploader()
+    assert uploader.append_to_venue("missing", {"deals": []}) is None
@@ -0,0 +1,170 @@
+import io
+import json
+
+from helpers import encode_image
+from src.venue_resolver import VenueResolver, address_key, name_key
+
+MAIN_ST = {"street": "4001 East Anaheim Street, Suite 5", "city": "Long Beach", "zip": "90804"}
+
+
+def taproom(**fields):
+    return {"venue_name": "The Taproom", "address": MAIN_ST, **fields}
+
+
+def at(name, lat, lon=-118.19):
+    return {"venue_name": name, "latitude": lat, "longitude": lon}
+
+
+def test_address_key_normalizes_spellings():
+    assert address_key(MAIN_ST) == "4001 e anaheim st|90804"
+    assert address_key({"street": "4001 E. Anaheim St #5", "zip": "90804-1234"}) == (
+        "4001 e anaheim st|90804"
+    )
+    assert address_key({"street": "12 Main Street", "city": "Austin", "state": "Texas"}) == (
+        address_key({"street": "12 main st", "city": "austin", "state": "TX"})
+    )
+    assert address_key({"street": "12 Main St"}) is None
+    assert address_key({"city": "Austin", "zip": "78701"}) is None
+    assert name_key("The Taproom & Grill") == name_key("taproom grill")
+
+
+def test_resolve_by_address_and_name():
+    resolver = VenueResolver()
+    resolver.add("v1", taproom())
+    resolver.add("v2", {"venue_name": "Harbor Grill", "address": MAIN_ST})
+
+    assert resolver.resolve({"venue_name": "Taproom", "address": dict(MAIN_ST, city="LB")}) == "v1"
+    assert resolver.resolve({"venue_name": "Other Bar", "address": MAIN_ST}) is None
+    # Two venues share the address: a nameless upload is ambiguous
+    assert resolver.resolve({"address": MAIN_ST}) is None
+    assert resolver.resolve(taproom(), collection="other") is None
+
+
+def test_resolve_by_radius_picks_the_nearest_same_name():
+    resolver = VenueResolver(match_radius_m=75)
+    resolver.add("near", at("Taproom", 33.7700))
+    resolver.add("far", at("Taproom", 33.7705))
+    resolver.add("other", at("Grill", 33.7701))
+
+    assert resolver.resolve(at("taproom", 33.7701)) == "near"
+    # About 110 m from both: outside the radius
+    assert resolver.resolve(at("Taproom", 33.7690)) is None
+    assert resolver.resolve(at(None, 33.7700)) is None
+
+
+def test_apply_write_follows_updates():
+    resolver = VenueResolver()
+    resolver.apply_write("final_schema", "bad", {"error": "no menu", "address": MAIN_ST})
+    assert len(resolver) == 0
+
+    resolver.apply_write("final_schema", "v1", dict(taproom(), **at("The Taproom", 33.77)))
+    resolver.apply_write("final_schema", "v1", {"deals": []})
+    assert resolver.resolve(taproom()) == "v1"
+
+    resolver.apply_write("final_schema", "v1", {"venue_name": "Renamed"})
+    assert resolver.resolve(taproom()) is None
+    assert resolver.resolve({"venue_name": "Renamed", "address": MAIN_ST}) == "v1"
+    # The rename kept the indexed coordinates
+    assert resolver.resolve(at("Renamed", 33.77)) == "v1"
+
+
+def test_journal_is_appended_replayed_and_compacted(tmp_path):
+    path = str(tmp_path / "venues.jsonl")
+    resolver = VenueResolver(path=path)
+    resolver.add("v1", taproom())
+    resolver.add("v1", taproom(venue_name="Renamed"))
+    resolver.add("v1", taproom(venue_name="Renamed"))  # unchanged: not journaled
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["final_schema", "v2"')  # torn last line
+
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    loaded = VenueResolver(path=path)
+    assert loaded.resolve({"venue_name": "Renamed", "address": MAIN_ST}) == "v1"
+    assert len(loaded) == 1
+
+    added = loaded.backfill(
+        [
+            {"id": "v3", **at("Grill", 33.77)},
+            {"id": "v4", "error": "no menu", "address": MAIN_ST},
+            {"id": "v5", "venue_name": "Nowhere"},
+        ]
+    )
+    assert added == 1
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record[1] for record in records) == ["v1", "v3"]
+
+
+
+def test_workers_sharing_a_journal_see_each_others_venues(tmp_path):
+    path = str(tmp_path / "venues.jsonl")
+    first = VenueResolver(path=path)
+    second = VenueResolver(path=path)
+    second.add("v1", taproom())
+    # Read from the journal on the next resolve, no restart needed
+    assert first.resolve(taproom()) == "v1"
+
+    second.add("v2", at("Grill", 33.77))  # not yet seen by first
+    first.backfill([{"id": "v3", **at("Harbor Bar", 33.78)}])
+
+    with open(path, encoding="utf-8") as f:
+        assert sorted(json.loads(line)[1] for line in f) == ["v1", "v2", "v3"]
+    assert VenueResolver(path=path).resolve(at("grill", 33.77)) == "v2"
+
+def test_uploads_for_one_venue_share_a_document(make_uploader, api_client):
+    client = api_client(make_uploader(IMAGE_DEDUP_ENABLED=0))
+
+    def upload(color):
+        return client.post(
+            "/upload-deal",
+            data={
+                "image": (io.BytesIO(encode_image(color=color)), "menu.jpg"),
+                "venue_name": "The Taproom",
+                "venue_address": json.dumps(MAIN_ST),
+            },
+            content_type="multipart/form-data",
+        ).get_json()
+
+    first = upload((200, 40, 40))
+    second = upload((40, 40, 200))
+    assert not first["merged"] and second["merged"]
+    assert second["document_id"] == first["document_id"]
+
+
+def test_merged_deals_keep_their_own_upload_hours(make_uploader, api_client, monkeypatch):
+    import src.venue_search as venue_search
+
+    uploader = make_uploader(IMAGE_DEDUP_ENABLED=0, VENUES_JSON_PATH="/nonexistent.json")
+    client = api_client(uploader)
+    monkeypatch.setattr(venue_search, "_searches", {})
+
+    def upload(deal, start, end, days, color):
+        uploader.parser.model.response_text = json.dumps(
+            {
+                "restaurant_name": "The Taproom",
+                "deals": [{"name": deal, "price": "$5"}],
+                "time_frame": [{"start_time": start, "end_time": end, "days": days}],
+            }
+        )
+        return client.post(
+            "/upload-deal",
+            data={
+                "image": (io.BytesIO(encode_image(color=color)), "menu.jpg"),
+                "venue_name": "The Taproom",
+                "venue_address": json.dumps(MAIN_ST),
+            },
+            content_type="multipart/form-data",
+        ).get_json()
+
+    upload("Wings", "4:00 PM", "7:00 PM", ["Monday-Friday"], (200, 40, 40))
+    assert upload("Oysters", "9:00 PM", "close", ["Saturday"], (40, 40, 200))["merged"]
+
+    def active(at):
+        body = client.get(f"/active-deals?at={at}&fields=name").get_json()
+        return sorted(deal["name"] for deal in body["data"])
+
+    # 2026-10-12 is a Monday
+    assert active("2026-10-12T17:00:00") == ["Wings"]
+    assert active("2026-10-17T22:00:00") == ["Oysters"]
+    assert active("2026-10-17T17:00:00") == []
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from src.venue_search import COMPACT_MIN_DEAD, VenueSearch
+
+
+def venue(venue_id, name, lat=33.77, lon=-118.19, **fields):
+    return {"venue_id": venue_id, "venue_name": name, "latitude": lat, "longitude": lon, **fields}
+
+
+def test_upsert_replaces_an_entry():
+    search = VenueSearch([venue("a", "Fake Taproom"), venue("b", "Harbor Grill", lon=-118.191)])
+    search.upsert(venue("a", "Fake Taproom", lon=-118.192, address="12 Main St"))
+
+    found = search.search(33.77, -118.19, 1000)
+    assert [v["venue_id"] for v in found] == ["b", "a"]
+    assert found[1]["address"] == "12 Main St"
+    assert [v["venue_id"] for v in search.search(33.77, -118.19, 1000, name="taproom")] == ["a"]
+    assert search.get("a")["address"] == "12 Main St"
+
+
+def test_repeated_upserts_are_compacted():
+    search = VenueSearch([venue(str(i), f"Venue {i}", lon=-118.19 + i * 1e-4) for i in range(10)])
+    for round_ in range(COMPACT_MIN_DEAD):
+        search.upsert(venue("3", "Venue 3", lon=-118.1897, round=round_))
+
+    assert len(search.venues) < 10 + COMPACT_MIN_DEAD
+    assert len(search.venues) - len(search._dead) == 10
+    found = search.search(33.77, -118.19, 1000, limit=None)
+    assert sorted(v["venue_id"] for v in found) == [str(i) for i in range(10)]
+    assert search.get("3")["round"] == COMPACT_MIN_DEAD - 1
+    assert len(search.active_deals()) == 0
+
+
+def test_searches_during_upserts_see_a_consistent_index():
+    search = VenueSearch([venue(str(i), f"Venue {i}", lon=-118.19 + i * 1e-4) for i in range(50)])
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                found = search.search(33.77, -118.19, 5000, limit=None)
+                assert len({v["venue_id"] for v in found}) == len(found)
+            except Exception as e:  # IndexError / duplicate rows from a torn read
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(2000):
+        search.upsert(venue(str(i % 60), f"Venue {i % 60}", lon=-118.19 + (i % 60) * 1e-4))
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert len(search.search(33.77, -118.19, 5000, limit=None)) == 60
+
+
+class ScanUploader:
+    """Just enough of FirebaseUploader for get_venue_search; scans can be held"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def replica_for(self, collection):
+        return None
+
+    def iter_restaurants(self, collection="final_schema", fields=None):
+        self.gate.wait(5)
+        return [dict(doc, collection=collection) for doc in self.docs]
+
+
+def test_stale_index_is_served_while_it_rebuilds(monkeypatch):
+    import src.venue_search as venue_search
+
+    monkeypatch.setattr(venue_search, "_searches", {})
+    monkeypatch.setenv("VENUES_JSON_PATH", "/nonexistent.json")
+    monkeypatch.delenv("VENUE_INDEX_PATH", raising=False)
+    uploader = ScanUploader([venue("a", "Fake Taproom")])
+
+    first = venue_search.get_venue_search(uploader)
+    other = venue_search.get_venue_search(uploader, collection="other")
+    assert other is not first and other.collection == "other"
+    assert venue_search.get_venue_search(uploader) is first
+
+    first.built_at = 0.0  # past the TTL
+    uploader.gate.clear()
+    uploader.docs.append(venue("b", "Harbor Grill"))
+    assert venue_search.get_venue_search(uploader) is first
+    # Lands mid-scan: replayed onto the rebuilt index
+    venue_search.apply_venue_write("final_schema", "c", venue("c", "Late Upload"))
+    assert first.get("c") is not None
+    uploader.gate.set()
+
+    deadline = time.monotonic() + 5
+    while venue_search._searches["final_schema"] is first and time.monotonic() < deadline:
+        time.sleep(0.01)
+    rebuilt = venue_search.get_venue_search(uploader)
+    assert rebuilt is not first
+    assert sorted(v["venue_id"] for v in rebuilt.search(33.77, -118.19, 1000)) == ["a", "b", "c"]
+    assert venue_search.get_venue_search(uploader, collection="other") is other
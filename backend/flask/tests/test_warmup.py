@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_import_defers_the_heavy_clients():
+    code = (
+        "import sys, src.app; "
+        "print([m for m in ('firebase_admin', 'google.generativeai', 'PIL', 'numpy') "
+        "if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_warmup_rebuilds_the_empty_indexes(make_uploader, api_client):
+    uploader = make_uploader()
+    uploader.db.collection("final_schema").document("v1").set(
+        {
+            "venue_name": "Taproom",
+            "address": {"street": "12 Main St", "zip": "90804"},
+            "metadata": {"image_hashes": ["8f3c0c0c0c0c0c0c"]},
+        }
+    )
+    client = api_client(uploader)
+
+    body = client.get("/warmup").get_json()
+    assert body["success"]
+    assert {"uploader", "parser", "image_hashes", "venue_resolver", "venue_index"} <= set(
+        body["timings"]
+    )
+    assert len(uploader.dedupe) == 1
+    assert uploader.venues.resolve(
+        {"venue_name": "Taproom", "address": {"street": "12 Main Street", "zip": "90804"}}
+    ) == "v1"